@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+"""
+Benchmark the per-host batched delay commit against the old per-input
+delay_set path, using a simulated transport with a fixed round-trip time.
+No hardware is needed.
+
+e.g. a 64-antenna, dual-pol array on 64 SKARABs with a 1ms round trip:
+    feng_delay_commit_benchmark.py --hosts 64 --rtt 0.001
+"""
+from __future__ import print_function
+import argparse
+import collections
+import logging
+import struct
+import threading
+import time
+
+from corr2 import delay as delayops
+from corr2 import fhost_fpga
+
+parser = argparse.ArgumentParser(
+    description='Benchmark F-engine delay commits against a simulated '
+                'transport.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument(
+    '--hosts', dest='hosts', action='store', default=64, type=int,
+    help='number of simulated F-engine hosts')
+parser.add_argument(
+    '--f_per_fpga', dest='f_per_fpga', action='store', default=2, type=int,
+    help='number of F-engines per host')
+parser.add_argument(
+    '--rtt', dest='rtt', action='store', default=0.001, type=float,
+    help='simulated transport round-trip time, in seconds')
+parser.add_argument(
+    '--scatter', dest='scatter', action='store_true', default=False,
+    help='scatter the delay registers in the memory map, so that no '
+         'writes can be coalesced')
+parser.add_argument(
+    '--min_load_time', dest='min_load_time', action='store', default=0.2,
+    type=float, help='the instrument min_load_time, in seconds')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.WARN)
+
+Field = collections.namedtuple('Field', 'name offset width_bits')
+
+REGISTER_FIELDS = {
+    'delay_whole': [Field('delay_whole', 0, 32)],
+    'delay_frac': [Field('delay_frac', 0, 32)],
+    'delta_delay': [Field('delta', 0, 32)],
+    'phase': [Field('initial', 0, 32)],
+    'phase_rate': [Field('delta', 0, 32)],
+    'tl_cd%i_status': [Field('arm_count', 0, 16), Field('load_count', 16, 16)],
+    'delay%i_tl_control0': [Field('msw', 0, 16), Field('arm', 31, 1)],
+    'delay%i_tl_control1': [Field('lsw', 0, 32)],
+}
+
+
+class SimulatedRegister(object):
+    """
+    A register on a simulated host. Every access costs one round trip.
+    """
+    def __init__(self, host, name, address, fields):
+        self.host = host
+        self.name = name
+        self.address = address
+        self._fields = dict((f.name, f) for f in fields)
+
+    def write_int(self, value):
+        self.host.round_trip()
+
+    def read(self):
+        self.host.round_trip()
+        return {'data': {'arm_count': 0,
+                         'load_count': self.host.transactions & 0xffff}}
+
+    def write(self, **kwargs):
+        # a field write is a read-modify-write
+        self.host.round_trip()
+        self.host.round_trip()
+
+
+class SimulatedRegisters(dict):
+    def __getattr__(self, name):
+        return self[name]
+
+
+class SimulatedFHost(fhost_fpga.FpgaFHost):
+    """
+    Just enough of an FpgaFHost to run the delay code against a fake
+    transport.
+    """
+    def __init__(self, host, f_per_fpga, rtt, scatter=False):
+        self.host = host
+        self.logger = logging.getLogger(host)
+        self.fengines = []
+        self.timestamp_decimation = 13
+        self.rtt = rtt
+        self.transactions = 0
+        self._lock = threading.Lock()
+        self.registers = SimulatedRegisters()
+        address = 0
+        gap = 8 if scatter else 4
+        for offset in range(f_per_fpga):
+            for name in ['delay_whole', 'delay_frac', 'delta_delay', 'phase',
+                         'phase_rate']:
+                self._add_register('%s%i' % (name, offset), address,
+                                   REGISTER_FIELDS[name])
+                address += gap
+        for name in ['tl_cd%i_status', 'delay%i_tl_control1',
+                     'delay%i_tl_control0']:
+            for offset in range(f_per_fpga):
+                self._add_register(name % offset, address,
+                                   REGISTER_FIELDS[name])
+                address += gap
+
+    def _add_register(self, name, address, fields):
+        self.registers[name] = SimulatedRegister(self, name, address, fields)
+
+    def round_trip(self):
+        # the transport to a single board is serialised
+        with self._lock:
+            self.transactions += 1
+            time.sleep(self.rtt)
+
+    def blindwrite(self, device_name, data, offset=0):
+        self.round_trip()
+
+    def read(self, device_name, size, offset=0):
+        self.round_trip()
+        # a changing load_count, so that every model looks loaded
+        word = (self.transactions & 0xffff) << 16
+        return struct.pack('>%iI' % (size / 4), *([word] * (size / 4)))
+
+
+def get_logger(logger_name, log_level, **kwargs):
+    return True, logging.getLogger(logger_name)
+
+
+def make_hosts():
+    hosts = []
+    input_number = 0
+    for hostctr in range(args.hosts):
+        fhost = SimulatedFHost('fhost%02i' % hostctr, args.f_per_fpga,
+                               args.rtt, args.scatter)
+        for offset in range(args.f_per_fpga):
+            stream = fhost_fpga.InputStreamDetails(
+                'input%i' % input_number, None, input_number)
+            fhost.add_fengine(fhost_fpga.Fengine(
+                stream, host=fhost, offset=offset, getLogger=get_logger,
+                feng_id=input_number))
+            input_number += 1
+        hosts.append(fhost)
+    return hosts
+
+
+def make_delay_strings(n_inputs):
+    return ['%.10e,%.10e:%.10e,%.10e' % (10.5e-9 + ctr * 1e-9, 1e-9, 0.25,
+                                         1e-2) for ctr in range(n_inputs)]
+
+
+def run_threaded(jobs):
+    """
+    Run a list of (name, function) jobs in parallel, timing each one.
+    """
+    timings = {}
+
+    def jobfunc(name, func):
+        start = time.time()
+        func()
+        timings[name] = time.time() - start
+
+    threads = [threading.Thread(target=jobfunc, args=job) for job in jobs]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start, timings
+
+
+def report(label, hosts, wall_time, timings):
+    host_times = sorted(timings.values())
+    transactions = sum(fhost.transactions for fhost in hosts)
+    print('%s:' % label)
+    print('\ttotal wall time:        %.4f s (min_load_time %.3f s)' % (
+        wall_time, args.min_load_time))
+    print('\tper-host latency:       min %.4f, mean %.4f, max %.4f s' % (
+        host_times[0], sum(host_times) / len(host_times), host_times[-1]))
+    print('\ttransactions per host:  %.1f' % (
+        float(transactions) / len(hosts)))
+
+
+hosts = make_hosts()
+n_inputs = args.hosts * args.f_per_fpga
+delay_strings = make_delay_strings(n_inputs)
+sample_rate_hz = 1712e6
+load_mcnt = 2**40 + 12345
+print('%i hosts, %i inputs, %.2f ms simulated round trip%s.' % (
+    args.hosts, n_inputs, args.rtt * 1000.0,
+    ', scattered registers' if args.scatter else ''))
+
+# decoding the ICD strings, before any I/O
+start = time.time()
+delays = delayops.process_list(delay_strings, sample_rate_hz)
+for delay in delays:
+    delay.load_mcnt = load_mcnt
+print('process_list:                     %.6f s' % (time.time() - start))
+start = time.time()
+quantised = delayops.quantise_delays(
+    delayops.process_list_array(delay_strings, sample_rate_hz))
+print('process_list_array + quantise:    %.6f s' % (time.time() - start))
+
+# per-input, as FEngineOperations.threaded_feng_operation used to do it:
+# f_per_fpga waves of one thread per input
+per_input_timings = {}
+start = time.time()
+for fpl in range(args.f_per_fpga):
+    jobs = []
+    for fhost in hosts:
+        feng = fhost.fengines[fpl]
+        jobs.append((feng.name, (lambda feng_: lambda: feng_.delay_set(
+            delays[feng_.input_number]))(feng)))
+    _, timings = run_threaded(jobs)
+    for fhost in hosts:
+        feng = fhost.fengines[fpl]
+        per_input_timings[fhost.host] = \
+            per_input_timings.get(fhost.host, 0) + timings[feng.name]
+report('per-input delay_set', hosts, time.time() - start, per_input_timings)
+
+for fhost in hosts:
+    fhost.transactions = 0
+
+# batched, one job per host
+wall_time, timings = run_threaded(
+    [(fhost.host, (lambda fhost_: lambda: fhost_.delay_set_all(
+        quantised, load_mcnt))(fhost))
+     for fhost in hosts])
+report('per-host delay_set_all', hosts, wall_time, timings)
+
+# end
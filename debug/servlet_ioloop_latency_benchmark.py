@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=C0103
+"""
+Measure how long the servlet's IOLoop goes unserviced while a slow request
+runs, with the request handled directly on the IOLoop and as a coroutine
+on the request executor. A probe callback, standing in for the periodic
+sensors, is scheduled every --probe seconds and its lateness recorded.
+A fast 'delays' request is issued during the slow 'eq' one, to show that
+requests on independent resources no longer wait for each other.
+No hardware or katcp is needed.
+
+e.g. a 30-second gain-all:
+    servlet_ioloop_latency_benchmark.py --duration 30
+"""
+from __future__ import print_function
+import argparse
+import time
+
+from tornado import gen
+from tornado import locks
+from tornado.ioloop import IOLoop
+from concurrent import futures
+
+parser = argparse.ArgumentParser(
+    description='Benchmark IOLoop latency during blocking servlet requests.',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+parser.add_argument(
+    '--duration', dest='duration', action='store', default=3.0, type=float,
+    help='how long the slow request blocks, in seconds')
+parser.add_argument(
+    '--fast', dest='fast', action='store', default=0.05, type=float,
+    help='how long the fast request blocks, in seconds')
+parser.add_argument(
+    '--probe', dest='probe', action='store', default=0.01, type=float,
+    help='the probe callback interval, in seconds')
+args = parser.parse_args()
+
+
+class SimulatedServer(object):
+    """
+    Just the request-running parts of Corr2Server.
+    """
+    def __init__(self, non_blocking):
+        self.non_blocking = non_blocking
+        self._resource_locks = {resource: locks.Lock()
+                                for resource in ['delays', 'eq']}
+        self.request_executor = futures.ThreadPoolExecutor(
+            max_workers=len(self._resource_locks))
+
+    @gen.coroutine
+    def _run_blocking(self, resources, function, *args, **kwargs):
+        if not self.non_blocking:
+            raise gen.Return(function(*args, **kwargs))
+        held = []
+        try:
+            for resource in sorted(resources):
+                lock = self._resource_locks[resource]
+                yield lock.acquire()
+                held.append(lock)
+            rv = yield self.request_executor.submit(function, *args, **kwargs)
+        finally:
+            for lock in held:
+                lock.release()
+        raise gen.Return(rv)
+
+    @gen.coroutine
+    def request_gain_all(self):
+        yield self._run_blocking(['eq'], time.sleep, args.duration)
+        raise gen.Return(time.time())
+
+    @gen.coroutine
+    def request_delays(self):
+        yield self._run_blocking(['delays'], time.sleep, args.fast)
+        raise gen.Return(time.time())
+
+
+@gen.coroutine
+def run(non_blocking):
+    server = SimulatedServer(non_blocking)
+    ioloop = IOLoop.current()
+    lateness = []
+    running = [True]
+
+    def probe(expected):
+        lateness.append(time.time() - expected)
+        if running[0]:
+            ioloop.call_at(expected + args.probe, probe, expected + args.probe)
+    now = time.time()
+    ioloop.call_at(now + args.probe, probe, now + args.probe)
+    yield gen.sleep(0.1)
+
+    start = time.time()
+    slow = server.request_gain_all()
+    fast = server.request_delays()
+    fast_done = yield fast
+    slow_done = yield slow
+    running[0] = False
+    yield gen.sleep(2 * args.probe)
+    server.request_executor.shutdown()
+    raise gen.Return((max(lateness), fast_done - start, slow_done - start))
+
+
+print('%.1fs slow request, %.3fs fast request, %.0fms probe.' % (
+    args.duration, args.fast, args.probe * 1000.0))
+for non_blocking, label in [(False, 'handled on the IOLoop'),
+                            (True, 'coroutines on the request executor')]:
+    max_late, fast_time, slow_time = IOLoop.current().run_sync(
+        lambda: run(non_blocking))
+    print('%s:' % label)
+    print('\tlongest IOLoop stall:   %.4f s' % max_late)
+    print('\tfast request done in:   %.4f s' % fast_time)
+    print('\tslow request done in:   %.4f s' % slow_time)
+
+# end
@@ -21,8 +21,11 @@ import corr2
 from corr2 import sensors
 from corr2.sensors import Corr2Sensor
 
-#This variable exists because of problems with kcs - the rack location sensor needs to be transmitted a few times
-reportRackLocation = 0
+LOGGER = logging.getLogger(__name__)
+
+# how many times the rack location sensor is sent as WARN before NOMINAL,
+# because of problems with kcs - it needs to be transmitted a few times
+RACK_LOCATION_REPORTS = 3
 
 class Corr2HardwareSensorServer(katcp.DeviceServer):
 
@@ -38,8 +41,11 @@ class Corr2HardwareSensorServer(katcp.DeviceServer):
         super(Corr2HardwareSensorServer, self).__init__(*args)
         if use_tornado:
             self.set_concurrency_options(thread_safe=False, handler_thread=False)
-            self.executor = futures.ThreadPoolExecutor(max_workers=1)
-            self.host = casperfpga.CasperFpga(kwargs["skarab_host"])
+            skarab_hosts = kwargs['skarab_hosts']
+            # a bounded window of SKARABs read at once
+            self.executor = futures.ThreadPoolExecutor(
+                max_workers=max(1, min(kwargs['concurrency'], len(skarab_hosts))))
+            self.interval = kwargs['interval']
             self._created = False
             self._initialised = False
 
@@ -52,68 +58,43 @@ class Corr2HardwareSensorServer(katcp.DeviceServer):
             self.timeout = kwargs['timeout']
 
             start_time = str(time.time())
-            log_filename = '{}_hardware_sensor_servlet.log'.format(kwargs['skarab_host'])
+            if len(skarab_hosts) == 1:
+                log_filename = '{}_hardware_sensor_servlet.log'.format(skarab_hosts[0])
+            else:
+                log_filename = '{}_skarabs_hardware_sensor_servlet.log'.format(len(skarab_hosts))
 
             self.sensor_manager = corr2.sensors.SensorManager(self, instrument=None,
                 mass_inform_func=self.mass_inform,
                 log_filename=log_filename,
                 log_file_dir=log_file_dir)
+            self.sensor_manager.sensors_clear()
 
-            self.rack_location_tuple = get_physical_location(socket.gethostbyname(self.host.transport.host))
-            self.sensors = {}
-
-            sensor_manager = self.sensor_manager
-            sensor_manager.sensors_clear()
+            # a single SKARAB's sensors keep their plain names
+            self.boards = []
+            for skarab_host in skarab_hosts:
+                prefix = '' if len(skarab_hosts) == 1 else '{}.'.format(skarab_host)
+                self.boards.append(HardwareHost(skarab_host, self.sensor_manager,
+                                                self.timeout, prefix))
 
-            sensordict = dict()
-            try:
-                sensordict = self.host.transport.get_sensor_data(
-                    timeout=self.timeout)
-            except Exception as e:
-                self.host.logger.error(
-                    'Error retrieving {}s sensors - {}'.format(self.host, e.message))
-
-            for key, value in sensordict.iteritems():
+            # read all the SKARABs once, in the window, to make their sensors
+            def first_read(board):
                 try:
-                    if isinstance(value[0], float):
-                        sensortype = Corr2Sensor.float
-                    elif isinstance(value[0], int):
-                        sensortype = Corr2Sensor.integer
-                    elif isinstance(value[0], bool):
-                        sensortype = Corr2Sensor.boolean
-                    elif isinstance(value[0], str):
-                        sensortype = Corr2Sensor.string
-                    else:
-                        raise RuntimeError("Unknown datatype!")
-                    self.sensors[key] = sensor_manager.do_sensor(
-                        sensortype, '{}'.format(key),
-                        'a generic HW sensor', unit=value[1])
+                    return board.read()
                 except Exception as e:
-                    self.sensor_manager.logger.error(
-                        'Unable to add sensor {}-{}. Skipping.'.format(key, value))
-                    raise e
-            self.sensors['location'] = sensor_manager.do_sensor(
-                    Corr2Sensor.string,'location',
-                    'Rack location of this SKARAB',
-                    initial_status=Corr2Sensor.NOMINAL,unit='unitless')
-            self.sensors['location'].set_value(self.rack_location_tuple[0])
-
-            self.sensors['boot_image'] = sensor_manager.do_sensor(
-                    Corr2Sensor.string,'boot-image',
-                    'Currently running FPGA image',
-                    initial_status=Corr2Sensor.NOMINAL,unit='unitless')
-
-            self.sensors['device_status'] = sensor_manager.do_sensor(
-                    Corr2Sensor.device_status,'device-status',
-                    'Overall SKARAB health')
+                    board.host.logger.error(
+                        'Error retrieving {}s sensors - {}'.format(board.host, e.message))
+                    board.invalidate()
+                    return {}
+            for board, sensordict in zip(self.boards,
+                                         self.executor.map(first_read, self.boards)):
+                board.create_sensors(sensordict)
 
     def start_sensor_loop(self):
         IOLoop.current().add_callback(
             _sensor_cb_hw,
             self.executor,
-            self.sensors,
-            self.host,
-            self.timeout)
+            self.boards,
+            self.interval)
 
     def setup_sensors(self):
         """
@@ -132,20 +113,193 @@ class Corr2HardwareSensorServer(katcp.DeviceServer):
         """
         return 'ok',
 
-    @request()
+    @request(Str(default=''))
     @return_reply(Str())
-    def request_reset_hardware_platform(self, sock):
+    @gen.coroutine
+    def request_reset_hardware_platform(self, sock, skarab_host):
         """
         Reset the skarab and checks if it is in a reset state.
         :param sock:
+        :param skarab_host: the SKARAB to reset, needed if there is more
+            than one
         :return: {'ok,'fail'}
         """
-        tmpLevel = self.host.logger.level
-        self.host.logger.setLevel(10)  # Set logging level to info to record this reset
-        self.host.logger.info('Reseting Skarab: {}'.format(self.host.host))
-        self.host.logger.setLevel(tmpLevel)
-        self.host.transport.reboot_fpga()
-        return ('ok', 'Reset Successful')
+        if skarab_host == '' and len(self.boards) == 1:
+            board = self.boards[0]
+        else:
+            matches = [board for board in self.boards if board.host.host == skarab_host]
+            if len(matches) == 0:
+                raise gen.Return(('fail', 'Unknown SKARAB {}.'.format(skarab_host)))
+            board = matches[0]
+        host = board.host
+        tmpLevel = host.logger.level
+        host.logger.setLevel(10)  # Set logging level to info to record this reset
+        host.logger.info('Reseting Skarab: {}'.format(host.host))
+        host.logger.setLevel(tmpLevel)
+        yield self.executor.submit(host.transport.reboot_fpga)
+        # it comes back with a new boot image, maybe at a new address
+        board.invalidate()
+        raise gen.Return(('ok', 'Reset Successful'))
+
+
+class HardwareHost(object):
+    """
+    A SKARAB whose hardware sensors are served. Its address and boot image
+    are cached between polls, and cleared when it cannot be read, so that
+    they are read again once it is back.
+    """
+    def __init__(self, skarab_host, sensor_manager, timeout, prefix=''):
+        """
+        :param skarab_host: the SKARAB hostname or IP address
+        :param sensor_manager: the SensorManager with which to make the sensors
+        :param timeout: the timeout, in seconds, for sensor read requests
+        :param prefix: the prefix for the sensor names
+        :return:
+        """
+        self.host = casperfpga.CasperFpga(skarab_host)
+        self.sensor_manager = sensor_manager
+        self.timeout = timeout
+        self.prefix = prefix
+        self.sensors = {}
+        self.address = None
+        self.boot_image = None
+        self.location_reports = 0
+
+    def invalidate(self):
+        """
+        Forget the cached address and boot image.
+        :return:
+        """
+        self.address = None
+        self.boot_image = None
+        self.location_reports = 0
+
+    def read(self):
+        """
+        Read the SKARAB's sensors, and its address and boot image if they
+        are not cached. Blocks, so run it on an executor.
+        :return: the sensor data, as from get_sensor_data
+        """
+        if self.address is None:
+            self.address = socket.gethostbyname(self.host.transport.host)
+        if self.boot_image is None:
+            self.boot_image = parse_boot_image_return(
+                self.host.transport.get_virtex7_firmware_version())
+        return self.host.transport.get_sensor_data(timeout=self.timeout)
+
+    def create_sensors(self, sensordict):
+        """
+        Make the SKARAB's sensors. Those that already exist are kept, so
+        it can be called again with sensors missed before.
+        :param sensordict: the sensor data, as from get_sensor_data
+        :return:
+        """
+        sensor_manager = self.sensor_manager
+        for key, value in sensordict.iteritems():
+            try:
+                if isinstance(value[0], float):
+                    sensortype = Corr2Sensor.float
+                elif isinstance(value[0], int):
+                    sensortype = Corr2Sensor.integer
+                elif isinstance(value[0], bool):
+                    sensortype = Corr2Sensor.boolean
+                elif isinstance(value[0], str):
+                    sensortype = Corr2Sensor.string
+                else:
+                    raise RuntimeError("Unknown datatype!")
+                self.sensors[key] = sensor_manager.do_sensor(
+                    sensortype, '{}{}'.format(self.prefix, key),
+                    'a generic HW sensor', unit=value[1])
+            except Exception as e:
+                self.sensor_manager.logger.error(
+                    'Unable to add sensor {}-{}. Skipping.'.format(key, value))
+                raise e
+        self.sensors['location'] = sensor_manager.do_sensor(
+                Corr2Sensor.string, '{}location'.format(self.prefix),
+                'Rack location of this SKARAB',
+                initial_status=Corr2Sensor.NOMINAL,unit='unitless')
+        if self.address is not None:
+            self.sensors['location'].set_value(get_physical_location(self.address)[0])
+
+        self.sensors['boot_image'] = sensor_manager.do_sensor(
+                Corr2Sensor.string, '{}boot-image'.format(self.prefix),
+                'Currently running FPGA image',
+                initial_status=Corr2Sensor.NOMINAL,unit='unitless')
+
+        self.sensors['device_status'] = sensor_manager.do_sensor(
+                Corr2Sensor.device_status, '{}device-status'.format(self.prefix),
+                'Overall SKARAB health')
+
+    def set_failure(self):
+        """
+        Mark the SKARAB's sensors unreachable.
+        :return:
+        """
+        for key, sensor in self.sensors.iteritems():
+            if(key != 'location'):
+                sensor.set(status=Corr2Sensor.UNREACHABLE,
+                        value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
+
+    def update(self, results):
+        """
+        Update the SKARAB's sensors from a read.
+        :param results: the sensor data, as from get_sensor_data
+        :return:
+        """
+        host = self.host
+        # a SKARAB down at start-up gets its sensors on its first good read
+        missing = dict((key, value) for key, value in results.iteritems()
+                       if key not in self.sensors)
+        if missing:
+            host.logger.info('Adding {} new sensors for {}'.format(
+                len(missing), host.host))
+            try:
+                self.create_sensors(missing)
+            except Exception as e:
+                host.logger.error('Error adding {} sensors - {}'.format(
+                    host.host, e.message))
+            self.sensor_manager.katcp_server.mass_inform(
+                katcp.Message.inform('interface-changed', 'sensor-list'))
+        sensors = self.sensors
+        sensors['boot_image'].set(value=self.boot_image[0],status=Corr2Sensor.NOMINAL)
+
+        if self.location_reports <= RACK_LOCATION_REPORTS:
+            if self.location_reports < RACK_LOCATION_REPORTS:
+                status = Corr2Sensor.WARN
+            else:
+                status = Corr2Sensor.NOMINAL
+            self.location_reports += 1
+            rack_location_tuple = get_physical_location(self.address)
+            sensors['location'].set(value=rack_location_tuple[0],status=status,timestamp=time.time())
+
+        for key, value in results.iteritems():
+            try:
+                if ((value[2].lower() == 'ok') or (value[2].lower() == 'nominal')):
+                    status = Corr2Sensor.NOMINAL
+                elif value[2].lower() == 'warning':
+                    status = Corr2Sensor.WARN
+                elif value[2].lower() == 'error':
+                    status = Corr2Sensor.ERROR
+                else:
+                    status = Corr2Sensor.UNKNOWN
+                sensors[key].set(value=value[0], status=status)
+            except Exception as e:
+                host.logger.error('Error updating {}-{} sensor - {}'.format(host.host, key, e.message))
+                try:
+                    sensors[key].set(status=Corr2Sensor.UNREACHABLE,
+                            value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensors[key].type]][1])
+                except:
+                    pass
+        try:
+            if is_sensor_list_status_ok(results):
+                device_value = 'ok'
+                device_status = Corr2Sensor.NOMINAL
+            else:
+                device_value = 'fail'
+                device_status = Corr2Sensor.ERROR
+            sensors['device_status'].set(value=device_value, status=device_status)
+        except Exception as e:
+            host.logger.error('Error updating {}-device-status sensor - {}'.format(host.host, e.message))
 
 
 
@@ -198,81 +352,46 @@ def is_sensor_list_status_ok(sensors_dict):
 
 
 @gen.coroutine
-def _sensor_cb_hw(executor, sensors, host, timeout):
+def _poll_board(executor, board):
     """
-    Sensor call back to check all HW sensors
-    :param sensors: per-host dict of sensors
+    Read one SKARAB on the executor and update its sensors.
+    :param executor: the executor on which to read it
+    :param board: a HardwareHost
     :return:
     """
-
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            if(key != 'location'):
-                sensor.set(status=Corr2Sensor.UNREACHABLE,
-                        value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-        time.sleep(0.5)
-        IOLoop.current().call_later(5, _sensor_cb_hw, executor, sensors, host, timeout)
-
     try:
-        boot_image = parse_boot_image_return(host.transport.get_virtex7_firmware_version())
-        sensors['boot_image'].set(value=boot_image[0],status=Corr2Sensor.NOMINAL)
+        results = yield executor.submit(board.read)
     except Exception as e:
-        host.logger.error('Error retrieving boot image state on host {} - {}'.format(host.host, e.message))
-        set_failure()
+        board.host.logger.error(
+            'Error retrieving {}s sensors - {}'.format(board.host.host, e.message))
+        # it may come back as something else
+        board.invalidate()
+        board.set_failure()
         return
+    board.update(results)
+    board.host.logger.debug('sensorloop ran')
 
-    global reportRackLocation;
-    if(reportRackLocation<3):
-	reportRackLocation+=1
-    	rack_location_tuple = get_physical_location(socket.gethostbyname(host.transport.host))
-	sensors['location'].set(value=rack_location_tuple[0],status=Corr2Sensor.WARN,timestamp=time.time())
-    elif(reportRackLocation==3):
-        reportRackLocation+=1
-        rack_location_tuple = get_physical_location(socket.gethostbyname(host.transport.host))
-	sensors['location'].set(value=rack_location_tuple[0],status=Corr2Sensor.NOMINAL,timestamp=time.time())
 
-
-    try:
-        results = yield executor.submit(host.transport.get_sensor_data,
-                                        timeout=timeout)
-    except Exception as e:
-        host.logger.error(
-            'Error retrieving {}s sensors - {}'.format(host.host, e.message))
-        set_failure()
-        return
-
-    for key, value in results.iteritems():
-        try:
-            if ((value[2].lower() == 'ok') or (value[2].lower() == 'nominal')):
-                status = Corr2Sensor.NOMINAL
-            elif value[2].lower() == 'warning': 
-                status = Corr2Sensor.WARN
-            elif value[2].lower() == 'error': 
-                status = Corr2Sensor.ERROR
-            else:
-                status = Corr2Sensor.UNKNOWN
-            sensors[key].set(value=value[0], status=status)
-        except Exception as e:
-            host.logger.error('Error updating {}-{} sensor - {}'.format(host.host, key, e.message))
-            time.sleep(0.5)
-            try:
-                sensors[key].set(status=Corr2Sensor.UNREACHABLE,
-                        value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensors[key].type]][1])
-            except:
-                pass
-    try:
-        if is_sensor_list_status_ok(results):
-            device_value = 'ok'
-            device_status = Corr2Sensor.NOMINAL
-        else:
-            device_value = 'fail'
-            device_status = Corr2Sensor.ERROR
-        sensors['device_status'].set(value=device_value, status=device_status)
-    except Exception as e:
-        host.logger.error('Error updating {}-device-status sensor - {}'.format(host.host, e.message))
-    host.logger.debug('sensorloop ran')
-    time.sleep(0.5)
-    IOLoop.current().call_later(10, _sensor_cb_hw, executor, sensors, host, timeout)
+@gen.coroutine
+def _sensor_cb_hw(executor, boards, interval):
+    """
+    Sensor call back to check all HW sensors, on all the SKARABs, every
+    interval seconds
+    :param executor: the executor on which to read the SKARABs, its
+        workers are the number read at once
+    :param boards: a list of HardwareHosts
+    :param interval: the poll interval, in seconds
+    :return:
+    """
+    start_time = time.time()
+    yield [_poll_board(executor, board) for board in boards]
+    next_time = start_time + interval
+    if next_time < time.time():
+        LOGGER.warning('Reading {} SKARABs took {:.1f}s, longer than the {}s '
+                       'interval'.format(len(boards), time.time() - start_time,
+                                         interval))
+        next_time = time.time()
+    IOLoop.current().call_at(next_time, _sensor_cb_hw, executor, boards, interval)
 
 @gen.coroutine
 def on_shutdown(ioloop, server):
@@ -304,7 +423,14 @@ def main():
         help='do NOT use the tornado version of the Katcp server')
     parser.add_argument(
         '--host', dest='host', action='store',
-        help='SKARAB hostname or IP address to connect to.')
+        help='SKARAB hostname or IP address to connect to, or a '
+             'comma-separated list of them.')
+    parser.add_argument(
+        '--interval', dest='interval', action='store', default=10.0,
+        type=float, help='poll the SKARABs every this many seconds')
+    parser.add_argument(
+        '--concurrency', dest='concurrency', action='store', default=32,
+        type=int, help='read at most this many SKARABs at once')
     parser.add_argument(
         '--log_here', dest='log_here', action='store', default=True,
         help='Log to file here or in /var/log/skarab')
@@ -321,7 +447,9 @@ def main():
 
     server = Corr2HardwareSensorServer('127.0.0.1', args.port,
                                        tornado=(not args.no_tornado),
-                                       skarab_host=args.host,
+                                       skarab_hosts=[host.strip() for host in args.host.split(',')],
+                                       interval=args.interval,
+                                       concurrency=args.concurrency,
                                        log_here=args.log_here,
                                        timeout=float(args.timeout))
     print('Server listening on port {} '.format(args.port, end=''))
@@ -9,11 +9,13 @@ import tornado.gen
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 from katcp import DeviceServer
+from katcp.kattypes import request, return_reply, Float, Int, Str
 from tornado.ioloop import IOLoop
 
 from corr2 import sensors_periodic
 from corr2.fxcorrelator import FxCorrelator
 from corr2.sensors import SensorManager
+from corr2.sensor_shard import SensorShards
 from corr2.utils import parse_ini_file
 from corr2.corr2LogHandlers import getKatcpLogger, reassign_log_handlers, \
                                     create_katcp_and_file_handlers
@@ -28,6 +30,7 @@ class Corr2SensorServer(DeviceServer):
         try:
             self.config_filename = kwargs.pop('config', None)
             self.instrument_name = kwargs.pop('iname', 'snsrs')
+            self.num_shards = kwargs.pop('shards', 0)
 
             config_file_dict = parse_ini_file(self.config_filename)
             self.log_file_dir = config_file_dict.get('FxCorrelator').get('log_file_dir', _DEFAULT_LOG_DIR)
@@ -51,6 +54,7 @@ class Corr2SensorServer(DeviceServer):
             
             self.set_concurrency_options(thread_safe=False, handler_thread=False)
             self.instrument = None
+            self.shards = None
         except AssertionError as ex:
             stack_trace = traceback.format_exc()
             errmsg = 'Logging directory does not exist: {}'.format(self.log_file_dir)
@@ -120,21 +124,39 @@ class Corr2SensorServer(DeviceServer):
                                         log_filename=self.log_filename,
                                         log_file_dir=self.log_file_dir,
                                         logLevel=self.log_level)
+            # pick up the state saved by the main servlet, read-only, so
+            # that it is not read back from the hardware
+            self.instrument.attach_state()
 
             # set response timeout
             response_timeout = float(self.instrument.configd['FxCorrelator'].get('sensor_response_timeout', 0.1))
             self.instrument._update_response_timeout(response_timeout)
             
             # Disable manually-issued sensor update informs (aka 'kcs' sensors):
+            history_length = int(self.instrument.configd['FxCorrelator'].get('sensor_history_length', 0))
             sensor_manager_inst = SensorManager(self, self.instrument,
                                                 kcs_sensors=False,
+                                                history_length=history_length,
                                                 mass_inform_func=self.mass_inform,
                                                 log_filename=self.log_filename,
                                                 log_file_dir=self.log_file_dir,
                                                 logLevel=self.log_level)
 
             self.instrument.set_sensor_manager(sensor_manager_inst)
-            sensors_periodic.setup_sensors(self.instrument.sensor_manager)
+            if self.num_shards > 0:
+                # poll the hosts from worker processes, which send their
+                # sensors here
+                self.shards = SensorShards(sensor_manager_inst, config,
+                                           self.instrument_name, self.num_shards,
+                                           flush_interval=float(self.instrument.configd['FxCorrelator'].get(
+                                               'sensor_shard_flush_interval', 0.1)),
+                                           response_timeout=response_timeout,
+                                           log_filename=self.log_filename,
+                                           log_file_dir=self.log_file_dir,
+                                           logLevel=self.log_level)
+                self.shards.start(self.ioloop)
+            else:
+                sensors_periodic.setup_sensors(self.instrument.sensor_manager)
 
             # Function created to reassign all non-conforming log-handlers
             loggers_changed = reassign_log_handlers(mass_inform_func=self.mass_inform, 
@@ -146,6 +168,30 @@ class Corr2SensorServer(DeviceServer):
             stack_trace = traceback.format_exc()
             return self._log_stacktrace(stack_trace, 'Failed to initialise sensor_servlet.')
 
+    @request(Str(), Float(default=0.0), Int(default=1000))
+    @return_reply(Int(min=0))
+    def request_sensor_history(self, sock, sensor_name, since, max_samples):
+        """
+        Get the recent readings of a sensor, kept if the instrument config
+        has a sensor_history_length. Each reading is sent as an inform of
+        timestamp, status and value.
+        :param sock:
+        :param sensor_name: the sensor
+        :param since: only readings taken after this UNIX time
+        :param max_samples: decimate to at most this many readings
+        :return: the number of readings sent
+        """
+        try:
+            samples = self.instrument.sensor_manager.sensor_history(
+                sensor_name, since, max_samples)
+        except Exception as ex:
+            return self._log_excep(
+                ex, 'Failed to get the history of sensor {}.'.format(
+                    sensor_name))
+        for timestamp, status, value in samples:
+            sock.inform(timestamp, status, value)
+        return 'ok', len(samples)
+
     
 @tornado.gen.coroutine
 def on_shutdown(ioloop, server):
@@ -156,6 +202,8 @@ def on_shutdown(ioloop, server):
     :return:
     """
     print('Sensor server shutting down')
+    if server.shards is not None:
+        server.shards.stop()
     yield server.stop()
     ioloop.stop()
 
@@ -185,6 +233,10 @@ if __name__ == '__main__':
                         default=None, help='a corr2 config file')
     parser.add_argument('-n', '--name', dest='name', action='store',
                         default=None, help='a name for the instrument')
+    parser.add_argument('--shards', dest='shards', action='store',
+                        default=0, type=int,
+                        help='poll the hosts from this many worker processes, '
+                             'or in this process if 0')
     args = parser.parse_args()
 
     try:
@@ -215,7 +267,8 @@ if __name__ == '__main__':
         
     ioloop = IOLoop.current()
     sensor_server = Corr2SensorServer('127.0.0.1', args.port, config=args.config,
-                                      iname=args.name, log_level=args.log_level)
+                                      iname=args.name, log_level=args.log_level,
+                                      shards=args.shards)
     sensor_server._set_log_level(log_level)
     signal.signal(signal.SIGINT,
                   lambda sig, frame: ioloop.add_callback_from_signal(
@@ -6,15 +6,16 @@ import signal, pkginfo, Queue
 import traceback2 as traceback
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from katcp import DeviceServer
+from katcp import DeviceServer, Sensor
 from katcp.kattypes import request, return_reply, Float, Int, Str, Bool
 from tornado import gen
+from tornado import locks
 from tornado.ioloop import IOLoop
 from concurrent import futures
 
 from corr2.fxcorrelator import FxCorrelator
 from corr2.sensors import Corr2Sensor, Corr2SensorManager
-from corr2.utils import parse_ini_file, process_new_eq
+from corr2.utils import parse_ini_file, process_new_eq, encode_array
 from corr2 import corr_monitoring_loop as corr_mon_loop
 
 from corr2.corr2LogHandlers import getKatcpLogger, \
@@ -39,6 +40,7 @@ class Corr2Server(DeviceServer):
             start_time_str = str(time.time())
             
             use_tornado = kwargs.pop('tornado')
+            self.use_tornado = use_tornado
 
             self.config_filename = kwargs.pop('config', None)
             
@@ -65,6 +67,14 @@ class Corr2Server(DeviceServer):
             self.metadata_cadence = 5
             self.descriptor_cadence = 5
             self.executor = futures.ThreadPoolExecutor(max_workers=1)
+            # blocking instrument calls made by requests run here, one lock
+            # per hardware resource: requests on the same resource are
+            # serialised, requests on different ones are not
+            self._resource_locks = {
+                resource: locks.Lock() for resource in
+                ['delays', 'eq', 'quantiser', 'adc', 'beam', 'xeng', 'feng']}
+            self.request_executor = futures.ThreadPoolExecutor(
+                max_workers=len(self._resource_locks))
             self._created = False
             self._initialised = False
             self.delays_disabled = False
@@ -72,6 +82,12 @@ class Corr2Server(DeviceServer):
             self.mon_loop = None
             self.mon_loop_running = None
 
+            self.programming_progress = Sensor.string(
+                'programming-progress',
+                'The last step of programming the boards in ?initialise.',
+                default='')
+            self.add_sensor(self.programming_progress)
+
         except AssertionError as ex:
             stack_trace = traceback.format_exc()
             errmsg = 'Logging directory does not exist: {}'.format(self.log_file_dir)
@@ -109,6 +125,47 @@ class Corr2Server(DeviceServer):
         self._logger.error(log_message)
         return 'fail', log_message
 
+    @gen.coroutine
+    def _run_blocking(self, resources, function, *args, **kwargs):
+        """
+        Run a blocking instrument call on the request executor, so that the
+        IOLoop keeps servicing sensors and other requests meanwhile.
+        :param resources: a list of the hardware resources the call uses,
+            their locks are held while it runs
+        :param function: the function to call
+        :return: the function's return value
+        """
+        held = []
+        try:
+            # always in the same order, so requests cannot deadlock
+            for resource in sorted(resources):
+                lock = self._resource_locks[resource]
+                yield lock.acquire()
+                held.append(lock)
+            rv = yield self.request_executor.submit(function, *args, **kwargs)
+        finally:
+            for lock in held:
+                lock.release()
+        raise gen.Return(rv)
+
+    def _inform_array(self, sock, name, data, dtype):
+        """
+        Send a large array of values as an inform. If the instrument is
+        configured with compact_array_values, the array is sent base64
+        encoded, see corr2.utils.encode_array.
+        :param sock:
+        :param name: the first argument of the inform
+        :param data: the array of values
+        :param dtype: the numpy dtype to which to convert compact values
+        :return:
+        """
+        if self.instrument.compact_array_values:
+            sock.inform(name, encode_array(data, dtype=dtype))
+        else:
+            # numpy would summarise a long array
+            import numpy
+            sock.inform(name, str(numpy.asarray(data).tolist()))
+
     @request()
     @return_reply()
     def request_ping(self, sock):
@@ -177,10 +234,11 @@ class Corr2Server(DeviceServer):
         pass
 
     @request(Bool(default=True), Bool(default=True), Bool(default=True),
-             Bool(default=True))
+             Bool(default=True), Bool(default=False), Bool(default=False))
     @return_reply()
+    @gen.coroutine
     def request_initialise(self, sock, program, configure, require_epoch,
-                           monitor_instrument):
+                           monitor_instrument, attach, force_program):
         """
         Initialise self.instrument
         :param sock:
@@ -188,21 +246,42 @@ class Corr2Server(DeviceServer):
         :param configure: setup the FPGA registers if True
         :param require_epoch: the synch epoch MUST be set before init if True
         :param monitor_instrument: start the instrument monitoring ioloop
+        :param attach: without programming or configuring, take the
+            instrument state from the saved state file if True
+        :param force_program: program every board, even those already
+            running the right image, if True
         :return:
         """
         if self._initialised:
-            return 'fail', 'Cannot run ?initialise twice.'
+            raise gen.Return(('fail', 'Cannot run ?initialise twice.'))
+        ioloop = IOLoop.current()
+
+        def progress(msg):
+            ioloop.add_callback(self.programming_progress.set_value, msg)
         try:
-            self.instrument.initialise(
+            # programming takes minutes, keep the IOLoop running meanwhile
+            yield self._run_blocking(
+                self._resource_locks.keys(), self.instrument.initialise,
                 program=program, configure=configure, require_epoch=require_epoch,
+                attach=attach, force_program=force_program,
                 mass_inform_func=self.mass_inform, getLogger=getKatcpLogger,
-                log_filename=self.log_filename, log_file_dir=self.log_file_dir)
+                log_filename=self.log_filename, log_file_dir=self.log_file_dir,
+                progress_callback=progress)
 
             # update the servlet's version list with version information
             # from the running firmware
             self.extra_versions.update(self.instrument.get_version_info())
             # add a sensor manager
+            _fxcorr_d = self.instrument.configd['FxCorrelator']
             sensor_manager = Corr2SensorManager(self, self.instrument,
+                                        inform_flush_interval=float(_fxcorr_d.get(
+                                            'sensor_inform_flush_interval', 0.05)),
+                                        min_inform_interval=float(_fxcorr_d.get(
+                                            'sensor_min_inform_interval', 0)),
+                                        inform_batching=_fxcorr_d.get(
+                                            'sensor_inform_batching', 'true').lower() == 'true',
+                                        history_length=int(_fxcorr_d.get(
+                                            'sensor_history_length', 0)),
                                         mass_inform_func=self.mass_inform,
                                         log_filename=self.log_filename,
                                         log_file_dir=self.log_file_dir)
@@ -210,6 +289,10 @@ class Corr2Server(DeviceServer):
             self.instrument.set_sensor_manager(sensor_manager)
             # set up the main loop sensors
             sensor_manager.setup_mainloop_sensors()
+
+            # queue delay models and write them from the ioloop
+            if self.use_tornado:
+                self.instrument.fops.delay_scheduler_start(IOLoop.current())
  
             # Add build time sensors
             self.sensors = {}
@@ -235,7 +318,7 @@ class Corr2Server(DeviceServer):
             # - Change the corresponding group's log-level accordingly
             if self.log_level_dict is None:
                 # All is well
-                return 'ok',
+                raise gen.Return(('ok',))
             # else: More work to do!
             for logger_group_name, log_level in self.log_level_dict.items():
                 result, return_msg = servlet_log_level_request(corr_obj=self.instrument,
@@ -243,14 +326,16 @@ class Corr2Server(DeviceServer):
                                                                logger_group_name=logger_group_name)
                 if not result:
                     # Problem
-                    return 'fail', return_msg
+                    raise gen.Return(('fail', return_msg))
                 # else: Great success
 
-            return 'ok',
+            raise gen.Return(('ok',))
+        except gen.Return:
+            raise
         except Exception as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace, 'Failed to initialise {}'.format(
-                self.instrument.descriptor))
+            raise gen.Return(self._log_stacktrace(stack_trace, 'Failed to initialise {}'.format(
+                self.instrument.descriptor)))
             
     @request(Str(multiple=True))
     @return_reply()
@@ -275,6 +360,7 @@ class Corr2Server(DeviceServer):
         if synch_time > -1.0:
             try:
                 self.instrument.synchronisation_epoch = synch_time
+                self.instrument.save_state()
             except Exception as ex:
                 stack_trace = traceback.format_exc()
                 return self._log_stacktrace(
@@ -461,6 +547,7 @@ class Corr2Server(DeviceServer):
 
     @request(Str(), Str(default='', multiple=True))
     @return_reply(Str(multiple=True))
+    @gen.coroutine
     def request_gain(self, sock, source_name, *eq_vals):
         """
         Apply and/or get the gain settings for an input
@@ -470,23 +557,28 @@ class Corr2Server(DeviceServer):
         :return:
         """
         if source_name.strip() == '':
-            return self._log_excep(None, 'No source name given.')
+            raise gen.Return(self._log_excep(None, 'No source name given.'))
         if len(eq_vals) > 0 and eq_vals[0] != '':
             try:
                 neweqvals = process_new_eq(list(eq_vals))
-                self.instrument.fops.set_eq(new_eq=neweqvals, input_name=source_name)
-                return ('ok', 'gain set for input {}.'.format(source_name))
+                yield self._run_blocking(['eq'], self.instrument.fops.set_eq,
+                                         new_eq=neweqvals, input_name=source_name)
+                raise gen.Return(('ok', 'gain set for input {}.'.format(source_name)))
+            except gen.Return:
+                raise
             except Exception as ex:
                 stack_trace = traceback.format_exc()
                 failmsg = 'Failed setting eq for source {0}.'.format(source_name)
-                return self._log_stacktrace(stack_trace, failmsg)
+                raise gen.Return(self._log_stacktrace(stack_trace, failmsg))
         else:
-            _src = self.instrument.fops.get_eq(source_name)
-            return tuple(['ok'] +
-                     Corr2Server.rv_to_liststr(_src[source_name]))
+            _src = yield self._run_blocking(['eq'], self.instrument.fops.get_eq,
+                                            source_name)
+            raise gen.Return(tuple(['ok'] +
+                     Corr2Server.rv_to_liststr(_src[source_name].tolist())))
 
     @request(Str(default='', multiple=True))
     @return_reply()
+    @gen.coroutine
     def request_gain_all(self, sock, *eq_vals):
         """
         Apply the gain settings for an input
@@ -509,14 +601,20 @@ class Corr2Server(DeviceServer):
                 self.instrument.logger.info('Trying to set gains automatically')
             else:
                 neweqvals = process_new_eq(list(eq_vals))
-            self.instrument.fops.set_eq(new_eq=neweqvals, input_name=None)
+            resources = ['eq']
+            if neweqvals == 'auto':
+                # auto EQ reads the quantiser snapshots
+                resources.append('quantiser')
+            yield self._run_blocking(resources, self.instrument.fops.set_eq,
+                                     new_eq=neweqvals, input_name=None)
         except Exception as ex:
-            return self._log_excep(ex, 'Failed setting eq for all sources')
-        return 'ok',
+            raise gen.Return(self._log_excep(ex, 'Failed setting eq for all sources'))
+        raise gen.Return(('ok',))
 
       
     @request(Str(), Float(default=-1.0), Str(default='', multiple=True))
     @return_reply(Str(multiple=True))
+    @gen.coroutine
     def request_delays(self, sock, stream_name, loadtime, *delay_strings):
         """
         Set delays for the instrument.
@@ -528,20 +626,21 @@ class Corr2Server(DeviceServer):
         :return:
         """
         if self.delays_disabled:
-            return ('fail', 'delays disabled')
+            raise gen.Return(('fail', 'delays disabled'))
         if stream_name != self.instrument.fops.data_stream.name:
-            return tuple(['fail', ' supplied stream name %s does not match expected %s.' % (stream_name, self.instrument.fops.data_stream.name)])
+            raise gen.Return(tuple(['fail', ' supplied stream name %s does not match expected %s.' % (stream_name, self.instrument.fops.data_stream.name)]))
         try:
-
-            self.instrument.fops.delay_set_all(loadtime, delay_strings)
-            return tuple(['ok', ' Model updated. Check sensors after next update to confirm application'])
+            yield self._run_blocking(['delays'], self.instrument.fops.delay_set_all,
+                                     loadtime, delay_strings)
         except Exception as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace, 'Failed setting delays.')
+            raise gen.Return(self._log_stacktrace(stack_trace, 'Failed setting delays.'))
+        raise gen.Return(tuple(['ok', ' Model updated. Check sensors after next update to confirm application']))
 
 
     @request(Float(default=-1.0))
     @return_reply(Float())
+    @gen.coroutine
     def request_accumulation_length(self, sock, new_acc_time):
         """
         Set & get the accumulation time
@@ -552,11 +651,13 @@ class Corr2Server(DeviceServer):
         """
         if new_acc_time != -1.0:
             try:
-                self.instrument.xops.set_acc_time(new_acc_time)
+                yield self._run_blocking(['xeng'], self.instrument.xops.set_acc_time,
+                                         new_acc_time)
             except Exception as ex:
                 stack_trace = traceback.format_exc()
-                return self._log_stacktrace(stack_trace, 'Failed to set accumulation length.')
-        return 'ok', self.instrument.xops.get_acc_time()
+                raise gen.Return(self._log_stacktrace(stack_trace, 'Failed to set accumulation length.'))
+        acc_time = yield self._run_blocking(['xeng'], self.instrument.xops.get_acc_time)
+        raise gen.Return(('ok', acc_time))
 
     @request(Int())
     @return_reply()
@@ -578,6 +679,7 @@ class Corr2Server(DeviceServer):
     @request(Str())
     # @return_reply(Str(multiple=True))
     @return_reply()
+    @gen.coroutine
     def request_quantiser_snapshot(self, sock, source_name):
         """
         Get a list of values representing the quantised spectrum for
@@ -587,17 +689,19 @@ class Corr2Server(DeviceServer):
         :return:
         """
         if source_name.strip() == '':
-            return self._log_excep(None, 'No source name given.')
+            raise gen.Return(self._log_excep(None, 'No source name given.'))
         try:
-            snapdata = self.instrument.fops.get_quant_snap(source_name)
+            snapdata = yield self._run_blocking(
+                ['quantiser'], self.instrument.fops.get_quant_snap, source_name)
         except Exception as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace, ex.message)
-        sock.inform(source_name, str(snapdata))
-        return 'ok',
+            raise gen.Return(self._log_stacktrace(stack_trace, ex.message))
+        self._inform_array(sock, source_name, snapdata, 'complex64')
+        raise gen.Return(('ok',))
 
     @request(Str(), Int())
     @return_reply()
+    @gen.coroutine
     def request_quantiser_singlechan_snapshot(self, sock, source_name, channel_select):
         """
         Get a list of values representing the quantised spectrum for
@@ -608,16 +712,19 @@ class Corr2Server(DeviceServer):
         :return:
         """
         if source_name.strip() == '':
-            return self._log_excep(None, 'No source name given.')
+            raise gen.Return(self._log_excep(None, 'No source name given.'))
         try:
-            snapdata = self.instrument.fops.get_quant_snap(source_name, channel_select)
+            snapdata = yield self._run_blocking(
+                ['quantiser'], self.instrument.fops.get_quant_snap, source_name,
+                channel_select)
         except Exception as ex:
-            return self._log_excep(ex, ex.message)
-        sock.inform(source_name, str(snapdata))
-        return 'ok',
+            raise gen.Return(self._log_excep(ex, ex.message))
+        self._inform_array(sock, source_name, snapdata, 'complex64')
+        raise gen.Return(('ok',))
 
     @request(Str(), Float(default=-1))
     @return_reply(Int())
+    @gen.coroutine
     def request_adc_snapshot(self, sock, source_name, capture_time):
         """
         Request a snapshot of ADC data for a specific source, at a
@@ -628,17 +735,18 @@ class Corr2Server(DeviceServer):
         :return:
         """
         if source_name.strip() == '':
-            return self._log_excep(None, 'No source name given.')
+            raise gen.Return(self._log_excep(None, 'No source name given.'))
         try:
-            data = self.instrument.fops.get_adc_snapshot(
+            data = yield self._run_blocking(
+                ['adc'], self.instrument.fops.get_adc_snapshot,
                 source_name, capture_time)
             snaptime = data[source_name].timestamp
-            rstr = str(data[source_name].data)
-            sock.inform(source_name, rstr)
-            return 'ok', snaptime
+            self._inform_array(sock, source_name, data[source_name].data,
+                               'float32')
         except ValueError as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace, ex.message)
+            raise gen.Return(self._log_stacktrace(stack_trace, ex.message))
+        raise gen.Return(('ok', snaptime))
 
     @request(Bool())
     @return_reply()
@@ -663,6 +771,7 @@ class Corr2Server(DeviceServer):
 
     @request()
     @return_reply(Int())
+    @gen.coroutine
     def request_transient_buffer_trigger(self, sock):
         """
         Get ADC snapshots for all data sources, hopefully triggered at the
@@ -671,19 +780,20 @@ class Corr2Server(DeviceServer):
         :return:
         """
         try:
-            data = self.instrument.fops.get_adc_snapshot()
-            for source in data:
-                rstr = str(data[source].data)
-                sock.inform(source, rstr)
-            snaptime = data[data.keys()[0]].timestamp
-            return 'ok', snaptime
+            data = yield self._run_blocking(
+                ['adc'], self.instrument.fops.get_adc_snapshot)
+            for ctr, source in enumerate(data.input_names):
+                self._inform_array(sock, source, data.data[ctr], 'float32')
+            snaptime = data.timestamp[0]
         except ValueError as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace, 'Failed to read ADC voltage data from '
-                                                     'transient buffers.')
+            raise gen.Return(self._log_stacktrace(stack_trace, 'Failed to read ADC voltage data from '
+                                                               'transient buffers.'))
+        raise gen.Return(('ok', snaptime))
 
     @request(Str(), Float(default='', multiple=True))
     @return_reply(Str(multiple=True))
+    @gen.coroutine
     def request_beam_weights(self, sock, beam_name, *weight_list):
         """
         Set the weights for all inputs of a given beam
@@ -693,27 +803,29 @@ class Corr2Server(DeviceServer):
         :return: a list of the weights set
         """
         if not self.instrument.found_beamformer:
-            return self._log_excep(None, 'Cannot run beamformer commands with '
-                                         'no beamformer')
+            raise gen.Return(self._log_excep(None, 'Cannot run beamformer commands with '
+                                                   'no beamformer'))
         if weight_list != '':
             try:
-                self.instrument.bops.set_beam_weights(
+                yield self._run_blocking(
+                    ['beam'], self.instrument.bops.set_beam_weights,
                     weight_list, beam_name)
             except Exception as ex:
                 stack_trace = traceback.format_exc()
-                return self._log_stacktrace(stack_trace,
-                    'Failed setting beamweights for beam {0}.'.format(beam_name))
+                raise gen.Return(self._log_stacktrace(stack_trace,
+                    'Failed setting beamweights for beam {0}.'.format(beam_name)))
         try:
-            cur_weights = self.instrument.bops.get_beam_weights(
-                beam_name)
+            cur_weights = yield self._run_blocking(
+                ['beam'], self.instrument.bops.get_beam_weights, beam_name)
         except Exception as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace,
-                'Failed reading beamweights for beam {0}.'.format(beam_name))
-        return tuple(['ok'] + Corr2Server.rv_to_liststr(cur_weights))
+            raise gen.Return(self._log_stacktrace(stack_trace,
+                'Failed reading beamweights for beam {0}.'.format(beam_name)))
+        raise gen.Return(tuple(['ok'] + Corr2Server.rv_to_liststr(cur_weights)))
 
     @request(Str(), Float(default=''))
     @return_reply(Str(multiple=True))
+    @gen.coroutine
     def request_beam_quant_gains(self, sock, beam_name, new_gain):
         """
         Set the quantiser gain for a beam.
@@ -723,26 +835,30 @@ class Corr2Server(DeviceServer):
         :return:
         """
         if not self.instrument.found_beamformer:
-            return self._log_excep(None, 'Cannot run beamformer commands with '
-                                         'no beamformer')
+            raise gen.Return(self._log_excep(None, 'Cannot run beamformer commands with '
+                                                   'no beamformer'))
         if new_gain != '':
             try:
-                self.instrument.bops.set_beam_quant_gain(new_gain, beam_name)
+                yield self._run_blocking(
+                    ['beam'], self.instrument.bops.set_beam_quant_gain,
+                    new_gain, beam_name)
             except Exception as ex:
                 stack_trace = traceback.format_exc()
-                return self._log_stacktrace(stack_trace,
-                        'Failed setting beam gain for beam {0}.'.format(beam_name))
+                raise gen.Return(self._log_stacktrace(stack_trace,
+                        'Failed setting beam gain for beam {0}.'.format(beam_name)))
         try:
-            cur_gains = self.instrument.bops.get_beam_quant_gain(beam_name)
+            cur_gains = yield self._run_blocking(
+                ['beam'], self.instrument.bops.get_beam_quant_gain, beam_name)
         except Exception as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace,
-                        'Failed reading beam gain for beam {0}.'.format(beam_name))
-        return tuple(['ok'] + Corr2Server.rv_to_liststr(cur_gains))
+            raise gen.Return(self._log_stacktrace(stack_trace,
+                        'Failed reading beam gain for beam {0}.'.format(beam_name)))
+        raise gen.Return(tuple(['ok'] + Corr2Server.rv_to_liststr(cur_gains)))
 
 
     @request()
     @return_reply()
+    @gen.coroutine
     def request_vacc_sync(self, sock):
         """
         Initiate a new vacc sync operation on the instrument.
@@ -750,14 +866,15 @@ class Corr2Server(DeviceServer):
         :return:
         """
         try:
-            self.instrument.xops.vacc_sync()
+            yield self._run_blocking(['xeng'], self.instrument.xops.vacc_sync)
         except Exception as ex:
             stack_trace = traceback.format_exc()
-            return self._log_stacktrace(stack_trace, 'Failed syncing vaccs')
-        return 'ok',
+            raise gen.Return(self._log_stacktrace(stack_trace, 'Failed syncing vaccs'))
+        raise gen.Return(('ok',))
 
     @request(Str())
     @return_reply()
+    @gen.coroutine
     def request_fft_shift(self, sock, new_shift):
         """
         Set a new FFT shift schedule.
@@ -770,10 +887,11 @@ class Corr2Server(DeviceServer):
         except ValueError:
             pass
         try:
-            self.instrument.fops.set_fft_shift_all(new_shift)
-            return 'ok',
+            yield self._run_blocking(['feng'], self.instrument.fops.set_fft_shift_all,
+                                     new_shift)
         except Exception as ex:
-            return self._log_excep(ex, 'Failed setting fft shift')
+            raise gen.Return(self._log_excep(ex, 'Failed setting fft shift'))
+        raise gen.Return(('ok',))
 
     @request(Int(default=-1))
     @return_reply()
@@ -857,6 +975,30 @@ class Corr2Server(DeviceServer):
 
             return 'ok', check_time
 
+    @request(Str(), Float(default=0.0), Int(default=1000))
+    @return_reply(Int(min=0))
+    def request_sensor_history(self, sock, sensor_name, since, max_samples):
+        """
+        Get the recent readings of a sensor, kept if the instrument config
+        has a sensor_history_length. Each reading is sent as an inform of
+        timestamp, status and value.
+        :param sock:
+        :param sensor_name: the sensor
+        :param since: only readings taken after this UNIX time
+        :param max_samples: decimate to at most this many readings
+        :return: the number of readings sent
+        """
+        try:
+            samples = self.instrument.sensor_manager.sensor_history(
+                sensor_name, since, max_samples)
+        except Exception as ex:
+            return self._log_excep(
+                ex, 'Failed to get the history of sensor {}.'.format(
+                    sensor_name))
+        for timestamp, status, value in samples:
+            sock.inform(timestamp, status, value)
+        return 'ok', len(samples)
+
     @request()
     @return_reply(Int(min=0))
     def request_get_log(self, sock):
@@ -947,11 +1089,11 @@ class Corr2Server(DeviceServer):
         :return:
         """
         try:
-            from casperfpga import utils as fpgautils
             fhosts = self.instrument.fhosts
             xhosts = self.instrument.xhosts
-            fpgautils.threaded_fpga_function(fhosts, 10, 'deprogram')
-            fpgautils.threaded_fpga_function(xhosts, 10, 'deprogram')
+            host_executor = self.instrument.host_executor
+            host_executor.threaded_func(fhosts, 10, 'deprogram')
+            host_executor.threaded_func(xhosts, 10, 'deprogram')
         except Exception as ex:
             stack_trace = traceback.format_exc()
             return self._log_stacktrace(stack_trace, 'unknown exception')
@@ -983,7 +1125,7 @@ class Corr2Server(DeviceServer):
                 stack_trace = traceback.format_exc()
                 return self._log_stacktrace(stack_trace, 'Failed setting eq for input {0}'.format(source_name))
         _src = self.instrument.fops.get_eq(source_name)
-        return tuple(['ok'] + Corr2Server.rv_to_liststr(_src[source_name]))
+        return tuple(['ok'] + Corr2Server.rv_to_liststr(_src[source_name].tolist()))
 
     @request(Str(default='', multiple=True))
     @return_reply()
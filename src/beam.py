@@ -1,15 +1,10 @@
 from logging import INFO
-from casperfpga import utils as fpgautils
 
 import fxcorrelator_speadops as speadops
 from data_stream import SPEADStream, BEAMFORMER_FREQUENCY_DOMAIN
 from utils import parse_output_products
 # from corr2LogHandlers import getLogger
 
-THREADED_FPGA_OP = fpgautils.threaded_fpga_operation
-THREADED_FPGA_FUNC = fpgautils.threaded_fpga_function
-
-
 class Beam(SPEADStream):
     def __init__(self, name, index, destination, max_pkt_size, *args, **kwargs):
         """
@@ -21,6 +16,7 @@ class Beam(SPEADStream):
         """
         self.index = index
         self.hosts = []
+        self.host_executor = None
         self.xeng_acc_len = None
         self.chans_total = None
         self.beng_per_host = None
@@ -81,6 +77,7 @@ class Beam(SPEADStream):
                   *args, **kwargs)
         obj.config = beam_dict
         obj.hosts = bhosts
+        obj.host_executor = fengops.corr.host_executor
         obj.speadops = speadops
 
         obj.polarisation = obj.index%2
@@ -125,8 +122,8 @@ class Beam(SPEADStream):
         :return:
         """
         self.descriptors_issue()
-        THREADED_FPGA_FUNC(self.hosts, 5, ('tx_enable',
-                                           [self.index], {}))
+        self.host_executor.threaded_func(self.hosts, 5, ('tx_enable',
+                                                         [self.index], {}))
         self.tx_enabled = True
         self.logger.info('output enabled.')
 
@@ -135,8 +132,8 @@ class Beam(SPEADStream):
         Stop transmission of data streams from the b-engines
         :return:
         """
-        THREADED_FPGA_FUNC(self.hosts, 5, ('tx_disable',
-                                           [self.index], {}))
+        self.host_executor.threaded_func(self.hosts, 5, ('tx_disable',
+                                                         [self.index], {}))
         self.tx_enabled = False
         self.logger.info('output disabled.')
 
@@ -175,7 +172,8 @@ class Beam(SPEADStream):
         Write the destination to the hardware.
         :return:
         """
-        THREADED_FPGA_FUNC(self.hosts, 5, ('beam_destination_set', [self], {}))
+        self.host_executor.threaded_func(self.hosts, 5,
+                                         ('beam_destination_set', [self], {}))
         self.logger.info('destination set to %s.' % (self.destination))
 
 #    @property
@@ -56,7 +56,7 @@ class FpgaBHost(FpgaXHost):
         :return
         """
 
-        self.registers['bf%i_config' % beam.index].write(port=beam.destination.port)
+        self.shadow_write('bf%i_config' % beam.index, port=beam.destination.port)
         self.registers['bf%i_ip' % beam.index].write(ip=int(beam.destination.ip_address))
         self.logger.debug('%s:%i: Beam %i:%s destination set to %s' % (
             self.host, self.index, beam.index, beam.name,
@@ -102,8 +102,7 @@ class FpgaBHost(FpgaXHost):
         :param new_gains: the new gain values to apply; float.
         :return the value actually written to the host
         """
-        reg = self.registers['bf{}_config'.format(beam_index)]
-        reg.write(quant_gain=new_gain)
+        self.shadow_write('bf{}_config'.format(beam_index), quant_gain=new_gain)
         self.logger.debug(
                     '%s:%i: Beam %i: set quant_gain(%.5f)' % (
                         self.host, self.index,
@@ -120,14 +119,12 @@ class FpgaBHost(FpgaXHost):
         return reg.read()['data']['quant_gain']
 
     def tx_disable(self,beam_index):
-        reg = self.registers['bf{}_config'.format(beam_index)]
-        reg.write(txen=False)
+        self.shadow_write('bf{}_config'.format(beam_index), txen=False)
         self.logger.debug('%s:%i: Beam %i: Output disabled' % (
                         self.host, self.index, beam_index))
 
     def tx_enable(self,beam_index):
-        reg = self.registers['bf{}_config'.format(beam_index)]
-        reg.write(txen=True)
+        self.shadow_write('bf{}_config'.format(beam_index), txen=True)
         self.logger.debug('%s:%i: Beam %i: Output enabled' % (
                         self.host, self.index, beam_index))
 
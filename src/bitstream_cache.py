@@ -0,0 +1,127 @@
+"""
+A process-wide cache of parsed fpg files, so that the design information
+for a bitstream is parsed once and shared by all the hosts running it,
+rather than every host re-parsing the same file.
+
+Parsed designs are also pickled to disk, keyed on the md5 of the fpg file,
+so restarted servlets and command-line tools do not parse them again.
+The directory is CORR2_BITSTREAM_CACHE from the environment, or
+~/.corr2/bitstream_cache. Set CORR2_BITSTREAM_CACHE to an empty string to
+keep the cache in memory only.
+"""
+import cPickle
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from casperfpga.casperfpga import parse_fpg
+
+LOGGER = logging.getLogger(__name__)
+
+_cache = {}
+_md5s = {}
+_lock = threading.Lock()
+
+
+def cache_dir():
+    """
+    :return: the on-disk cache directory, or None if disabled
+    """
+    directory = os.environ.get(
+        'CORR2_BITSTREAM_CACHE',
+        os.path.join(os.path.expanduser('~'), '.corr2', 'bitstream_cache'))
+    return directory or None
+
+
+def file_md5(filename):
+    """
+    The md5 of a file, remembered until the file changes.
+    :param filename: the file
+    :return: the hex digest
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    if key not in _md5s:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as fpgfile:
+            for chunk in iter(lambda: fpgfile.read(1 << 20), b''):
+                md5.update(chunk)
+        _md5s[key] = md5.hexdigest()
+    return _md5s[key]
+
+
+def _copy(fpg_info):
+    """
+    casperfpga adds to the device dictionary it is given, so every host
+    gets its own copy of the top levels; the shared parts are left alone.
+    """
+    def copy_dict(dictionary):
+        return {name: dict(info) if isinstance(info, dict) else info
+                for name, info in dictionary.items()}
+    return copy_dict(fpg_info[0]), copy_dict(fpg_info[1])
+
+
+def _disk_load(md5):
+    directory = cache_dir()
+    if directory is None:
+        return None
+    filename = os.path.join(directory, '%s.pickle' % md5)
+    try:
+        with open(filename, 'rb') as picklefile:
+            return cPickle.load(picklefile)
+    except IOError:
+        return None
+    except Exception as exc:
+        LOGGER.warning('Ignoring bad bitstream cache file %s: %s' % (
+            filename, exc))
+        return None
+
+
+def _disk_save(md5, fpg_info):
+    directory = cache_dir()
+    if directory is None:
+        return
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # write and rename, so that other processes never see half a file
+        handle, tmpname = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'wb') as picklefile:
+            cPickle.dump(fpg_info, picklefile, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmpname, os.path.join(directory, '%s.pickle' % md5))
+    except (IOError, OSError) as exc:
+        LOGGER.debug('Could not write bitstream cache: %s' % exc)
+
+
+def get_fpg_info(filename):
+    """
+    Get the parsed design information for an fpg file, as given to
+    CasperFpga.get_system_information's fpg_info.
+    :param filename: the fpg file
+    :return: a (device_dict, memorymap_dict) tuple
+    """
+    path = os.path.abspath(filename)
+    with _lock:
+        key = (path, file_md5(path))
+        if key not in _cache:
+            fpg_info = _disk_load(key[1])
+            if fpg_info is None:
+                LOGGER.info('Parsing %s' % path)
+                fpg_info = parse_fpg(path)
+                _disk_save(key[1], fpg_info)
+            _cache[key] = fpg_info
+        return _copy(_cache[key])
+
+
+def clear():
+    """
+    Forget all the designs parsed by this process.
+    :return:
+    """
+    with _lock:
+        _cache.clear()
+        _md5s.clear()
+# end
@@ -141,7 +141,8 @@ class MonitoringLoop(object):
         # check host type
         if host.host_type == 'fhost':
             if check_fhosts:
-                board_monitoring_dict_current[host] = self._get_fhost_status(host=host)
+                board_monitoring_dict_current[host] = self._run_on_host(
+                    host, self._get_fhost_status)
 
                 # check error counters if all fhosts have status
                 if len(self.f_eng_board_monitoring_dict_prev) == self.num_fhosts:
@@ -152,7 +153,8 @@ class MonitoringLoop(object):
 
         elif host.host_type == 'xhost' or host.host_type == 'bhost':
             if check_xhosts:
-                board_monitoring_dict_current[host] = self._get_xhost_status(host=host)
+                board_monitoring_dict_current[host] = self._run_on_host(
+                    host, self._get_xhost_status)
 
                 # check errs if all xhosts have status
                 if len(self.x_eng_board_monitoring_dict_prev) == self.num_xhosts:
@@ -208,6 +210,17 @@ class MonitoringLoop(object):
 
         return True
 
+    def _run_on_host(self, host, function):
+        """
+        Run a status check on the host's worker, so that it does not
+        interleave with the sensors' and instrument's use of the host.
+        :param host: the host to check
+        :param function: the check function, called with the host
+        :return: the result of the check
+        """
+        future = self.instrument.host_executor.submit(host, function, host)
+        return future.result(timeout=self.instrument.timeout)
+
     def _get_fhost_status(self, host, corner_turner_check=True,
                           coarse_delay_check=True, rx_reorder_check=True):
         """
@@ -734,7 +747,7 @@ class MonitoringLoop(object):
         :return:
         """
 
-        xhost.registers.control.write(gbe_txen=False)
+        xhost.shadow_write('control', gbe_txen=False)
         self.instrument.logger.warning('xhost%d %s %s output disabled!' %
                                       (xhost.index, xhost.host,
                                       (self.instrument.xops.board_ids[xhost.host] * self.chans_per_xhost,
@@ -748,7 +761,7 @@ class MonitoringLoop(object):
         :return:
         """
 
-        xhost.registers.control.write(gbe_txen=True)
+        xhost.shadow_write('control', gbe_txen=True)
         self.instrument.logger.info('xhost%d %s %s output reenabled!' %
                                     (xhost.index, xhost.host,
                                      (self.instrument.xops.board_ids[
@@ -67,10 +67,141 @@ def prepare_delay_vals(coefficients, sample_rate):
     return Delay(delay_s, delay_coeff[1], phase_offset_s, delta_phase_offset_s)
 
 
+def _coefficients_dtype():
+    import numpy
+    return numpy.dtype([('delay', numpy.float64),
+                        ('delay_delta', numpy.float64),
+                        ('phase_offset', numpy.float64),
+                        ('phase_offset_delta', numpy.float64)])
+
+
+def _quantised_dtype():
+    import numpy
+    return numpy.dtype([('delay_whole', numpy.int64),
+                        ('delay_frac', numpy.int64),
+                        ('delta_delay', numpy.int64),
+                        ('phase', numpy.int64),
+                        ('phase_rate', numpy.int64),
+                        ('delay', numpy.float64),
+                        ('delay_delta', numpy.float64),
+                        ('phase_offset', numpy.float64),
+                        ('phase_offset_delta', numpy.float64),
+                        ('delay_delta_saturated', numpy.bool_),
+                        ('phase_offset_saturated', numpy.bool_),
+                        ('phase_offset_delta_saturated', numpy.bool_)])
+
+
+def process_list_array(delay_list, sample_rate_hz):
+    """
+    Vectorised version of process_list. Given a list of strings or delay
+    tuples, return a numpy structured array with one row per input and
+    fields delay, delay_delta, phase_offset and phase_offset_delta, in the
+    same units as the Delay objects returned by process_list.
+    NOTE: THIS WILL CONVERT SECONDS TO SAMPLES FOR DELAY!
+    :param delay_list: a list of strings (delay,rate:phase,rate) or
+        delay tuples ((delay,rate),(phase,rate))
+    :param sample_rate_hz: the sample rate of the incoming data
+    :return: a numpy structured array
+    """
+    import numpy
+    n_inputs = len(delay_list)
+    try:
+        if all(isinstance(delay, str) for delay in delay_list):
+            for delay in delay_list:
+                if (delay.count(',') != 2) or (delay.count(':') != 1):
+                    raise ValueError(delay)
+            coeffs = numpy.array(
+                ','.join(delay_list).replace(':', ',').split(','),
+                dtype=numpy.float64)
+        else:
+            coeffs = numpy.array(
+                [(delay[0][0], delay[0][1], delay[1][0], delay[1][1])
+                 for delay in delay_list], dtype=numpy.float64)
+        coeffs = coeffs.reshape(n_inputs, 4)
+    except (ValueError, TypeError, IndexError):
+        # let the scalar version find and report the offending input
+        process_list(delay_list, sample_rate_hz)
+        errmsg = 'delay.process_list_array(): given delay list is not a ' \
+                 'valid delay setting'
+        LOGGER.error(errmsg)
+        raise ValueError(errmsg)
+    rv = numpy.zeros(n_inputs, dtype=_coefficients_dtype())
+    # convert delay in time into delay in clock cycles
+    rv['delay'] = coeffs[:, 0] * sample_rate_hz
+    rv['delay_delta'] = coeffs[:, 1]
+    # convert to fractions of a sample
+    rv['phase_offset'] = coeffs[:, 2] / numpy.pi
+    # convert from radians per second to fractions of sample per sample
+    rv['phase_offset_delta'] = coeffs[:, 3] / numpy.pi / sample_rate_hz
+    return rv
+
+
+def quantise_delays(delays, bitshift_schedule=23):
+    """
+    Clip and convert an array of delay coefficients, as returned by
+    process_list_array, to the fixed-point words written to the F-engine
+    delay registers. This does, for all inputs at once, what the
+    Fengine._delay_prepare_* methods do for a single input.
+    :param delays: a numpy structured array from process_list_array
+    :param bitshift_schedule: the bitshift applied to the rates on the FPGA
+    :return: a numpy structured array with the register words, the values
+        that will actually be applied and per-coefficient saturation flags
+    """
+    import numpy
+    bitshift = 2.0 ** bitshift_schedule
+    reg_bp = 31
+    max_positive = 1.0 - 1.0 / (2 ** reg_bp)
+    max_negative = -max_positive
+    rv = numpy.zeros(len(delays), dtype=_quantised_dtype())
+
+    # delay, in samples: whole and fractional parts
+    delay_whole = numpy.trunc(delays['delay'])
+    delay_frac = numpy.trunc((delays['delay'] - delay_whole) * (2 ** 32))
+    rv['delay_whole'] = delay_whole
+    rv['delay_frac'] = delay_frac
+    rv['delay'] = delay_whole + (delay_frac / (2.0 ** 32))
+
+    # delay rate, shifted up by the amount shifted down by on the fpga
+    shifted = delays['delay_delta'] * bitshift
+    rv['delay_delta_saturated'] = (shifted > max_positive) | (shifted < -1.0)
+    rv['delta_delay'] = numpy.trunc(
+        numpy.clip(shifted, -1.0, max_positive) * (2 ** reg_bp))
+    rv['delay_delta'] = rv['delta_delay'] / (2.0 ** reg_bp) / bitshift
+
+    # phase offset, in fractions of pi
+    phase = delays['phase_offset']
+    rv['phase_offset_saturated'] = (phase > max_positive) | \
+                                   (phase < max_negative)
+    rv['phase'] = numpy.trunc(
+        numpy.clip(phase, max_negative, max_positive) * (2 ** reg_bp))
+    rv['phase_offset'] = rv['phase'] / (2.0 ** reg_bp)
+
+    # phase rate, shifted up by the amount shifted down by on the fpga
+    shifted = delays['phase_offset_delta'] * bitshift
+    rv['phase_offset_delta_saturated'] = (shifted > max_positive) | \
+                                         (shifted < max_negative)
+    rv['phase_rate'] = numpy.trunc(
+        numpy.clip(shifted, max_negative, max_positive) * (2 ** reg_bp))
+    rv['phase_offset_delta'] = rv['phase_rate'] / (2.0 ** reg_bp) / bitshift
+    return rv
+
+
+def saturated_inputs(quantised):
+    """
+    Which inputs had one or more coefficients clipped?
+    :param quantised: a numpy structured array from quantise_delays
+    :return: a numpy boolean array, one entry per input
+    """
+    return quantised['delay_delta_saturated'] | \
+        quantised['phase_offset_saturated'] | \
+        quantised['phase_offset_delta_saturated']
+
+
 class Delay(object):
     def __init__(self, delay=0.0, delay_delta=0.0,
                  phase_offset=0.0, phase_offset_delta=0.0,
-                 load_mcnt=-1, load_count=-1, arm_count=-1, last_load_success=True):
+                 load_mcnt=-1, load_count=-1, arm_count=-1, last_load_success=True,
+                 saturated=False):
         """
         :param delay is in samples
         :param delay_delta is in samples per sample
@@ -80,6 +211,7 @@ class Delay(object):
         :param load_cnt is integer
         :param arm_cnt is integer
         :param last_load_success: boolean, did the last delay load succeed?
+        :param saturated: boolean, were any of the coefficients clipped?
         """
         self.delay = delay
         self.delay_delta = delay_delta
@@ -89,6 +221,7 @@ class Delay(object):
         self.last_load_success = last_load_success
         self.load_count = load_count
         self.arm_count = arm_count
+        self.saturated = saturated
         self.error = Event()
 
     # @classmethod
@@ -1,6 +1,5 @@
 import time
 from logging import INFO
-import struct
 
 import casperfpga.memory as caspermem
 from casperfpga.transport_skarab import SkarabTransport
@@ -32,17 +31,25 @@ class InputNotFoundError(ValueError):
 
 class AdcData(object):
     """
-    Container for lists of ADC data
+    Container for arrays of ADC data
     """
-    def __init__(self, timestamp, data):
+    def __init__(self, timestamp, data, input_names=None):
         """
 
-        :param timestamp: int, system time at which the data was read
-        :param data: a list of the data, sample-by-sample
+        :param timestamp: int, system time at which the data was read. An
+            array of per-input timestamps for multi-input data.
+        :param data: a numpy float32 array of the data, sample-by-sample.
+            For multi-input data, one row per input.
+        :param input_names: for multi-input data, the input name of each row
         :return:
         """
         self.timestamp = timestamp
         self.data = data
+        self.input_names = input_names
+
+
+# EQ BRAM writes are done in pages of this many channels
+EQ_PAGE_CHANS = 256
 
 
 def delay_get_bitshift(bitshift_schedule=23):
@@ -102,6 +109,9 @@ class Fengine(object):
         self.eq_bram_name = 'eq%i' % offset
         self.last_delay = delayops.Delay()
         self.last_eq = None
+        # is last_eq known to be what is in the BRAM, rather than e.g. from
+        # a saved state?
+        self.last_eq_verified = False
 
     @property
     def name(self):
@@ -129,37 +139,10 @@ class Fengine(object):
         Read the post-quantisation snapshot for this fengine.
         snapshot data.
         :param channel_select: If a value is passed here, a time-series of a single channel is returned, if not, a spectrum is returned.
-        :return: a numpy array of complex values
+        :return: a numpy complex64 array
         """
-        import numpy
-        if channel_select != -1:
-            if channel_select < 0 or channel_select >= self.host.n_chans:
-                raise ValueError("channel_select should be between 0 and {}, but received {}!".format(self.host.n_chans, channel_select))
-            chan_group = int(channel_select) / 4
-            which_chan = int(channel_select) % 4
-            self.host.registers.quant_snap_ctrl.write(single_channel=True, channel_select=chan_group)
-            snapshot = self.host.snapshots['snap_quant%i_ss' % self.offset]
-            sdata = snapshot.read()['data']
-            compl = numpy.vectorize(complex)(sdata['real{}'.format(which_chan)], sdata['imag{}'.format(which_chan)])
-            return compl
-        else:
-            try:
-                self.host.registers.quant_snap_ctrl.write(single_channel=False)
-            except:
-                pass
-            snapshot = self.host.snapshots['snap_quant%i_ss'%self.offset]
-            #calculate number of snapshot reads required:
-            n_reads=float(self.host.n_chans)/(2**int(snapshot.block_info['snap_nsamples']))/4
-            compl = []
-            for read_n in range(int(numpy.ceil(n_reads))):
-                offset = read_n * (2**int(snapshot.block_info['snap_nsamples']))
-                sdata = snapshot.read(offset=offset)['data']
-                for ctr in range(0, len(sdata['real0'])):
-                    compl.append(complex(sdata['real0'][ctr], sdata['imag0'][ctr]))
-                    compl.append(complex(sdata['real1'][ctr], sdata['imag1'][ctr]))
-                    compl.append(complex(sdata['real2'][ctr], sdata['imag2'][ctr]))
-                    compl.append(complex(sdata['real3'][ctr], sdata['imag3'][ctr]))
-            return compl[0:self.host.n_chans]
+        return self.host.get_quant_snapshots(
+            channel_select=channel_select, fengines=[self])[0]
 
     def delay_set(self, delay_obj):
         """
@@ -180,6 +163,58 @@ class Fengine(object):
 
         # arm the timed load latches
         status=self.host.registers['tl_cd%i_status'%self.offset].read()['data']
+        self.delay_check_load(status)
+        self.last_delay.load_mcnt=self._arm_timed_latch(mcnt=delay_obj.load_mcnt)
+        self.logger.debug("New delay model applied: {}".format(self.last_delay.__str__()))
+        return self.last_delay.last_load_success
+
+    def delay_prepare(self, quantised):
+        """
+        Get the register words for this input's row of a quantised delay
+        array, as produced by delay.quantise_delays, without touching the
+        hardware. Used by the host to batch the delay writes for all of its
+        F-engines.
+        :param quantised: a row of a delay.quantise_delays array
+        :return: a tuple: (list of (register_name, word) tuples,
+            delay.Delay object with the values that will be applied)
+        """
+        applied = delayops.Delay(
+            delay=float(quantised['delay']),
+            delay_delta=float(quantised['delay_delta']),
+            phase_offset=float(quantised['phase_offset']),
+            phase_offset_delta=float(quantised['phase_offset_delta']))
+        if quantised['delay_delta_saturated']:
+            self.logger.warn('Setting largest possible delay delta, '
+                             'set %e.' % applied.delay_delta)
+            applied.saturated = True
+        if quantised['phase_offset_saturated']:
+            self.logger.warn('Setting largest possible phase, '
+                             'set %e.' % applied.phase_offset)
+            applied.saturated = True
+        if quantised['phase_offset_delta_saturated']:
+            self.logger.warn('Setting largest possible phase delta, '
+                             'set %e.' % applied.phase_offset_delta)
+            applied.saturated = True
+        self.logger.debug("Processing request for delay model: {}.".format(applied.__str__()))
+        words = [
+            ('delay_whole%i' % self.offset, int(quantised['delay_whole'])),
+            ('delay_frac%i' % self.offset, int(quantised['delay_frac'])),
+            ('delta_delay%i' % self.offset, int(quantised['delta_delay'])),
+            ('phase%i' % self.offset, self._delay_field_word(
+                'phase%i' % self.offset, 'initial', quantised['phase'])),
+            ('phase_rate%i' % self.offset, self._delay_field_word(
+                'phase_rate%i' % self.offset, 'delta', quantised['phase_rate'])),
+        ]
+        return words, applied
+
+    def delay_check_load(self, status):
+        """
+        Check whether the previous delay model was loaded, using the
+        contents of this input's timed latch status register.
+        Updates self.last_delay.
+        :param status: dictionary with load_count and arm_count fields
+        :return: True if the last model was loaded, False otherwise
+        """
         load_count=status['load_count']
         arm_count=status['arm_count']
         if load_count != self.last_delay.load_count:
@@ -196,58 +231,89 @@ class Fengine(object):
             self.last_delay.last_load_success=False
         self.last_delay.load_count = load_count
         self.last_delay.arm_count = arm_count
-        self.last_delay.load_mcnt=self._arm_timed_latch(mcnt=delay_obj.load_mcnt)
-        self.logger.debug("New delay model applied: {}".format(self.last_delay.__str__()))
         return self.last_delay.last_load_success
 
-    def _arm_timed_latch(self, mcnt):
+    def timed_latch_words(self, mcnt):
         """
-        Arms the delay correction timed latch.
-        Optimisations bypass normal register bitfield operations.
-        :param names: name of latch to trigger
+        Calculate the timed latch control words for a given load mcnt.
         :param mcnt: sample mcnt to trigger at.
-        :return ::
+        :return: a tuple: (mcnt_rounded, (control1_name, lsw),
+            (control0_name, msw, arm_offset))
         """
-        control1_reg = self.host.registers['delay%i_tl_control1' % self.offset]
-        control0_reg = self.host.registers['delay%i_tl_control0' % self.offset]
-        ao=control0_reg._fields['arm'].offset
+        control0_name = 'delay%i_tl_control0' % self.offset
+        control1_name = 'delay%i_tl_control1' % self.offset
+        ao = self.host.registers[control0_name]._fields['arm'].offset
         #TODO: don't floor the timestamp, but round it sanely.
         mcnt_rounded = (int(mcnt)>>self.host.timestamp_decimation)<<self.host.timestamp_decimation
         self.logger.debug('Requested load mcnt %i rounded to %i.'%(mcnt,mcnt_rounded))
         load_time_lsw = mcnt_rounded - (int(mcnt_rounded/(2**32)))*(2**32)
         load_time_msw = int(mcnt_rounded/(2**32))
-        control1_reg.write_int(load_time_lsw)
+        return (mcnt_rounded, (control1_name, load_time_lsw),
+                (control0_name, load_time_msw, ao))
+
+    def _arm_timed_latch(self, mcnt):
+        """
+        Arms the delay correction timed latch.
+        Optimisations bypass normal register bitfield operations.
+        :param names: name of latch to trigger
+        :param mcnt: sample mcnt to trigger at.
+        :return ::
+        """
+        mcnt_rounded, control1, control0 = self.timed_latch_words(mcnt)
+        control1_reg = self.host.registers[control1[0]]
+        control0_reg = self.host.registers[control0[0]]
+        load_time_msw, ao = control0[1], control0[2]
+        control1_reg.write_int(control1[1])
         control0_reg.write_int((1<<ao)+(load_time_msw))
         control0_reg.write_int((0<<ao)+(load_time_msw))
         return mcnt_rounded
 
-    def _delay_write_delay(self, delay):
+    def _delay_field_word(self, register_name, field_name, prep_int):
+        """
+        Place an already-quantised field value into its register word.
+        :param register_name: the register in which the field lives
+        :param field_name: the name of the field
+        :param prep_int: the fixed-point integer value of the field
+        :return: the 32-bit register word
+        """
+        field = self.host.registers[register_name]._fields[field_name]
+        mask = (1 << field.width_bits) - 1
+        return (int(prep_int) & mask) << field.offset
+
+    def _delay_prepare_delay(self, delay):
         """
         delay is in samples. Can be fractional.
+        :return: (whole register word, fractional register word, actual value)
         """
         delay_whole = int(delay)
         delay_frac = delay - delay_whole
-        
+
         prep_whole = delay_whole
         prep_frac = int((delay_frac*(2**32)))
 
-        delay_reg_whole = self.host.registers['delay_whole%i' % self.offset].write_int(prep_whole)
-        delay_reg_frac = self.host.registers['delay_frac%i' % self.offset].write_int(prep_frac)
-
         self.logger.debug('Setting delay_whole register to 0x%08x, from request for %i samples.' % (prep_whole,delay_whole))
         self.logger.debug('Setting delay_frac register to 0x%08x, from request for %f samples.' % (prep_frac,delay_frac))
-        
+
         act_value = prep_whole + (prep_frac/(2.0**32))
 
+        return prep_whole, prep_frac, act_value
+
+    def _delay_write_delay(self, delay):
+        """
+        delay is in samples. Can be fractional.
+        """
+        prep_whole, prep_frac, act_value = self._delay_prepare_delay(delay)
+        self.host.registers['delay_whole%i' % self.offset].write_int(prep_whole)
+        self.host.registers['delay_frac%i' % self.offset].write_int(prep_frac)
         return act_value
 
-    def _delay_write_delay_rate(self, delay_rate):
+    def _delay_prepare_delay_rate(self, delay_rate):
         """
         Rate is unitless (eg in samples/sample).
         Range: -1.0 to +1.0
+        :return: (register word, actual value)
         """
         bitshift = delay_get_bitshift(bitshift_schedule=23)
-        delay_delta_reg = self.host.registers['delta_delay%i' % self.offset]
         # shift up by amount shifted down by on fpga
         delta_delay_shifted = float(delay_rate) * bitshift
 
@@ -275,16 +341,22 @@ class Fengine(object):
         prep_int=int(delta_delay_shifted*(2**reg_bp))
         act_value = (float(prep_int)/(2**reg_bp))/bitshift
         self.logger.debug('Setting delay delta to %e samples/sample (reg 0x%08X), mapped from %e samples/sample request.' %(act_value, prep_int,delay_rate))
-        delay_delta_reg.write_int(prep_int)
+        return prep_int, act_value
+
+    def _delay_write_delay_rate(self, delay_rate):
+        """
+        Rate is unitless (eg in samples/sample).
+        Range: -1.0 to +1.0
+        """
+        prep_int, act_value = self._delay_prepare_delay_rate(delay_rate)
+        self.host.registers['delta_delay%i' % self.offset].write_int(prep_int)
         return act_value
 
-    def _delay_write_phase(self, phase):
+    def _delay_prepare_phase(self, phase):
         """
         Phase is in fractions of pi radians (-1 to 1 corresponds to -180degrees to +180 degrees).
-        :return:
+        :return: (fixed-point field value, actual value)
         """
-        phase_reg = self.host.registers['phase%i' % self.offset]
-
         #figure out register offsets and widths
         initial_reg_bp = 31 #phase_reg._fields['initial'].binary_pt
         initial_reg_bw = 32 #phase_reg._fields['initial'].width_bits
@@ -308,17 +380,25 @@ class Fengine(object):
         act_value_initial = (float(prep_int_initial)/(2**initial_reg_bp))
         #if phase<0: act_value_initial-=(2**initial_reg_bw)  # Seems to me as though this shouldn't be here. (JS)
         self.logger.debug('Writing initial phase to %e*pi radians (reg: 0x%08X), mapped from %e request.' % (act_value_initial,prep_int_initial,phase))
+        return prep_int_initial, act_value_initial
+
+    def _delay_write_phase(self, phase):
+        """
+        Phase is in fractions of pi radians (-1 to 1 corresponds to -180degrees to +180 degrees).
+        :return:
+        """
+        prep_int_initial, act_value_initial = self._delay_prepare_phase(phase)
         # actually write the values to the register
-        phase_reg.write(initial=phase)
+        self.host.registers['phase%i' % self.offset].write(
+            initial=act_value_initial)
         return act_value_initial
 
-    def _delay_write_phase_rate(self, phase_rate):
+    def _delay_prepare_phase_rate(self, phase_rate):
         """
         Phase rate is in pi radians/sample. (eg value of 0.5 would increment phase by 0.5*pi radians every sample)
-        :return:
+        :return: (fixed-point field value, actual value)
         """
         bitshift = delay_get_bitshift()
-        phase_rate_reg = self.host.registers['phase_rate%i' % self.offset]
 
         #figure out register offsets and widths
         delta_reg_bp = 31 #phase_reg._fields['delta'].binary_pt
@@ -343,23 +423,72 @@ class Fengine(object):
         prep_int_delta=int(delta_phase_shifted*(2**delta_reg_bp))
         act_value_delta = (float(prep_int_delta)/(2**delta_reg_bp))/bitshift
         self.logger.debug('Writing %e*pi radians/sample phase delta (reg: 0x%08X), mapped from %e*pi request.' % (act_value_delta,prep_int_delta,phase_rate))
-        phase_rate_reg.write(delta=delta_phase_shifted)
+        return prep_int_delta, act_value_delta
+
+    def _delay_write_phase_rate(self, phase_rate):
+        """
+        Phase rate is in pi radians/sample. (eg value of 0.5 would increment phase by 0.5*pi radians every sample)
+        :return:
+        """
+        prep_int_delta, act_value_delta = self._delay_prepare_phase_rate(phase_rate)
+        self.host.registers['phase_rate%i' % self.offset].write(
+            delta=float(prep_int_delta)/(2**31))
         return act_value_delta
 
     def get_eq(self):
         """
         Read a given EQ BRAM.
-        :return: a list of the complex EQ values from RAM
+        :return: a numpy complex64 array of the EQ values from RAM
         """
+        import numpy
         # eq vals are packed as 32-bit complex (16 real, 16 imag)
         eqvals = self.host.read(self.eq_bram_name, self.host.n_chans*4)
-        eqvals = struct.unpack('>%ih' % (self.host.n_chans*2), eqvals)
-        eqcomplex = []
-        for ctr in range(0, len(eqvals), 2):
-            eqcomplex.append(eqvals[ctr] + (1j * eqvals[ctr+1]))
+        eqvals = numpy.frombuffer(eqvals, dtype='>i2').reshape(-1, 2)
+        eqcomplex = numpy.empty(self.host.n_chans, dtype=numpy.complex64)
+        eqcomplex.real = eqvals[:, 0]
+        eqcomplex.imag = eqvals[:, 1]
         self.last_eq=eqcomplex
+        self.last_eq_verified = True
         return self.last_eq
 
+    def _eq_write(self, coeffs):
+        """
+        Write quantised EQ coefficients to the BRAM. If the values currently
+        in the BRAM are known, and have been verified, only the pages that
+        differ are written.
+        :param coeffs: a (n_chans, 2) numpy int16 array of real, imag pairs
+        :return: the number of channels written
+        """
+        import numpy
+        words = coeffs.astype('>i2')
+        if (self.last_eq is None) or (not self.last_eq_verified) or \
+                (len(self.last_eq) != len(coeffs)):
+            self.host.write(self.eq_bram_name, words.tostring(), 0)
+            return len(coeffs)
+        changed = (coeffs[:, 0] != self.last_eq.real) | \
+                  (coeffs[:, 1] != self.last_eq.imag)
+        n_pages = int(numpy.ceil(len(coeffs) / float(EQ_PAGE_CHANS)))
+        changed = numpy.resize(changed, n_pages * EQ_PAGE_CHANS)
+        changed[len(coeffs):] = False
+        pages = changed.reshape(n_pages, EQ_PAGE_CHANS).any(axis=1)
+        written = 0
+        page = 0
+        while page < n_pages:
+            if not pages[page]:
+                page += 1
+                continue
+            # write runs of changed pages in one go
+            start = page
+            while (page < n_pages) and pages[page]:
+                page += 1
+            start_chan = start * EQ_PAGE_CHANS
+            stop_chan = min(page * EQ_PAGE_CHANS, len(coeffs))
+            self.host.write(self.eq_bram_name,
+                            words[start_chan:stop_chan].tostring(),
+                            start_chan * 4)
+            written += stop_chan - start_chan
+        return written
+
     def set_eq(self, eq_poly=None):
         """
         Write a given complex eq to the given SBRAM.
@@ -368,69 +497,43 @@ class Fengine(object):
         :param eq_poly: a list of polynomial coefficients, or list of float values (must be n_chans long) to write to bram. Set to string 'auto' to have system attempt to automatically set gains (requires sane values to have been set beforehand!).
         :return:
         """
-        coeffs = (self.host.n_chans * 2) * [0]
-        if eq_poly==None:
+        import numpy
+        n_chans = self.host.n_chans
+        eq = numpy.zeros(n_chans, dtype=numpy.complex128)
+        if eq_poly is None:
             self.logger.debug('Setting default eq')
             eq_poly=int(self.host._config['default_eq_poly'])
         try:
-            if eq_poly == 'auto':
-                import numpy
-                target_output=0.1 #this is the goal for numpy.abs(complex_snapshot). For 8.7bit meerkat, total range is thus sqrt((abs(1+1j)))=1.4
-                n_averages=30
-
-                #get an estimate of the current spectrum:
-                chans = range(self.host.n_chans)
-                quant_snapshot = numpy.abs(self.get_quant_snapshot())
-                for i in range(n_averages):
-                    quant_snapshot += numpy.abs(self.get_quant_snapshot())
-                quant_snapshot /= n_averages
-
-                error=target_output/quant_snapshot
-
-                #ignore band edges; only use central 80%:
-                start_chan=int(self.host.n_chans*0.1)
-                stop_chan=int(self.host.n_chans*0.9)
-                eq_poly=numpy.polyfit(chans[start_chan:stop_chan],error[start_chan:stop_chan],3)
-                poly_coeffs=numpy.array(self.get_eq())*numpy.polyval(eq_poly,chans)
-                coeffs[0::2] = [coeff.real for coeff in poly_coeffs]
-                coeffs[1::2] = [coeff.imag for coeff in poly_coeffs]
-                
-            elif len(eq_poly) == self.host.n_chans:
+            if isinstance(eq_poly, str) and (eq_poly == 'auto'):
+                return self.host.auto_eq(fengines=[self])[self.input_number]
+            elif len(eq_poly) == n_chans:
                 # list - one for each channel
-                coeffs[0::2] = [coeff.real for coeff in eq_poly]
-                coeffs[1::2] = [coeff.imag for coeff in eq_poly]
-            elif len(eq_poly)<self.host.n_chans:
+                eq[:] = numpy.asarray(eq_poly, dtype=numpy.complex128)
+            elif len(eq_poly) < n_chans:
                 # polynomial
-                import numpy
-                poly_coeffs=numpy.polyval(eq_poly, range(self.host.n_chans))
-                coeffs[0::2] = [coeff.real for coeff in poly_coeffs]
-                coeffs[1::2] = [coeff.imag for coeff in poly_coeffs]
+                eq[:] = numpy.polyval(eq_poly, numpy.arange(n_chans))
         except TypeError:
                 #single value?
-                coeffs = (self.host.n_chans * 2) * [0]
-                coeffs[0::2] = [eq_poly.real for coeff in range(self.host.n_chans)]
-                coeffs[1::2] = [eq_poly.imag for coeff in range(self.host.n_chans)]
+                eq[:] = eq_poly
 
         #Ensure coeffs values can be stored in 16 bits
-        saturated_channels_count=0
-        for i in range(len(coeffs)):
-            if(coeffs[i] > 32767):
-                coeffs[i]=32767
-                saturated_channels_count+=1
-            elif(coeffs[i] < -32767):
-                coeffs[i] =-32767
-                saturated_channels_count+=1
-
-        creal = coeffs[0::2]
-        cimag = coeffs[1::2]
-        ss = struct.pack('>%ih' % (self.host.n_chans * 2), *coeffs)
-        self.host.write(self.eq_bram_name, ss, 0)
-        self.last_eq=[complex(creal[i],cimag[i]) for i in range(self.host.n_chans)]
+        coeffs = numpy.empty((n_chans, 2), dtype=numpy.float64)
+        coeffs[:, 0] = eq.real
+        coeffs[:, 1] = eq.imag
+        saturated = (coeffs > 32767) | (coeffs < -32767)
+        saturated_channels_count = int(saturated.any(axis=1).sum())
+        coeffs = numpy.clip(coeffs, -32767, 32767).astype(numpy.int16)
+
+        self._eq_write(coeffs)
+        self.last_eq = numpy.empty(n_chans, dtype=numpy.complex64)
+        self.last_eq.real = coeffs[:, 0]
+        self.last_eq.imag = coeffs[:, 1]
+        self.last_eq_verified = True
         if(saturated_channels_count != 0):
             self.logger.warn('EQ values adjusted. %i channels saturated.'%saturated_channels_count)
-        mean_real = sum(creal)/len(creal)
-        mean_imag = sum(cimag)/len(creal)
-        self.logger.info('EQ updated mean (%i+%ij): ...%s...'%(mean_real,mean_imag,self.last_eq[self.host.n_chans/2-3:self.host.n_chans/2+3]))
+        mean_real = coeffs[:, 0].mean()
+        mean_imag = coeffs[:, 1].mean()
+        self.logger.info('EQ updated mean (%i+%ij): ...%s...'%(mean_real,mean_imag,self.last_eq[n_chans/2-3:n_chans/2+3]))
 
         return self.last_eq
 
@@ -446,6 +549,24 @@ class FpgaFHost(FpgaHost):
     """
     A Host, that hosts Fengines, that is a CASPER KATCP FPGA.
     """
+    STATUS_BUNDLES = {
+        'cd': ['cd_hmc_hmc_delay_status0', 'cd_hmc_hmc_delay_status1',
+               'cd_hmc_hmc_delay_status2', 'cd_hmc_hmc_delay_status3',
+               'cd_hmc_req_hmc_cd0', 'cd_hmc_req_hmc_cd1'],
+        'ct': ['hmc_ct_status0', 'hmc_ct_status1', 'hmc_ct_status2'],
+        'pfb': ['pfb_status', 'pfb_pwr0', 'pfb_pwr1'],
+        'quant': ['quant_pwr0', 'quant_pwr1'],
+        'adc': ['adc_dev{offset}', 'adc_pwr{offset}',
+                'unpack_adc_clip{offset}'],
+        'pack': ['pack_dv_err'],
+        'unpack': ['unpack_status', 'unpack_status1'],
+        'sync': ['sync_status', 'sync_status0', 'sync_status1',
+                 'sync_status2'],
+        'rx_reorder': ['reorder_ctrs', 'reorder_status', 'reorder_status1'],
+        'timed_latch': ['tl_cd{offset}_status'],
+        'control': ['control'],
+    }
+
     def __init__(self, host, katcp_port=7147, bitstream=None,
                  connect=True, config=None, **kwargs):
         super(FpgaFHost, self).__init__(host=host, katcp_port=katcp_port,
@@ -503,10 +624,11 @@ class FpgaFHost(FpgaHost):
         self.host_type = 'fhost'
 
     @classmethod
-    def from_config_source(cls, hostname, katcp_port, config_source, **kwargs):
+    def from_config_source(cls, hostname, katcp_port, config_source,
+                           connect=True, **kwargs):
         bitstream = config_source['bitstream']
         return cls(hostname, katcp_port, bitstream=bitstream,
-                   connect=True, config=config_source, **kwargs)
+                   connect=connect, config=config_source, **kwargs)
 
     def get_local_time(self,src=0):
         """
@@ -514,8 +636,8 @@ class FpgaFHost(FpgaHost):
         :param: src: 0 for direct (out of unpack), 1 is out of reorder, 2 out of PFB, 3 into pack block.
         :return: time in samples since the digitiser epoch
         """
-        self.registers.control.write(local_time_source=src)
-        self.registers.control.write(local_time_capture='pulse')
+        self.shadow_write('control', local_time_source=src)
+        self.shadow_write('control', local_time_capture='pulse')
         lsw = self.registers.local_time_lsw.read()['data']['timestamp_lsw']
         msw = self.registers.local_time_msw.read()['data']['timestamp_msw']
         rv = (msw << 32) | lsw
@@ -526,8 +648,8 @@ class FpgaFHost(FpgaHost):
         Clear the status registers and counters on this host
         :return:
         """
-        self.registers.control.write(status_clr='pulse', gbe_cnt_rst='pulse',
-                                     cnt_rst='pulse')
+        self.shadow_write('control', status_clr='pulse', gbe_cnt_rst='pulse',
+                          cnt_rst='pulse')
         # self.registers.control.write(gbe_cnt_rst='pulse')
         self.logger.debug('{}: status cleared.'.format(self.host))
 
@@ -544,9 +666,9 @@ class FpgaFHost(FpgaHost):
         Optionally enable the automatic hardware check (and reset).
         This catches some HMC errors (where it doesn't return data for all read requests).
         """
-        self.registers.time_check.write(max_difference=max_latency)
+        self.shadow_write('time_check', max_difference=max_latency)
         if autoresync:
-            self.registers.control.write(time_diff_check_en=True)
+            self.shadow_write('control', time_diff_check_en=True)
         return
 
 
@@ -584,6 +706,125 @@ class FpgaFHost(FpgaHost):
         raise InputNotFoundError('{host}: Fengine {feng} not found on this '
                                  'host.'.format(host=self.host, feng=feng_name))
 
+    def delay_get_load_counts(self):
+        """
+        Read the timed latch load counts for all the F-engines on this host.
+        :return: a dictionary of load counts, keyed on F-engine input number
+        """
+        status = self.read_registers_batched(
+            ['tl_cd%i_status' % feng.offset for feng in self.fengines])
+        return dict((feng.input_number,
+                     status['tl_cd%i_status' % feng.offset]['load_count'])
+                    for feng in self.fengines)
+
+    def delay_set_all(self, delays, load_mcnt):
+        """
+        Set the delay models for all the F-engines on this host in one go.
+        The register words for all inputs are written with as few bulk
+        transactions as the memory map allows, followed by the timed latch
+        arm for every input.
+        :param delays: a numpy structured array from delay.quantise_delays,
+            indexed by F-engine input number
+        :param load_mcnt: the sample count at which to load the new models
+        :return: a dictionary of last-load-success flags, keyed on F-engine
+            input number
+        """
+        coeff_words = []
+        applied = {}
+        lsw_words = []
+        arm_words = []
+        disarm_words = []
+        load_mcnts = {}
+        for feng in self.fengines:
+            words, applied[feng.input_number] = feng.delay_prepare(
+                delays[feng.input_number])
+            coeff_words.extend(words)
+            mcnt_rounded, control1, control0 = feng.timed_latch_words(
+                load_mcnt)
+            load_mcnts[feng.input_number] = mcnt_rounded
+            lsw_words.append(control1)
+            load_time_msw, ao = control0[1], control0[2]
+            arm_words.append((control0[0], (1 << ao) + load_time_msw))
+            disarm_words.append((control0[0], (0 << ao) + load_time_msw))
+        transactions = self.write_registers_batched(coeff_words)
+        # did the previous models load?
+        status_names = ['tl_cd%i_status' % feng.offset
+                        for feng in self.fengines]
+        status = self.read_registers_batched(status_names)
+        transactions += len(self._register_runs(status_names))
+        # arm the timed load latches
+        transactions += self.write_registers_batched(lsw_words)
+        transactions += self.write_registers_batched(arm_words)
+        transactions += self.write_registers_batched(disarm_words)
+        rv = {}
+        for feng in self.fengines:
+            feng.last_delay.last_load_success = False
+            new_delay = applied[feng.input_number]
+            feng.last_delay.delay = new_delay.delay
+            feng.last_delay.delay_delta = new_delay.delay_delta
+            feng.last_delay.phase_offset = new_delay.phase_offset
+            feng.last_delay.phase_offset_delta = new_delay.phase_offset_delta
+            feng.last_delay.saturated = new_delay.saturated
+            rv[feng.input_number] = feng.delay_check_load(
+                status['tl_cd%i_status' % feng.offset])
+            feng.last_delay.load_mcnt = load_mcnts[feng.input_number]
+            feng.logger.debug('New delay model applied: {}'.format(
+                feng.last_delay.__str__()))
+        self.logger.debug('{}: delays for {} F-engines committed in {} '
+                          'transactions.'.format(self.host, len(self.fengines),
+                                                 transactions))
+        return rv
+
+
+    def auto_eq(self, fengines=None, target_output=0.1, max_averages=31,
+                min_averages=4, tolerance=0.01):
+        """
+        Automatically set the EQs for F-engines on this host, so that the
+        quantiser outputs sit at target_output. All the inputs' quantiser
+        snapshots are read on every pass and averaged in place, stopping
+        early once the average spectra change by less than tolerance.
+        A third-order polynomial is then fitted to the central 80% of the
+        band for all inputs at once, and applied on top of the current EQs.
+        Requires sane EQ values to have been set beforehand!
+        :param fengines: a list of the Fengines to set, all on the host if None
+        :param target_output: the goal for numpy.abs(complex_snapshot). For
+            8.7bit meerkat, total range is thus sqrt((abs(1+1j)))=1.4
+        :param max_averages: the maximum number of snapshots to average
+        :param min_averages: average at least this many snapshots
+        :param tolerance: stop once the largest change in the average
+            spectra, relative to their mean, is below this
+        :return: a dictionary of the new EQs, keyed on input number
+        """
+        import numpy
+        if fengines is None:
+            fengines = self.fengines
+        chans = numpy.arange(self.n_chans)
+        spectra = numpy.zeros((len(fengines), self.n_chans))
+        previous = numpy.zeros((len(fengines), self.n_chans))
+        for n_averages in range(1, max_averages + 1):
+            spectra += numpy.abs(self.get_quant_snapshots(fengines=fengines))
+            if n_averages < min_averages:
+                previous[:] = spectra / n_averages
+                continue
+            estimate = spectra / n_averages
+            change = numpy.abs(estimate - previous).max() / estimate.mean()
+            previous[:] = estimate
+            if change < tolerance:
+                break
+        self.logger.info('Auto EQ: averaged %i snapshots for %i inputs.' % (
+            n_averages, len(fengines)))
+        error = target_output / previous
+
+        #ignore band edges; only use central 80%:
+        start_chan = int(self.n_chans * 0.1)
+        stop_chan = int(self.n_chans * 0.9)
+        poly = numpy.polyfit(chans[start_chan:stop_chan],
+                             error[:, start_chan:stop_chan].T, 3)
+        gains = numpy.dot(numpy.vander(chans, 4), poly).T
+        rv = {}
+        for ctr, feng in enumerate(fengines):
+            rv[feng.input_number] = feng.set_eq(feng.get_eq() * gains[ctr])
+        return rv
 
     def set_fft_shift(self, shift_schedule=None):
         """
@@ -637,7 +878,7 @@ class FpgaFHost(FpgaHost):
                 shift_ok=[]
                 for shift_stages in range(n_stages_total+1):
                     fft_shift=distribute_shifts(n_stages_total,shift_stages)
-                    self.registers.fft_shift.write(fft_shift=fft_shift)
+                    self.shadow_write('fft_shift', fft_shift=fft_shift)
                     shift_ok.append(test_shift_schedule())
                 try:
                     shift_stages=min(n_stages_total,shift_ok.index(True)+3)
@@ -665,7 +906,7 @@ class FpgaFHost(FpgaHost):
                 self.logger.error("FFT shift setting %s not understood. Ignoring."%str(shift_schedule))
                 shift_schedule = self.get_fft_shift()
         self.logger.info("Setting FFT shift to %i (%i stages)."%(shift_schedule,calc_n_stages(shift_schedule)))
-        self.registers.fft_shift.write(fft_shift=shift_schedule)
+        self.shadow_write('fft_shift', fft_shift=shift_schedule)
 
     def get_fft_shift(self):
         """
@@ -675,94 +916,182 @@ class FpgaFHost(FpgaHost):
         """
         return self.registers.fft_shift.read()['data']['fft_shift']
 
-    def get_quant_snapshots(self, channel_select=-1):
+    @staticmethod
+    def _quant_snapshot_words(sdata, which_chan=None):
         """
-        Get the quant snapshots for all the inputs on this host.
-        :return:
+        Unpack one quantiser snapshot read into complex values.
+        :param sdata: the data dictionary of a snap_quant snapshot read
+        :param which_chan: for single-channel snapshots, which of the four
+            channels in each word was selected. None for a spectrum.
+        :return: a numpy complex64 array
+        """
+        import numpy
+        if which_chan is not None:
+            real = numpy.asarray(sdata['real%i' % which_chan])
+            imag = numpy.asarray(sdata['imag%i' % which_chan])
+        else:
+            # four consecutive channels per snapshot word
+            real = numpy.column_stack(
+                [sdata['real%i' % ctr] for ctr in range(4)]).ravel()
+            imag = numpy.column_stack(
+                [sdata['imag%i' % ctr] for ctr in range(4)]).ravel()
+        compl = numpy.empty(len(real), dtype=numpy.complex64)
+        compl.real = real
+        compl.imag = imag
+        return compl
+
+    def get_quant_snapshots(self, channel_select=-1, fengines=None):
+        """
+        Get the quant snapshots for the inputs on this host. For each
+        read offset, all the inputs' snapshots are armed before any is
+        read, so they capture together and the reads go back to back.
+        :param channel_select: If a value is passed here, a time-series of
+            a single channel is returned, if not, a spectrum is returned.
+        :param fengines: a list of the Fengines to read, all on the host if
+            None
+        :return: a numpy complex64 array, one row per Fengine, in order
         """
-        return {
-            feng.name: feng.get_quant_snapshot(channel_select=channel_select)
-            for feng in self.fengines
-        }
+        import numpy
+        if fengines is None:
+            fengines = self.fengines
+        snapshots = [self.snapshots['snap_quant%i_ss' % feng.offset]
+                     for feng in fengines]
+        if channel_select != -1:
+            if channel_select < 0 or channel_select >= self.n_chans:
+                raise ValueError("channel_select should be between 0 and {}, but received {}!".format(self.n_chans, channel_select))
+            chan_group = int(channel_select) / 4
+            which_chan = int(channel_select) % 4
+            self.shadow_write('quant_snap_ctrl', single_channel=True,
+                              channel_select=chan_group)
+            offsets = [-1]
+        else:
+            try:
+                self.shadow_write('quant_snap_ctrl', single_channel=False)
+            except:
+                pass
+            which_chan = None
+            #calculate number of snapshot reads required:
+            snap_len = 2**int(snapshots[0].block_info['snap_nsamples'])
+            n_reads = int(numpy.ceil(float(self.n_chans) / snap_len / 4))
+            offsets = [read_n * snap_len for read_n in range(n_reads)]
+        rv = None
+        pos = 0
+        for offset in offsets:
+            for snapshot in snapshots:
+                snapshot.arm(offset=offset)
+            for ctr, snapshot in enumerate(snapshots):
+                sdata = snapshot.read(arm=False)['data']
+                compl = self._quant_snapshot_words(sdata, which_chan)
+                if rv is None:
+                    rv = numpy.empty((len(snapshots), len(compl) * len(offsets)),
+                                     dtype=numpy.complex64)
+                rv[ctr, pos:pos + len(compl)] = compl
+            pos += len(compl)
+        if channel_select == -1:
+            return rv[:, 0:self.n_chans]
+        return rv
 
     def tx_disable(self):
-        self.registers.control.write(gbe_txen=False)
+        self.shadow_write('control', gbe_txen=False)
 
     def tx_enable(self):
-        self.registers.control.write(gbe_txen=True)
+        self.shadow_write('control', gbe_txen=True)
 
-    def get_cd_status(self):
+    def _status_template_values(self):
+        """
+        {offset} in the status bundles is each F-engine's offset.
+        """
+        return {'offset': [feng.offset for feng in self.fengines]}
+
+    def get_cd_status(self, status=None):
         """
         Retrieves all the Coarse Delay status registers.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         """
+        if status is None:
+            status = self.read_status_bundles(['cd'])
         rv={}
         for i in range(4):
-            rv.update(self.registers['cd_hmc_hmc_delay_status%i'%i].read()['data'])
-        rv['current_cd0']=self.registers['cd_hmc_req_hmc_cd0'].read()['data']['reg']
-        rv['current_cd1']=self.registers['cd_hmc_req_hmc_cd1'].read()['data']['reg']
+            rv.update(status['cd_hmc_hmc_delay_status%i'%i])
+        rv['current_cd0']=status['cd_hmc_req_hmc_cd0']['reg']
+        rv['current_cd1']=status['cd_hmc_req_hmc_cd1']['reg']
         return rv
 
-    def get_ct_status(self):
+    def get_ct_status(self, status=None):
         """
         Retrieve all the Corner-Turner registers.
         returns a list (one per pol on board) of status dictionaries.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         """
+        if status is None:
+            status = self.read_status_bundles(['ct'])
         rv={}
         for i in range(3):
-            rv.update(self.registers['hmc_ct_status%i' %i].read()['data'])
+            rv.update(status['hmc_ct_status%i' %i])
         #rv['hmc0']=self.hmcs.hmc_ct_hmc.get_hmc_status()
         #rv['hmc1']=self.hmcs.hmc_ct_hmc1.get_hmc_status()
         return rv
 
-    def get_pfb_status(self):
+    def get_pfb_status(self, status=None):
         """
         Returns the pfb counters on f-eng
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return: dict
         """
         import numpy
-        rv=self.registers.pfb_status.read()['data']
+        if status is None:
+            status = self.read_status_bundles(['pfb'])
+        rv=dict(status['pfb_status'])
         names=self.registers.pfb_pwr0.block_info['names']
         scale_factor=int(names[5:])
-        rv['pol0_pfb_out_dBFS']=10*numpy.log10(self.registers.pfb_pwr0.read()['data'][names]/scale_factor)
-        rv['pol1_pfb_out_dBFS']=10*numpy.log10(self.registers.pfb_pwr1.read()['data'][names]/scale_factor)
+        rv['pol0_pfb_out_dBFS']=10*numpy.log10(status['pfb_pwr0'][names]/scale_factor)
+        rv['pol1_pfb_out_dBFS']=10*numpy.log10(status['pfb_pwr1'][names]/scale_factor)
         return rv
 
-    def get_quant_status(self):
+    def get_quant_status(self, status=None):
         """
         Returns the EQ/quantiser counters on f-eng
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return: dict
         """
         import numpy
+        if status is None:
+            status = self.read_status_bundles(['quant'])
         rv={}
-        rv['p0_quant_out_dBFS']=10*numpy.log10(self.registers.quant_pwr0.read()['data']['reg'])
-        rv['p1_quant_out_dBFS']=10*numpy.log10(self.registers.quant_pwr1.read()['data']['reg'])
+        rv['p0_quant_out_dBFS']=10*numpy.log10(status['quant_pwr0']['reg'])
+        rv['p1_quant_out_dBFS']=10*numpy.log10(status['quant_pwr1']['reg'])
         return rv
 
-    def get_adc_status(self):
+    def get_adc_status(self, status=None):
         """Return the ADC power levels in dBFS for all polarisations on this host.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return: dict
         """
         import numpy
+        if status is None:
+            status = self.read_status_bundles(['adc'])
         ret={}
         for feng in self.fengines:
-            raw=self.registers['adc_dev%i'%feng.offset].read()['data']
+            raw=status['adc_dev%i'%feng.offset]
             ret['p%i_min'%feng.offset]=raw['min']
             ret['p%i_max'%feng.offset]=raw['max']
             #scale from dBov (square-wave referenced) to dBFS (sine-wave referenced) by adjusting up by 3dB.
-            ret['p%i_pwr_dBFS'%feng.offset]=10*numpy.log10(self.registers['adc_pwr%i'%feng.offset].read()['data']['reg'])+3
-            ret['p%i_dig_clip_cnt'%feng.offset]=self.registers['unpack_adc_clip%i'%feng.offset].read()['data']['sample_cnt']
+            ret['p%i_pwr_dBFS'%feng.offset]=10*numpy.log10(status['adc_pwr%i'%feng.offset]['reg'])+3
+            ret['p%i_dig_clip_cnt'%feng.offset]=status['unpack_adc_clip%i'%feng.offset]['sample_cnt']
         return ret
 
-    def get_adc_snapshots(self, input_name=None, loadcnt=0, timeout=10, trig_level=0):
+    def arm_adc_snapshots(self, loadcnt=0, trig_level=0):
         """
-        Read the ADC snapshots from this Fhost
+        Arm the ADC snapshots on this Fhost.
         :param loadcnt: the trigger/load time in ADC samples.
-        :param timeout: timeout in seconds for snapshot read operation.
         :param trig_level: the oscilloscope-like trigger point (range: 0.0 - 1.0)
-        :return {'p0': AdcData(), 'p1': AdcData()}
+        :return:
         """
-        if input_name != None:
-            fengine = self.get_fengine(input_name)
         if loadcnt>0:
             self.logger.info("Triggering ADC snapshot at %i"%loadcnt)
             ltime_msw = (loadcnt >> 32) & (2**16 - 1)
@@ -778,68 +1107,99 @@ class FpgaFHost(FpgaHost):
         else:
             self.snapshots.snap_adc0_ss.arm(man_trig=True)
             self.snapshots.snap_adc1_ss.arm(man_trig=True)
-        d0 = self.snapshots.snap_adc0_ss.read(arm=False, timeout=timeout)
-        d1 = self.snapshots.snap_adc1_ss.read(arm=False, timeout=timeout)
-        time48_0 = d0['extra_value']['timestamp']
-        time48_1 = d1['extra_value']['timestamp']
-        d = d0['data']
-        d.update(d1['data'])
-        # pack the data into simple lists
-        rvp0 = []
-        rvp1 = []
-        for ctr in range(0, len(d['p0_d0'])):
-            for ctr2 in range(8):
-                rvp0.append(d['p0_d%i' % ctr2][ctr])
-                rvp1.append(d['p1_d%i' % ctr2][ctr])
-        rv= {'p0': AdcData(time48_0, rvp0),
-             'p1': AdcData(time48_1, rvp1)}
+
+    def read_adc_snapshots(self, timeout=10):
+        """
+        Read the already-armed ADC snapshots from this Fhost.
+        :param timeout: timeout in seconds for snapshot read operation.
+        :return: a list of the two polarisations' timestamps, and a
+            (2, n_samples) numpy float32 array of their data
+        """
+        import numpy
+        timestamps = []
+        lanes = []
+        for pol in range(2):
+            snapdata = self.snapshots['snap_adc%i_ss' % pol].read(
+                arm=False, timeout=timeout)
+            timestamps.append(snapdata['extra_value']['timestamp'])
+            # eight samples per snapshot word
+            lanes.append(numpy.column_stack(
+                [snapdata['data']['p%i_d%i' % (pol, ctr)]
+                 for ctr in range(8)]).ravel())
+        return timestamps, numpy.vstack(lanes).astype(numpy.float32)
+
+    def get_adc_snapshots(self, input_name=None, loadcnt=0, timeout=10, trig_level=0):
+        """
+        Read the ADC snapshots from this Fhost
+        :param loadcnt: the trigger/load time in ADC samples.
+        :param timeout: timeout in seconds for snapshot read operation.
+        :param trig_level: the oscilloscope-like trigger point (range: 0.0 - 1.0)
+        :return {'p0': AdcData(), 'p1': AdcData()}
+        """
+        if input_name != None:
+            fengine = self.get_fengine(input_name)
+        self.arm_adc_snapshots(loadcnt=loadcnt, trig_level=trig_level)
+        timestamps, data = self.read_adc_snapshots(timeout=timeout)
+        rv= {'p0': AdcData(timestamps[0], data[0]),
+             'p1': AdcData(timestamps[1], data[1])}
         if input_name != None:
             return rv['p%i' % fengine.offset]
         else:
             return rv
 
-    def get_pack_status(self):
+    def get_pack_status(self, status=None):
         """
         Read the pack (output) status registers.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         """
-        return self.registers.pack_dv_err.read()['data']
+        if status is None:
+            status = self.read_status_bundles(['pack'])
+        return dict(status['pack_dv_err'])
 
-    def get_unpack_status(self):
+    def get_unpack_status(self, status=None):
         """
         Returns the SPEAD counters on this FPGA.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         """
-        rv = None
-        rv = self.registers.unpack_status.read()['data']
-        rv.update(self.registers.unpack_status1.read()['data'])
+        if status is None:
+            status = self.read_status_bundles(['unpack'])
+        rv = dict(status['unpack_status'])
+        rv.update(status['unpack_status1'])
         return rv
 
-    def get_sync_status(self):
+    def get_sync_status(self, status=None):
         """
         Read the synchronisation counters
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return:
         """
+        if status is None:
+            status = self.read_status_bundles(['sync'])
         rv={}
-        if 'sync_status' in self.registers.names():
-            rv.update(self.registers.sync_status.read()['data'])
-        if 'sync_status0' in self.registers.names():
-            rv.update(self.registers.sync_status0.read()['data'])
-        if 'sync_status1' in self.registers.names():
-            rv.update(self.registers.sync_status1.read()['data'])
-        if 'sync_status2' in self.registers.names():
-            rv.update(self.registers.sync_status2.read()['data'])
+        for name in ['sync_status', 'sync_status0', 'sync_status1',
+                     'sync_status2']:
+            if name in status:
+                rv.update(status[name])
         return rv
 
-    def get_rx_reorder_status(self):
+    def get_rx_reorder_status(self, status=None):
         """
         Read the reorder block counters
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return:
         """
-        if 'reorder_ctrs' in self.registers.names():
-            return self.registers.reorder_ctrs.read()['data']
-        elif 'reorder_status' in self.registers.names():
-            rv=self.registers.reorder_status.read()['data']
-        if 'reorder_status1' in self.registers.names():
-            rv.update(self.registers.reorder_status1.read()['data'])
+        if status is None:
+            status = self.read_status_bundles(['rx_reorder'])
+        if 'reorder_ctrs' in status:
+            return dict(status['reorder_ctrs'])
+        elif 'reorder_status' in status:
+            rv=dict(status['reorder_status'])
+        if 'reorder_status1' in status:
+            rv.update(status['reorder_status1'])
         return rv
 
     def subscribe_to_multicast(self):
@@ -848,7 +1208,17 @@ class FpgaFHost(FpgaHost):
         Assumes first 40G interface on SKARAB.
         :return:
         """
-        gbe0_name = self.gbes.names()[0]
+        for gbe, ip_str, n_extra in self.multicast_joins():
+            self.logger.info('Subscribing %s to (%s+%i)' % (gbe.name, ip_str, n_extra))
+            gbe.multicast_receive(ip_str, n_extra)
+
+    def multicast_joins(self):
+        """
+        Which multicast groups should this host join?
+        Assumes first 40G interface on SKARAB.
+        :return: a list of (gbe, address, n_extra) joins, as for
+            gbe.multicast_receive
+        """
         first_ip = self.fengines[0].input.destination.ip_address
         ip_str = str(first_ip)
         ip_range = 0
@@ -861,5 +1231,4 @@ class FpgaFHost(FpgaHost):
             ip_range += this_ip.ip_range
         gbename = self.gbes.names()[0]
         gbe = self.gbes[gbename]
-        self.logger.info('Subscribing %s to (%s+%i)' % (gbe.name, ip_str, ip_range - 1))
-        gbe.multicast_receive(ip_str, ip_range-1)
+        return [(gbe, ip_str, ip_range - 1)]
@@ -8,16 +8,18 @@ from __future__ import print_function
 
 # things all fxcorrelators Instruments do
 
+import os
 import re
+import random
 import time
+import threading
 import katcp
-import signal
 # Yes, I know it's just an integer value
 from logging import INFO
+from concurrent import futures
 
 # from memory_profiler import profile
 
-from casperfpga import utils as fpgautils
 from casperfpga import skarab_fileops as skfops
 import utils
 import xhost_fpga
@@ -30,11 +32,11 @@ from fxcorrelator_xengops import XEngineOperations
 from fxcorrelator_bengops import BEngineOperations
 from fxcorrelator_filterops import FilterOperations
 from data_stream import StreamAddress
+from host_executor import HostExecutor
+import instrument_state
 
 from corr2LogHandlers import getLogger as _getLogger
 
-THREADED_FPGA_OP = fpgautils.threaded_fpga_operation
-THREADED_FPGA_FUNC = fpgautils.threaded_fpga_function
 
 def _disable_write(*args, **kwargs):
     """
@@ -75,6 +77,7 @@ class FxCorrelator(Instrument):
             descriptor,
             config_source=None,
             identifier=-1,
+            connect_hosts=None,
             **kwargs):
         """
         An abstract base class for instruments.
@@ -82,6 +85,8 @@ class FxCorrelator(Instrument):
         :param config_source: The instrument configuration source. Can be a
                               text file, hostname, whatever.
         :param identifier: An optional integer identifier.
+        :param connect_hosts: the hostnames to connect to, all if None,
+                              e.g. for a sensor shard that polls a few
         :return: <nothing>
         """
         # we know about f and x hosts and engines, not just engines and hosts
@@ -96,6 +101,12 @@ class FxCorrelator(Instrument):
         self.bops = None
         self.filtops = None
         self.speadops = None
+        self.host_executor = None
+        self.connect_hosts = connect_hosts
+        self._state_files = {}
+        # only an instrument that has been set up or attached to saves its
+        # state, read-only users must not overwrite it
+        self._state_owner = False
 
         # attributes
         self.katcp_port = None
@@ -113,6 +124,13 @@ class FxCorrelator(Instrument):
         fd_limit = int(self.configd['FxCorrelator'].get('max_fd', 4096))
         resource.setrlimit(resource.RLIMIT_NOFILE, (fd_limit, fd_limit))
 
+        if self.state_filename:
+            self._state_files = {
+                part: instrument_state.StateFile(
+                    instrument_state.part_filename(self.state_filename, part),
+                    self.state_save_interval, self.logger)
+                for part in instrument_state.STATE_PARTS}
+
         # create the host objects
         #self._create_hosts(**kwargs)
 
@@ -131,8 +149,17 @@ class FxCorrelator(Instrument):
         :param program: program the FPGA boards, implies configure
         :param configure: configure the system
         :param require_epoch: the synch epoch MUST be set before init
+        :param progress_callback: a function called with a string
+            describing each step of programming the boards, optional
+        :param attach: if neither programming nor configuring, take the
+            software state from the state file, see attach_state
+        :param force_program: program every host, even those already
+            running the right image, e.g. to recover a wedged board
         :return:
         """
+        progress = kwargs.pop('progress_callback', None)
+        attach = kwargs.pop('attach', False)
+        force_program = kwargs.pop('force_program', False)
         # check that the instrument's synch epoch has been set
         if self.synchronisation_epoch <= 0:
             try:
@@ -167,52 +194,21 @@ class FxCorrelator(Instrument):
                 raise RuntimeError(errmsg)
 
         # connect to the other hosts that make up this correlator
-        THREADED_FPGA_FUNC(self.fhosts + self.xhosts, timeout=self.timeout,
-                           target_function='connect')
+        self.host_executor.threaded_func(
+            self._connected_hosts(self.fhosts + self.xhosts),
+            timeout=self.timeout, target_function='connect')
 
 
         # if we need to program the FPGAs, do so
         xbof = self.xhosts[0].bitstream
         fbof = self.fhosts[0].bitstream
+        programmed = []
         if program:
-            # skfops = casperfpga.skarab_fileops
-            # force the new programming method
             try:
-                function_call = ""
-                def progska_timeout_handler(signum, frame):
-                    raise Exception("Function: {} timed out.".format(function_call))
-    
-                #Setting up timeout signal
-                signal.signal(signal.SIGALRM, progska_timeout_handler)
-
-                function_call = "skfops.upload_to_ram_progska(fbof, self.fhosts)"
-                signal.alarm(int(self.timeout * (len(self.fhosts)**0.5) + 60))
-                skfops.upload_to_ram_progska(fbof, self.fhosts)
-                function_call = "skfops.reboot_skarabs_from_sdram(self.fhosts)"
-                signal.alarm(int(self.timeout))
-                skfops.reboot_skarabs_from_sdram(self.fhosts)
-
-                signal.alarm(int(self.timeout * (len(self.xhosts)**0.5) + 60))
-                function_call = "skfops.upload_to_ram_progska(xbof, self.xhosts)"
-                skfops.upload_to_ram_progska(xbof, self.xhosts)
-                signal.alarm(int(self.timeout))
-                function_call = "skfops.reboot_skarabs_from_sdram(self.xhosts)"
-                skfops.reboot_skarabs_from_sdram(self.xhosts)
-                signal.alarm(0)
-
-                #This signal.alarm is probably not necessary. This is just a catch-all in case things get stuck
-                signal.alarm(self.timeout * (len(self.fhosts) + len(self.xhosts)))
-                function_call = "skfops.wait_after_reboot(self.fhosts + self.xhosts... "
-                skfops.wait_after_reboot(self.fhosts +
-                            self.xhosts, timeout=self.timeout *
-                (len(self.fhosts) + len(self.xhosts)))
-    
-                #Cancel all timeout sigals
-                signal.alarm(0)
-
+                programmed = self._program(fbof, xbof, progress,
+                                           force=force_program)
             except Exception as err:
                 errmsg = 'Failed to program the boards: %s' % str(err)
-                signal.alarm(0)
                 self.logger.error(errmsg)
                 raise
 
@@ -220,15 +216,20 @@ class FxCorrelator(Instrument):
         xisskarab = True
         if (not program) or fisskarab or xisskarab:
             self.logger.info('Loading design information')
-            THREADED_FPGA_FUNC(
+            self.host_executor.threaded_func(
                 self.fhosts, timeout=self.timeout * 10,
                 target_function=('get_system_information', [fbof], {}))
             #THREADED_FPGA_FUNC(
             #    self.fhosts, timeout=self.timeout * 10,
             #    target_function=('get_system_information', [fbof], {'legacy_reg_map' : False}))
-            THREADED_FPGA_FUNC(
+            self.host_executor.threaded_func(
                 self.xhosts, timeout=self.timeout * 10,
                 target_function=('get_system_information', [xbof], {}))
+        if programmed:
+            # so that a rerun can skip them
+            self.host_executor.threaded_func(
+                programmed, timeout=self.timeout,
+                target_function='tag_bitstream')
 
         #Log the bitstreams we're using...
         # Better to stitch a log-string together
@@ -241,7 +242,8 @@ class FxCorrelator(Instrument):
             self.logger.info(bitstream_info_str)
 
         # remove test hardware from designs
-        utils.disable_test_gbes(self)
+        utils.disable_test_gbes(
+            self, self._connected_hosts(self.fhosts + self.xhosts))
         utils.remove_test_objects(self)
         # # disable write access to the correlator
         # if not (enable_write_access or program):
@@ -259,16 +261,133 @@ class FxCorrelator(Instrument):
         if program or configure:
             # Passing args and kwargs through here, for completeness
             self._post_program_initialise(*args, **kwargs)
+        elif attach:
+            self.attach_state()
 
         # set an initialised flag
         self._initialised = True
+        if program or configure:
+            self._state_owner = True
+            for part in instrument_state.STATE_PARTS:
+                self.save_state(part)
+        elif attach:
+            self._state_owner = True
+
+    def _program(self, fbof, xbof, progress=None, force=False):
+        """
+        Program the F- and X-hosts. The two images are uploaded at the same
+        time, each group rebooting as soon as its upload is done. Hosts
+        already running the right image are skipped, unless forced. Every
+        stage has its own deadline.
+        :param fbof: the F-engine fpg file
+        :param xbof: the X-engine fpg file
+        :param progress: a function called with a description of each step
+        :param force: program all the hosts, without checking their images
+        :return: a list of the hosts that were programmed
+        """
+        def report(msg):
+            self.logger.info(msg)
+            if progress is not None:
+                progress(msg)
+
+        groups = []
+        skipped = 0
+        if not force:
+            report('Checking the images running on %i hosts' % (
+                len(self.fhosts) + len(self.xhosts)))
+        for label, bof, hosts in [('F', fbof, self.fhosts),
+                                  ('X', xbof, self.xhosts)]:
+            if force:
+                groups.append((label, bof, hosts))
+                continue
+            result = self.host_executor.run(
+                hosts, (lambda host_: host_.running_bitstream_matches(bof),),
+                timeout=self.timeout * 10)
+            to_program = [host for host in hosts
+                          if not result.successes.get(host.host, False)]
+            skipped += len(hosts) - len(to_program)
+            if to_program:
+                groups.append((label, bof, to_program))
+        if skipped > 0:
+            report('%i hosts already running the right image, skipping '
+                   'them' % skipped)
+
+        pool = futures.ThreadPoolExecutor(max_workers=max(1, len(groups)))
+        try:
+            group_futures = [pool.submit(self._program_group, label, bof,
+                                         hosts, report)
+                             for label, bof, hosts in groups]
+            errors = []
+            for future in group_futures:
+                try:
+                    future.result()
+                except Exception as exc:
+                    errors.append(str(exc))
+        finally:
+            pool.shutdown(wait=False)
+        if errors:
+            raise RuntimeError('; '.join(errors))
+
+        programmed = []
+        for _, _, hosts in groups:
+            programmed.extend(hosts)
+        if programmed:
+            deadline = self.timeout * len(programmed)
+            report('Waiting for %i hosts to boot' % len(programmed))
+            self._program_stage('wait_after_reboot', deadline,
+                                skfops.wait_after_reboot, programmed,
+                                timeout=deadline)
+        report('Programming done: %i hosts programmed, %i skipped' % (
+            len(programmed), skipped))
+        return programmed
+
+    def _program_group(self, label, bof, hosts, report):
+        """
+        Upload an image to a group of hosts and reboot them into it.
+        :param label: the name of the group, for logging
+        :param bof: the fpg file
+        :param hosts: the hosts to program
+        :param report: a function to report progress
+        :return:
+        """
+        report('%s: uploading %s to %i hosts' % (label, bof, len(hosts)))
+        self._program_stage(
+            '%s upload_to_ram_progska' % label,
+            self.timeout * (len(hosts)**0.5) + 60,
+            skfops.upload_to_ram_progska, bof, hosts)
+        report('%s: rebooting %i hosts' % (label, len(hosts)))
+        self._program_stage(
+            '%s reboot_skarabs_from_sdram' % label, self.timeout,
+            skfops.reboot_skarabs_from_sdram, hosts)
+
+    def _program_stage(self, name, deadline, function, *args, **kwargs):
+        """
+        Run one programming stage, in its own thread, with a deadline.
+        :param name: the name of the stage, for logging
+        :param deadline: how long the stage may take, in seconds
+        :param function: the function to call
+        :return: the function's return value
+        """
+        start = time.time()
+        pool = futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            rv = pool.submit(function, *args, **kwargs).result(
+                timeout=deadline)
+        except futures.TimeoutError:
+            raise RuntimeError('{} did not finish within {:.0f}s.'.format(
+                name, deadline))
+        finally:
+            # a stage that missed its deadline cannot be stopped
+            pool.shutdown(wait=False)
+        self.logger.info('{} took {:.1f}s'.format(name, time.time() - start))
+        return rv
 
     def _gbe_setup(self):
         """
         Set up the Ethernet ports on the hosts
         :return:
         """
-        THREADED_FPGA_FUNC(
+        self.host_executor.threaded_func(
             self.fhosts + self.xhosts, timeout=self.timeout,
             target_function=('setup_host_gbes', (), {}))
 
@@ -408,6 +527,7 @@ class FxCorrelator(Instrument):
 #            key=lambda fengine: fengine.input_number)
         for ctr, feng in enumerate(self.fops.fengines):
             feng.name = new_labels[ctr]
+        self.save_state()
 
         if self.sensor_manager:
             self.sensor_manager.sensors_input_labels()
@@ -438,6 +558,164 @@ class FxCorrelator(Instrument):
 #            key=lambda fengine: fengine.input_number)
         return [feng.name for feng in self.fops.fengines]
 
+    def get_state(self, part='main'):
+        """
+        A part of the software state of the running instrument, as kept in
+        the state files. EQs and delays are in input order.
+        :param part: 'main', 'eq' or 'delays'
+        :return: a dictionary
+        """
+        state = {
+            'version': instrument_state.STATE_VERSION,
+            'saved': time.time(),
+        }
+        if part == 'eq':
+            state['eq'] = [feng.last_eq for feng in self.fops.fengines]
+        elif part == 'delays':
+            state['delays'] = [
+                instrument_state.delay_to_dict(feng.last_delay)
+                for feng in self.fops.fengines]
+        elif part == 'main':
+            state.update({
+                'fhosts': [host.host for host in self.fhosts],
+                'xhosts': [host.host for host in self.xhosts],
+                'md5_fengine': self.fhosts[0].system_info.get(
+                    'md5_bitstream'),
+                'md5_xengine': self.xhosts[0].system_info.get(
+                    'md5_bitstream'),
+                'synchronisation_epoch': self.synchronisation_epoch,
+                'input_labels': self.get_input_labels(),
+                'vacc_acc_len': self.xops.vacc_acc_len,
+                'board_ids': dict(self.xops._board_ids),
+                'beam_weights': {},
+                'beam_quant_gains': {},
+            })
+            if self.found_beamformer:
+                state['beam_weights'] = dict(self.bops.last_weights)
+                state['beam_quant_gains'] = dict(self.bops.last_quant_gains)
+        else:
+            errmsg = 'Unknown instrument state part {}.'.format(part)
+            self.logger.error(errmsg)
+            raise ValueError(errmsg)
+        return state
+
+    def save_state(self, part='main'):
+        """
+        Save a part of the instrument state to its state file, if this
+        instrument owns it. Called whenever that part changes.
+        :param part: 'main', 'eq' or 'delays'
+        :return:
+        """
+        if (part not in self._state_files) or (not self._state_owner):
+            return
+        try:
+            self._state_files[part].save(self.get_state(part))
+        except Exception as exc:
+            self.logger.warning('Could not save instrument state: {}'.format(
+                exc))
+
+    def _check_state(self, state):
+        """
+        Does a saved state belong to the instrument as it is running now?
+        Checks the layout and bitstreams, and spot-checks registers on a
+        few hosts: the image tag, board IDs, accumulation length and EQ.
+        :param state: the state dictionary
+        :return: None if the state is usable, otherwise the reason not
+        """
+        if state['fhosts'] != [host.host for host in self.fhosts] or \
+                state['xhosts'] != [host.host for host in self.xhosts]:
+            return 'the hosts have changed'
+        if state['md5_fengine'] != self.fhosts[0].system_info.get(
+                'md5_bitstream') or \
+                state['md5_xengine'] != self.xhosts[0].system_info.get(
+                    'md5_bitstream'):
+            return 'the bitstreams have changed'
+        if len(state['input_labels']) != len(self.fops.fengines):
+            return 'the number of inputs has changed'
+        n_checks = self.attach_spot_checks
+        fhosts = self._connected_hosts(self.fhosts)
+        fhosts = random.sample(fhosts, min(n_checks, len(fhosts)))
+        xhosts = self._connected_hosts(self.xhosts)
+        xhosts = random.sample(xhosts, min(n_checks, len(xhosts)))
+        for host in fhosts + xhosts:
+            # the tag is rewritten when a host is reprogrammed
+            tag = host._bitstream_tag()
+            if (tag is not None) and \
+                    (host.read_uint('sys_scratchpad') != tag):
+                return '{} has been reprogrammed'.format(host.host)
+        for host in xhosts:
+            board_id = host.registers.board_id.read()['data']['reg']
+            if board_id != state['board_ids'].get(host.host):
+                return '{} board ID is {}, not {}'.format(
+                    host.host, board_id, state['board_ids'].get(host.host))
+            acc_len = int(host.vacc_get_acc_len())
+            if acc_len != state['vacc_acc_len']:
+                return '{} accumulation length is {}, not {}'.format(
+                    host.host, acc_len, state['vacc_acc_len'])
+        import numpy
+        for host in fhosts:
+            if state['eq'] is None:
+                break
+            feng = random.choice(host.fengines)
+            # the state is in input order, as in fops.fengines
+            saved_eq = state['eq'][self.fops.fengines.index(feng)]
+            if (saved_eq is not None) and \
+                    (not numpy.array_equal(feng.get_eq(), saved_eq)):
+                return '{} EQ has changed'.format(feng.name)
+        return None
+
+    def attach_state(self):
+        """
+        Attach to an instrument that is already running, taking its
+        software state from the state file rather than reading it all back
+        from the hardware. Nothing is changed if there is no saved state,
+        or if it does not match the hardware.
+        :return: True if the saved state was used
+        """
+        state = None
+        if 'main' in self._state_files:
+            state = self._state_files['main'].load()
+        if state is None:
+            self.logger.info('No saved instrument state to attach to.')
+            return False
+        # the EQs and delays are optional, those of the wrong size are not
+        # used
+        n_inputs = len(state['input_labels'])
+        for part in ['eq', 'delays']:
+            part_state = self._state_files[part].load()
+            if (part_state is None) or (len(part_state[part]) != n_inputs):
+                state[part] = None
+            else:
+                state[part] = part_state[part]
+        try:
+            problem = self._check_state(state)
+        except Exception as exc:
+            problem = 'checking it failed: {}'.format(exc)
+        if problem is not None:
+            self.logger.warning('Not using the instrument state saved at '
+                                '{}, {}.'.format(time.ctime(state['saved']),
+                                                 problem))
+            return False
+        if state['synchronisation_epoch'] > 0:
+            self.synchronisation_epoch = state['synchronisation_epoch']
+        for ctr, feng in enumerate(self.fops.fengines):
+            feng.name = state['input_labels'][ctr]
+            if (state['eq'] is not None) and (state['eq'][ctr] is not None):
+                # only spot-checked, so the next EQ write is a full one
+                feng.last_eq = state['eq'][ctr]
+                feng.last_eq_verified = False
+            if state['delays'] is not None:
+                instrument_state.delay_from_dict(feng.last_delay,
+                                                 state['delays'][ctr])
+        self.xops.vacc_acc_len = state['vacc_acc_len']
+        self.xops._board_ids = dict(state['board_ids'])
+        if self.found_beamformer:
+            self.bops.last_weights.update(state['beam_weights'])
+            self.bops.last_quant_gains.update(state['beam_quant_gains'])
+        self.logger.info('Attached to the instrument state saved at '
+                         '{}.'.format(time.ctime(state['saved'])))
+        return True
+
     def _check_bitstreams(self):
         """
         Are the bitstreams from the config accessible?
@@ -460,6 +738,15 @@ class FxCorrelator(Instrument):
             self.logger.error(errmsg)
             raise IOError(errmsg)
 
+    def _connected_hosts(self, hosts):
+        """
+        :param hosts: a list of hosts
+        :return: those of them that this instance connects to
+        """
+        if self.connect_hosts is None:
+            return hosts
+        return [host for host in hosts if host.host in self.connect_hosts]
+
     def _create_hosts(self, **kwargs):
         """
         Set up the different kind of hosts that make up this correlator.
@@ -480,6 +767,8 @@ class FxCorrelator(Instrument):
                     host,
                     self.katcp_port,
                     config_source=_feng_d,
+                    connect=((self.connect_hosts is None) or
+                             (host in self.connect_hosts)),
                     host_id=hostindex,
                     descriptor=self.descriptor,
                     getLogger=self.getLogger,
@@ -509,6 +798,8 @@ class FxCorrelator(Instrument):
                     hostindex,
                     self.katcp_port,
                     self.configd,
+                    connect=((self.connect_hosts is None) or
+                             (host in self.connect_hosts)),
                     descriptor=self.descriptor,
                     getLogger=self.getLogger,
                     **kwargs)
@@ -525,18 +816,64 @@ class FxCorrelator(Instrument):
                         _fh.host)
                     self.logger.error(errmsg)
                     raise RuntimeError(errmsg)
+        # one long-lived worker per host, shared by the operations,
+        # sensors and monitoring loop
+        if self.host_executor is None:
+            self.host_executor = HostExecutor(logger=self.logger)
+        self.host_executor.add_hosts(self.fhosts + self.xhosts)
+
+    def multicast_subscribe(self, joins):
+        """
+        Make the multicast (IGMP) joins for many hosts in parallel, paced
+        to keep the switches happy: at most multicast_join_concurrency
+        hosts join at once, at no more than multicast_join_rate joins per
+        second in total.
+        :param joins: a list of (host, [(gbe, address, n_extra), ...])
+            tuples, as for gbe.multicast_receive
+        :return: a dictionary of the time each host took to join, in
+            seconds, keyed on hostname
+        """
+        if len(joins) == 0:
+            return {}
+        bucket = utils.TokenBucket(self.multicast_join_rate,
+                                   self.multicast_join_concurrency)
+        slots = threading.BoundedSemaphore(self.multicast_join_concurrency)
+        host_joins = {host.host: host_joins_ for host, host_joins_ in joins}
+
+        def join(host):
+            with slots:
+                start = time.time()
+                for gbe, address, n_extra in host_joins[host.host]:
+                    bucket.take()
+                    gbe.multicast_receive(address, n_extra)
+                return time.time() - start
+        num_joins = sum(len(host_joins_) for host_joins_ in host_joins.values())
+        timeout = self.timeout * len(joins)
+        if self.multicast_join_rate > 0:
+            timeout += num_joins / self.multicast_join_rate
+        start = time.time()
+        rv = self.host_executor.threaded_op(
+            [host for host, _ in joins], timeout, (join,))
+        latencies = sorted(rv.values())
+        self.logger.info(
+            '%i multicast joins on %i hosts took %.3fs: per-host join latency '
+            'min %.3fs, mean %.3fs, max %.3fs (%s).' % (
+                num_joins, len(joins), time.time() - start, latencies[0],
+                sum(latencies) / len(latencies), latencies[-1],
+                max(rv, key=rv.get)))
+        return rv
 
     def _update_response_timeout(self, response_timeout):
         """
         Update the response timeout for Fpga Hosts
         :return:
         """
-        # access transport layer
-        host_transports = [host.transport for host in self.fhosts + self.xhosts]
-        # function to call to update the response timeout for the Fpga hosts
-        THREADED_FPGA_FUNC(
-            host_transports, timeout=self.timeout,
-            target_function=('_update_response_timeout', [response_timeout], {}))
+        # update the response timeout in each host's transport layer
+        self.host_executor.threaded_op(
+            self.fhosts + self.xhosts, timeout=self.timeout,
+            target_function=(
+                lambda host_: host_.transport._update_response_timeout(
+                    response_timeout),))
 
         # update the global timeout variable in case it was modified after initialisation
         self.response_timeout = response_timeout
@@ -578,12 +915,12 @@ class FxCorrelator(Instrument):
         self.timestamp_bits = int(_fxcorr_d['timestamp_bits'])
         self.n_antennas = int(_fxcorr_d['n_ants'])
 
-        # Warn user if sensor poll interval is not in config file and default is set.
-        try:
-            self.sensor_poll_interval = float(_fxcorr_d['sensor_poll_interval'])
-        except KeyError:
-            self.logger.warn('sensor_poll_interval config file variable is not available, default interval set to: 0.003.')
-            self.sensor_poll_interval = 0.003
+        # each host's status is read once per interval, for all its sensors,
+        # the instrument-wide sensors are polled less often
+        self.sensor_host_poll_interval = float(
+            _fxcorr_d.get('sensor_host_poll_interval', 1))
+        self.sensor_aggregate_poll_interval = float(
+            _fxcorr_d.get('sensor_aggregate_poll_interval', 2))
 
         # These ones are fine, we'll just use a default if they're not there.
         self.katcp_port = int(_fxcorr_d.get('katcp_port', 7147))
@@ -591,6 +928,24 @@ class FxCorrelator(Instrument):
         self.time_offset_allowed = float(_fxcorr_d.get('time_offset_allowed', 1))
         self.timeout = int(_fxcorr_d.get('default_timeout', 15))
         self.post_switch_delay = int(_fxcorr_d.get('switch_delay', 10))
+        # how many hosts may make multicast joins at once, and how many
+        # joins per second the switches are given
+        self.multicast_join_concurrency = int(_fxcorr_d.get(
+            'multicast_join_concurrency', 8))
+        self.multicast_join_rate = float(_fxcorr_d.get(
+            'multicast_join_rate', 100))
+        # where the instrument state is kept for warm attach, empty to
+        # disable, how often it may be written and how many hosts of each
+        # type are checked against it on attach
+        self.state_filename = _fxcorr_d.get(
+            'state_file', os.path.join(
+                '~', '.corr2', '{}_state.pickle'.format(self.descriptor)))
+        self.state_save_interval = float(_fxcorr_d.get(
+            'state_save_interval', 5))
+        self.attach_spot_checks = int(_fxcorr_d.get('attach_spot_checks', 2))
+        # encode large array values (EQ, snapshots) compactly?
+        self.compact_array_values = _fxcorr_d.get(
+            'compact_array_values', 'false').lower() == 'true'
 
         if 'spead_metapacket_ttl' in _fxcorr_d:
             import data_stream
@@ -616,6 +971,7 @@ class FxCorrelator(Instrument):
         self.decimation_factor = int(_feng_d.get('decimation_factor', 1))
         self.ct_readgap = int(_feng_d.get('ct_readgap', 45))
         self.min_load_time = float(_feng_d.get('min_load_time', 0.2))
+        self.delay_queue_depth = int(_feng_d.get('delay_queue_depth', 4))
         self.f_per_fpga = int(_feng_d.get('f_per_fpga', 2))
         self.adc_bitwidth = int(_feng_d.get('sample_bits', 10))
         self.pfb_group_delay = int(_feng_d.get('pfb_group_delay', 0))
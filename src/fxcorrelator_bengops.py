@@ -1,11 +1,7 @@
 from logging import INFO
-from casperfpga import utils as fpgautils
 from beam import Beam
 # from corr2LogHandlers import getLogger
 
-THREADED_FPGA_OP = fpgautils.threaded_fpga_operation
-THREADED_FPGA_FUNC = fpgautils.threaded_fpga_function
-
 
 class BEngineOperations(object):
     def __init__(self, corr_obj, **kwargs):
@@ -17,6 +13,10 @@ class BEngineOperations(object):
         self.hosts = corr_obj.xhosts
         self.beams = {}
         self.beng_per_host = corr_obj.x_per_fpga
+        # the last weights and quantiser gains set or read, keyed on
+        # beam name
+        self.last_weights = {}
+        self.last_quant_gains = {}
 
         # Now creating separate instances of loggers as needed
         logger_name = '{}_BengOps'.format(corr_obj.descriptor)
@@ -144,9 +144,11 @@ class BEngineOperations(object):
             return
         beam = self.get_beam_by_name(beam_name)
         # set the quantiser gains for this beam
-        THREADED_FPGA_FUNC(self.hosts, 5, ('beam_quant_gains_set',
-                                           [beam.index, new_gain], {}))
+        self.corr.host_executor.threaded_func(self.hosts, 5, ('beam_quant_gains_set',
+                                                              [beam.index, new_gain], {}))
         self.logger.info('%s quant gain set to %f.'%(beam_name,new_gain))
+        self.last_quant_gains[beam_name] = new_gain
+        self.corr.save_state()
         if self.corr.sensor_manager:
             self.corr.sensor_manager.sensors_beng_gains()
 
@@ -157,9 +159,10 @@ class BEngineOperations(object):
         :return: the output beam gain for this combination
         """
         beam = self.get_beam_by_name(beam_name)
-        vals=THREADED_FPGA_FUNC(self.hosts, 5, ('beam_quant_gains_get',
-                                           [beam.index], {}))
+        vals=self.corr.host_executor.threaded_func(self.hosts, 5, ('beam_quant_gains_get',
+                                                                   [beam.index], {}))
         if min(vals.values())==max(vals.values()):
+            self.last_quant_gains[beam_name] = vals.values()[0]
             return vals.values()[0]
         else:
             raise RuntimeError('Boards dont all have the same gain! {}'.format(vals))
@@ -184,9 +187,11 @@ class BEngineOperations(object):
 
         assert len(new_weights)==self.corr.n_antennas,'Need to specify %i values; you offered %i.'%(self.corr.n_antennas,len(new_weights))
         beam_index = self.get_beam_by_name(beam_name).index
-        THREADED_FPGA_FUNC(self.hosts, 5, ('beam_weights_set',
-                                           [beam_index,new_weights], {}))
+        self.corr.host_executor.threaded_func(self.hosts, 5, ('beam_weights_set',
+                                                              [beam_index,new_weights], {}))
         self.logger.info('{} weights set to {}.'.format(beam_name,new_weights))
+        self.last_weights[beam_name] = list(new_weights)
+        self.corr.save_state()
         if self.corr.sensor_manager:
             self.corr.sensor_manager.sensors_beng_weights()
 
@@ -197,13 +202,14 @@ class BEngineOperations(object):
         :return: a list of the beam weights, one per input.
         """
         beam = self.get_beam_by_name(beam_name)
-        vals=THREADED_FPGA_FUNC(self.hosts, 10, ('beam_weights_get',
-                                           [beam.index], {}))
+        vals=self.corr.host_executor.threaded_func(self.hosts, 10, ('beam_weights_get',
+                                                                    [beam.index], {}))
         import numpy
         na=numpy.array(vals.values())
         for ant in range(self.corr.n_antennas):
             if na[:,ant].max() != na[:,ant].min():
                 raise RuntimeError('Boards dont all have the same gain! {}'.format(vals))
+        self.last_weights[beam_name] = list(vals.values()[0])
         return vals.values()[0]
 
     def get_version_info(self):
@@ -224,6 +230,6 @@ class BEngineOperations(object):
         #TODO This function doesn't really add value. Remove?
         rv={}
         for beam in self.beams.itervalues():
-            rv[beam.name]=THREADED_FPGA_FUNC(self.hosts, 5, ('get_bpack_status',
-                                           [beam.index], {}))
+            rv[beam.name]=self.corr.host_executor.threaded_func(self.hosts, 5, ('get_bpack_status',
+                                                                                [beam.index], {}))
         return rv
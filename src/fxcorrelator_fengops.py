@@ -1,7 +1,10 @@
-import Queue
 import threading
 import time
 import re
+import bisect
+
+from tornado import gen
+from concurrent import futures
 
 import utils
 import fhost_fpga
@@ -18,8 +21,6 @@ from data_stream import StreamAddress
 from logging import INFO
 
 
-THREADED_FPGA_OP = fpgautils.threaded_fpga_operation
-THREADED_FPGA_FUNC = fpgautils.threaded_fpga_function
 CHECK_TARGET_FUNC = fpgautils._check_target_func
 
 
@@ -55,7 +56,7 @@ class FengineStream(SPEADStream):
         """
         txip = int(self.destination.ip_address)
         try:
-            THREADED_FPGA_OP(self.fops.hosts, timeout=self.timeout,
+            self.fops.corr.host_executor.threaded_op(self.fops.hosts, timeout=self.timeout,
                 target_function=(lambda fpga_: fpga_.registers.iptx_base.write_int(txip),))
         except AttributeError:
             errmsg = 'Writing stream {} destination to hardware failed!'.format(self.name)
@@ -81,7 +82,7 @@ class FengineStream(SPEADStream):
         done = False
         while n_retries > 0:
             try:
-                THREADED_FPGA_OP(self.fops.hosts, timeout=self.timeout,
+                self.fops.corr.host_executor.threaded_op(self.fops.hosts, timeout=self.timeout,
                     target_function=(lambda fpga_: fpga_.tx_enable(),))
                 n_retries = -1
             except RuntimeError:
@@ -110,7 +111,7 @@ class FengineStream(SPEADStream):
         Disable TX for this data stream
         :return:
         """
-        THREADED_FPGA_OP(self.fops.hosts, timeout=self.timeout,
+        self.fops.corr.host_executor.threaded_op(self.fops.hosts, timeout=self.timeout,
             target_function=(lambda fpga_: fpga_.tx_disable(), ))
         self.fops.logger.info('F-engine output disabled')
         self.tx_enabled = False
@@ -134,6 +135,14 @@ class FEngineOperations(object):
         self.fengines = []
         self.data_stream = None
 
+        # the delay model look-ahead queue, see delay_scheduler_start
+        self._delay_ioloop = None
+        self._delay_executor = None
+        self._delay_queue = []
+        self._delay_queue_lock = threading.Lock()
+        self._delay_servicing = False
+        self._delay_armed = None
+
         # Now creating separate instances of loggers as needed
         logger_name = '{}_FEngOps'.format(corr_obj.descriptor)
         # Why is logging defaulted to INFO, what if I do not want to see the info logs?
@@ -170,7 +179,7 @@ class FEngineOperations(object):
             # set up the x-engine information in the F-engine hosts
             f_per_x = self.corr.n_chans / num_x
             ip_per_x = 1.0  # TODO put this in config file
-            THREADED_FPGA_OP(self.hosts, timeout=10,
+            self.corr.host_executor.threaded_op(self.hosts, timeout=10,
                 target_function=(lambda fpga_: fpga_.registers.x_setup.write(f_per_x=f_per_x,
                     ip_per_x=ip_per_x, num_x=num_x,),))
             time.sleep(1)
@@ -255,7 +264,7 @@ class FEngineOperations(object):
         self.set_center_freq(self.corr.sample_rate_hz/4.)
 
         # configure the ethernet cores.
-        THREADED_FPGA_FUNC(self.hosts, timeout=self.timeout,
+        self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
             target_function=('setup_host_gbes', (), {}))
 
         # subscribe to multicast groups
@@ -356,8 +365,11 @@ class FEngineOperations(object):
         :return:
         """
         self.logger.info('Forcing an F-engine resync')
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
-            target_function=(lambda fpga_: fpga_.registers.control.write(sys_rst='pulse'),))
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fpga_: fpga_.shadow_write('control', sys_rst='pulse'),))
+        # the reset may have cleared registers behind the shadow copies
+        for fhost in self.hosts:
+            fhost.shadow_resync()
         if sleeptime > 0:
             time.sleep(sleeptime)
 
@@ -393,13 +405,13 @@ class FEngineOperations(object):
         """Set the DDC oscillator frequency to "freq" Hz."""
         self.logger.debug('Setting DDC oscillator freq to {:.3f} MHz'.format(freq/1.e6))
         reg_value = float(freq)/self.corr.sample_rate_hz
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
             target_function=(lambda fpga_: fpga_.registers.freq_cwg_osc.write(frequency=reg_value),))
         return self._get_osc_freq()
 
     def _get_osc_freq(self):
         """Return the hardware configured oscillator frequency, in Hz."""
-        rv =THREADED_FPGA_OP(self.hosts,timeout=1,target_function=(lambda fpga_: fpga_.registers.freq_cwg_osc.read()['data']['frequency'],)) 
+        rv =self.corr.host_executor.threaded_op(self.hosts,timeout=1,target_function=(lambda fpga_: fpga_.registers.freq_cwg_osc.read()['data']['frequency'],)) 
         if min(rv.values()) != max(rv.values()): 
             self.logger.warning("Fhosts have different tuning frequencies!")
             raise RuntimeError("Fhosts have different tuning frequencies!")
@@ -415,7 +427,7 @@ class FEngineOperations(object):
         """
         self.logger.debug('Checking timestamps on F hosts.')
         start_time = time.time()
-        results = THREADED_FPGA_FUNC(self.hosts, timeout=self.timeout,
+        results = self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
             target_function=('get_local_time', [src], {}))
         read_time = time.time()
         elapsed_time = read_time - start_time
@@ -461,52 +473,53 @@ class FEngineOperations(object):
             rv = False
         return rv, feng_times
 
-    def threaded_feng_operation(self, timeout, target_function):
+    def threaded_feng_operation(self, timeout, target_function,
+                                raise_on_error=True):
         """
-        Thread any operation against many FPGA objects
-        :param fpga_list: list of KatcpClientFpga objects
-        :param timeout: how long to wait before timing out
+        Run any operation against all the F-engines. Each host does all of
+        its F-engines in turn, over its single transport, and the hosts
+        run in parallel.
+        :param timeout: how long to allow each F-engine before timing out
         :param target_function: a tuple with three parts:
                                 1. reference, the function object that must be
-                                   run - MUST take FPGA object as first argument
+                                   run - MUST take Fengine object as first argument
                                 2. tuple, the arguments to the function
                                 3. dict, the keyword arguments to the function
                                 e.g. (func_name, (1,2,), {'another_arg': 3})
+        :param raise_on_error: if False, an input that failed has its
+            exception as its result, rather than a RuntimeError being raised
+            once all the inputs are done
         :return: a dictionary of the results, keyed on feng index
         """
         target_function = CHECK_TARGET_FUNC(target_function)
 
-        def jobfunc(resultq, feng):
-            rv = target_function[0](feng, *target_function[1], **target_function[2])
-            resultq.put_nowait((feng.input_number, rv))
+        def hostfunc(fhost):
+            rv = {}
+            for feng in fhost.fengines:
+                try:
+                    rv[feng.input_number] = target_function[0](
+                        feng, *target_function[1], **target_function[2])
+                except Exception as exc:
+                    rv[feng.input_number] = exc
+            return rv
 
-        num_fengs = len(self.fengines)
-        f_per_fpga = self.corr.f_per_fpga
+        result = self.corr.host_executor.run(
+            self.hosts, target_function=(hostfunc,),
+            timeout=timeout * self.corr.f_per_fpga)
         returnval = {}
-        hosts_missing = [feng.input_number for feng in self.fengines]
-        for fpl in range(f_per_fpga):
-            result_queue = Queue.Queue(maxsize=num_fengs/f_per_fpga)
-            thread_list = []
-            for feng_ in self.fengines[fpl::f_per_fpga]:
-                thread = threading.Thread(target=jobfunc, args=(result_queue, feng_))
-                thread.setDaemon(True)
-                thread.start()
-                thread_list.append(thread)
-            for thread_ in thread_list:
-                thread_.join(timeout)
-                if thread_.isAlive():
-                    break
-            while True:
-                try:
-                    result = result_queue.get_nowait()
-                    self.logger.debug("Received response from feng {}".format(result[0]))
-                    returnval[result[0]] = result[1]
-                    hosts_missing.pop(hosts_missing.index(result[0]))
-                except Queue.Empty:
-                    break
-        if hosts_missing:
-            hosts_missing=[self.fengines[n_feng] for n_feng in hosts_missing]
-            missing_str=['%s(%s)'%(feng.name,feng.host.host) for feng in hosts_missing]
+        for fhost in self.hosts:
+            if fhost.host in result.successes:
+                returnval.update(result.successes[fhost.host])
+            else:
+                for feng in fhost.fengines:
+                    returnval[feng.input_number] = result.failures[fhost.host]
+        fengs_failed = [feng for feng in self.fengines
+                        if isinstance(returnval[feng.input_number], Exception)]
+        for feng in fengs_failed:
+            self.logger.error('{}({}) failed: {}'.format(
+                feng.name, feng.host.host, returnval[feng.input_number]))
+        if fengs_failed and raise_on_error:
+            missing_str=['%s(%s)'%(feng.name,feng.host.host) for feng in fengs_failed]
             errmsg = ('Did not complete Fengs: {}.'.format(missing_str))
             self.logger.error(errmsg)
             raise RuntimeError(errmsg)
@@ -532,6 +545,7 @@ class FEngineOperations(object):
             delay.load_mcnt = loadmcnt
             feng = self.get_fengine(input_name)
             feng.delay_set(delay)
+            self.corr.save_state('delays')
             if self.corr.sensor_manager:
                 self.corr.sensor_manager.sensors_feng_delays(feng)
 
@@ -551,20 +565,181 @@ class FEngineOperations(object):
             self.logger.error("Dropping delay request.")
         else:
             sample_rate_hz = self.corr.get_scale_factor()
-            delays = delayops.process_list(delay_list, sample_rate_hz)
+            delays = delayops.process_list_array(delay_list, sample_rate_hz)
             if len(delays) != len(self.fengines):
                 raise ValueError('Have {} F-engines, received {} delay coefficient sets.'.format(
                     len(self.fengines), len(delays)))
-            for delay in delays:
-                delay.load_mcnt = loadmcnt
-            rv = self.threaded_feng_operation(timeout=self.timeout,
-                target_function=(lambda feng_: feng_.delay_set(delays[feng_.input_number]),))
-            if len(rv) != len(self.fengines):
-                rv = False
-                self.logger.error("Only got {} delay responses.".format(len(rv)))
-            if self.corr.sensor_manager:
-                for feng in self.fengines:
-                    self.corr.sensor_manager.sensors_feng_delays(feng)
+            delays = delayops.quantise_delays(delays)
+            saturated = delayops.saturated_inputs(delays)
+            if saturated.any():
+                self.logger.warning('Delay coefficients clipped for inputs {}.'.format(
+                    list(saturated.nonzero()[0])))
+            if self._delay_ioloop is None:
+                self._delay_commit(loadmcnt, delays)
+                self._delay_update_sensors()
+            else:
+                self._delay_queue_add(loadmcnt, delays)
+
+    def delay_scheduler_start(self, ioloop):
+        """
+        Queue delay models set with delay_set_all, rather than writing them
+        to the hardware straight away. Queued models are written to the
+        F-engines by a worker on the given IOLoop, each one as soon as the
+        timed latch for the previous one has fired.
+        :param ioloop: the tornado IOLoop on which to run the worker
+        :return:
+        """
+        self._delay_ioloop = ioloop
+        self._delay_executor = futures.ThreadPoolExecutor(max_workers=1)
+        self.logger.info('Delay model queue started, depth {}.'.format(
+            self.corr.delay_queue_depth))
+
+    def delay_queue_length(self):
+        """
+        How many delay models are waiting to be written to the hardware?
+        :return:
+        """
+        with self._delay_queue_lock:
+            return len(self._delay_queue)
+
+    def _delay_queue_add(self, loadmcnt, delays):
+        """
+        Add a quantised delay model to the look-ahead queue, in load time
+        order. A model for the same load mcnt as a queued one replaces it.
+        :param loadmcnt: the sample count at which to load the model
+        :param delays: a numpy structured array from delay.quantise_delays
+        :return:
+        """
+        with self._delay_queue_lock:
+            mcnts = [model[0] for model in self._delay_queue]
+            position = bisect.bisect_left(mcnts, loadmcnt)
+            if (position < len(mcnts)) and (mcnts[position] == loadmcnt):
+                self._delay_queue[position] = (loadmcnt, delays)
+            elif len(self._delay_queue) >= self.corr.delay_queue_depth:
+                errmsg = 'Delay model queue full ({} models), dropping model ' \
+                         'for mcnt {}.'.format(len(self._delay_queue), loadmcnt)
+                self.logger.error(errmsg)
+                raise RuntimeError(errmsg)
+            else:
+                self._delay_queue.insert(position, (loadmcnt, delays))
+        self._delay_ioloop.add_callback(self._delay_queue_service)
+
+    def _delays_loaded(self):
+        """
+        Have the timed latches for the currently-armed delay model fired
+        on all F-engines? Compares the tl_cd load counts against those
+        read when the model was armed.
+        :return: True if every input has loaded its model
+        """
+        host_rv = self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fhost_: fhost_.delay_get_load_counts(),))
+        for fhost in self.hosts:
+            load_counts = host_rv[fhost.host]
+            for feng in fhost.fengines:
+                if load_counts[feng.input_number] == feng.last_delay.load_count:
+                    return False
+        return True
+
+    @gen.coroutine
+    def _delay_queue_service(self):
+        """
+        Write queued delay models to the hardware, one at a time, waiting
+        for each armed model to load before staging the next.
+        Runs on the IOLoop given to delay_scheduler_start, the register
+        writes themselves are done on an executor.
+        :return:
+        """
+        if self._delay_servicing:
+            return
+        self._delay_servicing = True
+        try:
+            while True:
+                with self._delay_queue_lock:
+                    if len(self._delay_queue) == 0:
+                        break
+                    loadmcnt, delays = self._delay_queue[0]
+                if (self._delay_armed is not None) and \
+                        (loadmcnt > self._delay_armed[0]):
+                    armed_time = self.corr.time_from_mcnt(self._delay_armed[0])
+                    if time.time() < armed_time:
+                        # come back once the armed model should have loaded
+                        self._delay_ioloop.call_at(
+                            self._delay_ioloop.time() + (armed_time - time.time()) + 0.01,
+                            self._delay_queue_service)
+                        return
+                    loaded = yield self._delay_executor.submit(self._delays_loaded)
+                    if (not loaded) and (time.time() < armed_time + self.timeout):
+                        self._delay_ioloop.call_later(0.05, self._delay_queue_service)
+                        return
+                    elif not loaded:
+                        self.logger.warning('Delay model for mcnt {} does not seem to '
+                                            'have loaded, staging the next one '
+                                            'anyway.'.format(self._delay_armed[0]))
+                with self._delay_queue_lock:
+                    self._delay_queue = [model for model in self._delay_queue
+                                         if model[1] is not delays]
+                if (self._delay_armed is not None) and \
+                        (loadmcnt < self._delay_armed[0]):
+                    # this model must load first, the armed one goes back
+                    # in the queue
+                    self.logger.warning('Delay model for mcnt {} pre-empts armed model '
+                                        'for mcnt {}.'.format(loadmcnt, self._delay_armed[0]))
+                    with self._delay_queue_lock:
+                        mcnts = [model[0] for model in self._delay_queue]
+                        self._delay_queue.insert(
+                            bisect.bisect_left(mcnts, self._delay_armed[0]),
+                            self._delay_armed)
+                if self.corr.time_from_mcnt(loadmcnt) < \
+                        time.time() + self.corr.min_load_time:
+                    self.logger.error('Delay model for mcnt {} reached the front of the '
+                                      'queue too late to be loaded, dropping '
+                                      'it.'.format(loadmcnt))
+                    continue
+                try:
+                    yield self._delay_executor.submit(self._delay_commit, loadmcnt, delays)
+                except Exception as ex:
+                    self.logger.error('Failed to stage delay model for mcnt {}: '
+                                      '{}'.format(loadmcnt, ex.message))
+                self._delay_update_sensors()
+        finally:
+            self._delay_servicing = False
+
+    def _delay_commit(self, loadmcnt, delays):
+        """
+        Write a quantised delay model to all the F-engines and arm their
+        timed latches.
+        :param loadmcnt: the sample count at which to load the model
+        :param delays: a numpy structured array from delay.quantise_delays
+        :return: a dictionary of last-load-success flags, keyed on input
+        """
+        # one batched commit per host, rather than one thread per input.
+        # A failed host must not stop the others getting their models.
+        result = self.corr.host_executor.run(self.hosts,
+            target_function=(lambda fhost_: fhost_.delay_set_all(delays, loadmcnt),),
+            timeout=self.timeout)
+        for fhost in self.hosts:
+            if fhost.host in result.failures:
+                self.logger.error('Delay model commit failed on {}: {}'.format(
+                    fhost.host, result.failures[fhost.host]))
+                for feng in fhost.fengines:
+                    feng.last_delay.last_load_success = False
+        rv = {}
+        for host_results in result.successes.values():
+            rv.update(host_results)
+        if len(rv) != len(self.fengines):
+            self.logger.error("Only got {} delay responses.".format(len(rv)))
+        self._delay_armed = (loadmcnt, delays)
+        self.corr.save_state('delays')
+        return rv
+
+    def _delay_update_sensors(self):
+        """
+        Update the delay sensors for all F-engines
+        :return:
+        """
+        if self.corr.sensor_manager:
+            for feng in self.fengines:
+                self.corr.sensor_manager.sensors_feng_delays(feng)
 
 #    def delays_get(self, input_name=None):
 #        """
@@ -598,15 +773,9 @@ class FEngineOperations(object):
             self.logger.error(errmsg)
             return None
 
-        #TODO this logic doesn't work correctly all the time, because this function can be called when setting random Fengines, and so shouldn't hardcode the reference to feng0. disabling for now.
-        #last_loadtime = self.corr.time_from_mcnt(
-        #    self.fengines[0].last_delay.load_mcnt)
-        #if time.time() < last_loadtime:
-        #    self.logger.warning(
-        #        "Received a delay update before the last one had a chance to load! "
-        #        "Queuing is not supported. The last load command (for time {}) will not be applied, "
-        #        "and will be overwritten by this command at time {}.".format(last_loadtime,
-        #            time.time()))
+        # Models that arrive before the previous one has loaded are queued
+        # if delay_scheduler_start has been called, otherwise they overwrite
+        # the previous model.
         loadtime_mcnt = self.corr.mcnt_from_time(loadtime)
         return loadtime_mcnt
 
@@ -636,18 +805,18 @@ class FEngineOperations(object):
         """
         #feng_pipeline_latency = ct+hmc  +  pfb_fir  +  fft  +  cd+hmc  +  misc
         max_difference=(self.corr.n_chans*2*self.corr.xops.xeng_acc_len*2*self.decimation_factor + 50000) + (self.decimation_factor*self.corr.n_chans*16*2) + (self.decimation_factor*self.corr.n_chans*7) +  (512 + 50000) + (50000)
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
-            target_function=(lambda fpga_: fpga_.registers.time_check.write(max_difference=max_difference), ))
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
-            target_function=(lambda fpga_: fpga_.registers.control.write(auto_rst_enable=True,time_diff_check_en=True), ))
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fpga_: fpga_.shadow_write('time_check', max_difference=max_difference), ))
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fpga_: fpga_.shadow_write('control', auto_rst_enable=True, time_diff_check_en=True), ))
         self.logger.info('F-engine hardware auto rst/resync mechanism enabled.')
 
     def auto_rst_disable(self):
         """
         Disable hardware automatic resync upon error detection.
         """
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
-            target_function=(lambda fpga_: fpga_.registers.control.write(auto_rst_enable=False), ))
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fpga_: fpga_.shadow_write('control', auto_rst_enable=False), ))
         self.logger.info('F-engine hardware auto rst/resync mechanism disabled.')
 
     def get_fengine(self, input_name):
@@ -694,7 +863,14 @@ class FEngineOperations(object):
         """
         #neweq = utils.process_new_eq(new_eq)
         # if no input is given, apply the new eq to all inputs
-        if input_name is None:
+        if input_name is None and isinstance(new_eq, str) and new_eq == 'auto':
+            # one job per host, so that all inputs on a host share the
+            # snapshot reads
+            self.logger.info('Automatically setting EQ on all inputs.')
+            fengs = self.fengines
+            self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout*(self.corr.n_chans/1024),
+                target_function=(lambda fhost_: fhost_.auto_eq(),))
+        elif input_name is None:
             self.logger.info('Applying EQ to all inputs.')
             fengs = self.fengines
             rv = self.threaded_feng_operation(timeout=self.timeout*(self.corr.n_chans/1024),
@@ -702,6 +878,7 @@ class FEngineOperations(object):
         else:
             fengs = [self.get_fengine(input_name)]
             fengs[0].set_eq(eq_poly=new_eq)
+        self.corr.save_state('eq')
         for feng in fengs:
             if self.corr.sensor_manager:
                 self.corr.sensor_manager.sensors_feng_eq(feng)
@@ -718,7 +895,7 @@ class FEngineOperations(object):
             timeout = numpy.log2(self.corr.n_chans)*3
         else:
             timeout = self.timeout
-        THREADED_FPGA_FUNC(self.hosts, timeout, ('set_fft_shift', (shift_value,),))
+        self.corr.host_executor.threaded_func(self.hosts, timeout, ('set_fft_shift', (shift_value,),))
         self.logger.info('done.')
         if self.corr.sensor_manager:
             self.corr.sensor_manager.sensors_feng_fft_shift()
@@ -729,7 +906,7 @@ class FEngineOperations(object):
         :return:
         """
         # get the fft shift values
-        rv = THREADED_FPGA_FUNC(self.hosts, 10, 'get_fft_shift')
+        rv = self.corr.host_executor.threaded_func(self.hosts, 10, 'get_fft_shift')
         return rv
 
     def fengine_to_host_mapping(self):
@@ -748,7 +925,7 @@ class FEngineOperations(object):
         Clear the various status registers and counters on all the fengines
         :return:
         """
-        THREADED_FPGA_FUNC(self.hosts, 10, 'clear_status')
+        self.corr.host_executor.threaded_func(self.hosts, 10, 'clear_status')
 
     def subscribe_to_multicast(self):
         """
@@ -756,12 +933,15 @@ class FEngineOperations(object):
         :return:
         """
         self.logger.info('Subscribing F-engine inputs:')
-        # don't do this in parallel. Ease the load on the switch?
+        joins = []
         for fhost in self.hosts:
-            fhost.subscribe_to_multicast()
-        # res = THREADED_FPGA_FUNC(self.hosts, timeout=10,
-        #                          target_function=('subscribe_to_multicast',
-        #                                           [self.corr.f_per_fpga], {}))
+            fhost_joins = fhost.multicast_joins()
+            for gbe, ip_str, n_extra in fhost_joins:
+                self.logger.info('\t%s: %s(%s+%i)' % (fhost.host, gbe.name,
+                                                       ip_str, n_extra))
+            joins.append((fhost, fhost_joins))
+        # in parallel, but paced to ease the load on the switch
+        self.corr.multicast_subscribe(joins)
 
     def sky_freq_to_chan(self, freq):
         raise NotImplementedError
@@ -798,14 +978,17 @@ class FEngineOperations(object):
         Read the small voltage buffer for a input from a host.
         :param input_name: the input name, if None, will return all inputs
         :param unix_time: the time at which to trigger the snapshots
-        :return: {feng_name0: AdcData(),
-                  feng_name1: AdcData(),
-                 }
-        """
-        # if no trigger time was specified, trigger in 2s' time.
+        :return: {input_name: AdcData()} for a single input. For all inputs,
+            a single AdcData, with a (n_inputs, n_samples) data array, an
+            array of per-input timestamps and the input names of the rows.
+        """
+        if (input_name is None) and (unix_time < 0):
+            # all the inputs must trigger together, so they cannot be
+            # triggered manually
+            unix_time = time.time() + 1
+            self.logger.info('Trigger time not specified; triggering in 1s.')
+        # if no trigger time was specified, trigger manually.
         if unix_time < 0:
-            #unix_time = time.time() + 2
-            #self.logger.info('Trigger time not specified; triggering in 2s.')
             ldmcnt = None
             timeout = 10
         else:
@@ -817,18 +1000,34 @@ class FEngineOperations(object):
             timeout += 1
 
         if input_name is None:
-            # get data for all F-engines triggered at the same time
-            res = THREADED_FPGA_FUNC(self.hosts, timeout=timeout + 10,
-                target_function=('get_adc_snapshots', [], {'loadcnt': ldmcnt, 'timeout': timeout}))
-            rv = {}
-            for feng in self.fengines:
-                rv[feng.name] = res[feng.host.host]['p{}'.format(feng.offset)]
-            return rv
+            # get data for all F-engines triggered at the same time: arm
+            # every host before any of them triggers, then read them all
+            self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
+                target_function=('arm_adc_snapshots', [], {'loadcnt': ldmcnt}))
+            if time.time() > unix_time:
+                errmsg = 'Could not arm all ADC snapshots before the ' \
+                         'trigger time.'
+                self.logger.error(errmsg)
+                raise RuntimeError(errmsg)
+            res = self.corr.host_executor.threaded_func(self.hosts, timeout=timeout + 10,
+                target_function=('read_adc_snapshots', [], {'timeout': timeout}))
+            import numpy
+            fengs = sorted(self.fengines, key=lambda feng_: feng_.input_number)
+            n_samples = res[fengs[0].host.host][1].shape[1]
+            data = numpy.empty((len(fengs), n_samples), dtype=numpy.float32)
+            timestamps = numpy.empty(len(fengs), dtype=numpy.int64)
+            for ctr, feng in enumerate(fengs):
+                host_timestamps, host_data = res[feng.host.host]
+                data[ctr] = host_data[feng.offset]
+                timestamps[ctr] = host_timestamps[feng.offset]
+            return fhost_fpga.AdcData(timestamps, data,
+                                      input_names=[feng.name for feng in fengs])
         else:
             # return the data only for one given input
             rv = None
             host = self.get_fengine(input_name).host
-            rv = host.get_adc_snapshots(input_name, timeout=timeout)
+            rv = host.get_adc_snapshots(input_name, loadcnt=ldmcnt,
+                                        timeout=timeout)
             return {input_name: rv}
 
     def get_version_info(self):
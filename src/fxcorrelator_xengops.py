@@ -6,15 +6,12 @@ from tornado.ioloop import IOLoop
 from tornado.ioloop import PeriodicCallback
 from tornado.locks import Event as IOLoopEvent
 
-from casperfpga import utils as fpgautils
 
 import data_stream
 import fxcorrelator_speadops as speadops
 
 # from corr2LogHandlers import getLogger
 
-THREADED_FPGA_OP = fpgautils.threaded_fpga_operation
-THREADED_FPGA_FUNC = fpgautils.threaded_fpga_function
 
 use_xeng_sim = False
 
@@ -73,11 +70,11 @@ class XengineStream(data_stream.SPEADStream):
         txip = int(self.destination.ip_address)
         txport = self.destination.port
         try:
-            THREADED_FPGA_OP(
+            self.xops.corr.host_executor.threaded_op(
                 self.xops.hosts, timeout=self.timeout,
                 target_function=(lambda fpga_:
                                  fpga_.registers.gbe_iptx.write(reg=txip),))
-            THREADED_FPGA_OP(
+            self.xops.corr.host_executor.threaded_op(
                 self.xops.hosts, timeout=self.timeout,
                 target_function=(lambda fpga_:
                                  fpga_.registers.gbe_porttx.write(reg=txport),))
@@ -93,11 +90,11 @@ class XengineStream(data_stream.SPEADStream):
         :return:
         """
         self.descriptors_issue()
-        THREADED_FPGA_OP(
+        self.xops.corr.host_executor.threaded_op(
             self.xops.hosts, timeout=self.timeout,
             target_function=(
                 lambda fpga_:
-                fpga_.registers.control.write(gbe_txen=True),))
+                fpga_.shadow_write('control', gbe_txen=True),))
         self.tx_enabled = True
         self.xops.logger.info('X-engine output enabled')
 
@@ -106,11 +103,11 @@ class XengineStream(data_stream.SPEADStream):
         Disable TX for this data stream
         :return:
         """
-        THREADED_FPGA_OP(
+        self.xops.corr.host_executor.threaded_op(
             self.xops.hosts, timeout=self.timeout,
             target_function=(
                 lambda fpga_:
-                fpga_.registers.control.write(gbe_txen=False),))
+                fpga_.shadow_write('control', gbe_txen=False),))
         self.tx_enabled = False
         self.xops.logger.info('X-engine output disabled')
 
@@ -157,11 +154,11 @@ class XEngineOperations(object):
 
     @staticmethod
     def _gberst(hosts, state):
-        THREADED_FPGA_OP(
+        self.corr.host_executor.threaded_op(
             hosts, timeout=self.timeout,
             target_function=(
                 lambda fpga_:
-                fpga_.registers.control.write(gbe_rst=state),))
+                fpga_.shadow_write('control', gbe_rst=state),))
 
     @property
     def board_ids(self):
@@ -190,7 +187,7 @@ class XEngineOperations(object):
             board_id += 1
 
         #configure the ethernet cores.
-        THREADED_FPGA_FUNC(
+        self.corr.host_executor.threaded_func(
                 self.hosts, timeout=self.timeout,
                 target_function=('setup_host_gbes',
                                  (), {}))
@@ -273,8 +270,8 @@ class XEngineOperations(object):
         Clear the various status registers and counters on all the xengines
         :return:
         """
-        THREADED_FPGA_FUNC(self.hosts, timeout=self.timeout,
-                           target_function='clear_status')
+        self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
+                                              target_function='clear_status')
 
     def get_baseline_ordering(self):
         """
@@ -307,14 +304,18 @@ class XEngineOperations(object):
         addresses_per_gbe = num_ips_total / (num_x_hosts * num_gbes_per_x)
         if ((addresses_per_gbe%1) != 0):
             raise RuntimeError("Impossible situation: Trying to subscribe to {} addresses per gbe port?".format(addresses_per_gbe))
+        joins = []
         for host_ctr, host in enumerate(self.hosts):
+            host_joins = []
             for gbe in host.gbes:
                 rxaddress = '%s%d' % (source_prefix,
                                       source_base + source_ctr)
-                gbe.multicast_receive(rxaddress, addresses_per_gbe-1)
+                host_joins.append((gbe, rxaddress, addresses_per_gbe-1))
                 source_ctr += addresses_per_gbe
                 self.logger.info('\tXhost %2i, %s: %s(%s+%i)' % (host.index,
                     host.host, gbe.name, rxaddress, addresses_per_gbe - 1))
+            joins.append((host, host_joins))
+        self.corr.multicast_subscribe(joins)
 
     def get_rx_reorder_status(self):
         """
@@ -322,8 +323,8 @@ class XEngineOperations(object):
         x-engines.
         :return: {}
         """
-        return THREADED_FPGA_FUNC(self.hosts, timeout=self.timeout,
-                                  target_function='get_rx_reorder_status')
+        return self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
+                                                     target_function='get_rx_reorder_status')
 
     def get_vacc_status(self):
         """
@@ -331,8 +332,8 @@ class XEngineOperations(object):
         x-engines.
         :return: {}
         """
-        rv=THREADED_FPGA_FUNC(self.hosts, timeout=self.timeout,
-                                  target_function='get_vacc_status')
+        rv=self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
+                                                 target_function='get_vacc_status')
         acc_len=int(self.vacc_acc_len)
         sync=True
         timestamp=rv[rv.keys()[0]][0]['timestamp']
@@ -352,8 +353,8 @@ class XEngineOperations(object):
         Reset all Xengine VACCs
         """
         self.logger.info('Resetting all VACCs.')
-        THREADED_FPGA_FUNC(self.hosts, timeout=self.timeout,
-                               target_function='vacc_reset')
+        self.corr.host_executor.threaded_func(self.hosts, timeout=self.timeout,
+                                              target_function='vacc_reset')
 
     def _vacc_sync_create_loadtime(self, load_time=None):
         """
@@ -505,7 +506,7 @@ class XEngineOperations(object):
 
         # set the load mcount on the x-engines
         self.logger.info('Applying load time: %i.' % load_mcount)
-        THREADED_FPGA_FUNC(
+        self.corr.host_executor.threaded_func(
             self.hosts, timeout=self.timeout,
             target_function=('vacc_set_loadtime', (load_mcount,),))
 
@@ -513,7 +514,7 @@ class XEngineOperations(object):
         #initial_status=self.get_vacc_status()
 
         # arm the xhosts
-        THREADED_FPGA_FUNC(
+        self.corr.host_executor.threaded_func(
             self.hosts, timeout=self.timeout, target_function='vacc_arm')
 
         ## did the arm count increase?
@@ -580,6 +581,7 @@ class XEngineOperations(object):
         :return:
         """
         self.vacc_acc_len = int(self.hosts[0].vacc_get_acc_len())
+        self.corr.save_state()
         if self.corr.sensor_manager:
             self.corr.sensor_manager.sensors_xeng_acc_time()
         return self.vacc_acc_len
@@ -610,17 +612,18 @@ class XEngineOperations(object):
         if(gapsize > 2**19-1):
             gapsize = 2**19
 
-        THREADED_FPGA_OP(
+        self.corr.host_executor.threaded_op(
             self.hosts, timeout=self.timeout,
             target_function=(
                 lambda fpga_:
                 fpga_.registers.gapsize.write(gap_size=gapsize),))
 
-        THREADED_FPGA_OP(
+        self.corr.host_executor.threaded_op(
             self.hosts, timeout=self.timeout,
             target_function=(
                 lambda fpga_:
                 fpga_.vacc_set_acc_len(self.vacc_acc_len),))
+        self.corr.save_state()
         if self.corr.sensor_manager:
             self.corr.sensor_manager.sensors_xeng_acc_time()
         self.logger.info('Set vacc accumulation length %d system-wide '
@@ -633,16 +636,16 @@ class XEngineOperations(object):
         """
         Enable hardware automatic resync upon error detection.
         """
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
-            target_function=(lambda fpga_: fpga_.registers.control.write(auto_rst_enable=True), ))
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fpga_: fpga_.shadow_write('control', auto_rst_enable=True), ))
         self.logger.info('X-engine hardware auto rst/resync mechanism enabled.')
 
     def auto_rst_disable(self):
         """
         Disable hardware automatic resync upon error detection.
         """
-        THREADED_FPGA_OP(self.hosts, timeout=self.timeout,
-            target_function=(lambda fpga_: fpga_.registers.control.write(auto_rst_enable=False), ))
+        self.corr.host_executor.threaded_op(self.hosts, timeout=self.timeout,
+            target_function=(lambda fpga_: fpga_.shadow_write('control', auto_rst_enable=False), ))
         self.logger.info('X-engine hardware auto rst/resync mechanism disabled.')
 
     def get_vacc_loadtime(self):
@@ -650,7 +653,7 @@ class XEngineOperations(object):
         Return the last time the VACCs were all loaded (synchronised),
         else, return -1
         """
-        results = THREADED_FPGA_FUNC(
+        results = self.corr.host_executor.threaded_func(
             self.hosts, timeout=self.timeout,
             target_function=('get_vacc_loadtime'))
 
@@ -0,0 +1,216 @@
+"""
+Long-lived, per-host workers on which to run operations on groups of hosts.
+
+Every host gets a single worker thread, so all the work done on a host -
+instrument operations, sensor reads and the monitoring loop - is
+serialised on it, and fanning out to many hosts costs one queue push per
+host rather than a new thread.
+"""
+import logging
+import threading
+import time
+
+from concurrent import futures
+from casperfpga import utils as fpgautils
+
+LOGGER = logging.getLogger(__name__)
+
+# the host whose worker the current thread is, if any
+_worker = threading.local()
+
+
+class HostExecutionError(RuntimeError):
+    """
+    An operation failed, or missed its deadline, on some of the hosts.
+    The HostResult is kept, so the results from the other hosts are not
+    lost.
+    """
+    def __init__(self, message, result):
+        super(HostExecutionError, self).__init__(message)
+        self.result = result
+
+
+class HostResult(object):
+    """
+    The outcome of running an operation on a group of hosts, keyed on
+    hostname.
+    """
+    def __init__(self):
+        # return values
+        self.successes = {}
+        # exceptions, futures.TimeoutError for missed deadlines
+        self.failures = {}
+        # seconds spent running on each host, excluding queueing
+        self.timings = {}
+
+    @property
+    def ok(self):
+        return len(self.failures) == 0
+
+    def __str__(self):
+        return '{} succeeded, {} failed: {}'.format(
+            len(self.successes), len(self.failures),
+            ', '.join('{}({})'.format(host, exc)
+                      for host, exc in self.failures.items()))
+
+
+class HostExecutor(object):
+    """
+    One worker per host, owned by the instrument.
+    """
+    def __init__(self, hosts=None, logger=LOGGER):
+        """
+        :param hosts: a list of hosts for which to start workers
+        :param logger: the logger to use
+        :return:
+        """
+        self.logger = logger
+        self._executors = {}
+        self._lock = threading.Lock()
+        if hosts is not None:
+            self.add_hosts(hosts)
+
+    def add_hosts(self, hosts):
+        """
+        Start workers for hosts that do not have one yet.
+        :param hosts: a list of hosts
+        :return:
+        """
+        with self._lock:
+            for host in hosts:
+                if host.host not in self._executors:
+                    self._executors[host.host] = \
+                        futures.ThreadPoolExecutor(max_workers=1)
+
+    def executor(self, host):
+        """
+        Get the worker for a host, for use as a concurrent.futures
+        executor, e.g. by the sensors.
+        :param host: the host, or its hostname
+        :return:
+        """
+        hostname = getattr(host, 'host', host)
+        with self._lock:
+            if hostname not in self._executors:
+                self._executors[hostname] = \
+                    futures.ThreadPoolExecutor(max_workers=1)
+            return self._executors[hostname]
+
+    @property
+    def executors(self):
+        """
+        :return: a dictionary of the workers, keyed on hostname
+        """
+        with self._lock:
+            return dict(self._executors)
+
+    def submit(self, host, function, *args, **kwargs):
+        """
+        Run a function on a host's worker.
+        :param host: the host
+        :param function: the function to run
+        :return: a concurrent.futures Future
+        """
+        hostname = host.host
+        if getattr(_worker, 'host', None) == hostname:
+            # already on this host's worker, queueing behind ourselves
+            # would deadlock
+            future = futures.Future()
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+
+        def job():
+            _worker.host = hostname
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _worker.host = None
+        return self.executor(hostname).submit(job)
+
+    def run(self, hosts, target_function, timeout=None):
+        """
+        Run an operation on a group of hosts, each on its own worker.
+        Hosts that fail or miss the deadline do not affect the others.
+        :param hosts: a list of hosts
+        :param target_function: a function, or a (function, args, kwargs)
+            tuple, as for casperfpga's threaded_fpga_operation. The function
+            is called with the host as its first argument.
+        :param timeout: the deadline for all the hosts, in seconds
+        :return: a HostResult
+        """
+        function, args, kwargs = fpgautils._check_target_func(target_function)
+        result = HostResult()
+
+        def timed_function(host):
+            start = time.time()
+            try:
+                return function(host, *args, **kwargs)
+            finally:
+                result.timings[host.host] = time.time() - start
+        pending = {}
+        for host in hosts:
+            pending[self.submit(host, timed_function, host)] = host
+        done, not_done = futures.wait(pending.keys(), timeout=timeout)
+        for future in done:
+            hostname = pending[future].host
+            exc = future.exception()
+            if exc is None:
+                result.successes[hostname] = future.result()
+            else:
+                result.failures[hostname] = exc
+        for future in not_done:
+            # a job that has already started cannot be stopped, it keeps
+            # the worker busy until it is done
+            future.cancel()
+            result.failures[pending[future].host] = futures.TimeoutError(
+                'did not complete within {}s'.format(timeout))
+        return result
+
+    def threaded_op(self, hosts, timeout, target_function):
+        """
+        A drop-in replacement for casperfpga's threaded_fpga_operation.
+        :param hosts: a list of hosts
+        :param timeout: the deadline for all the hosts, in seconds
+        :param target_function: a function, or a (function, args, kwargs)
+            tuple. The function is called with the host as its first
+            argument.
+        :return: a dictionary of return values, keyed on hostname
+        """
+        result = self.run(hosts, target_function, timeout)
+        if not result.ok:
+            errmsg = 'Operation failed on some hosts - {}'.format(result)
+            self.logger.error(errmsg)
+            raise HostExecutionError(errmsg, result)
+        return result.successes
+
+    def threaded_func(self, hosts, timeout, target_function):
+        """
+        A drop-in replacement for casperfpga's threaded_fpga_function.
+        :param hosts: a list of hosts
+        :param timeout: the deadline for all the hosts, in seconds
+        :param target_function: the name of a host method, or a
+            (name, args, kwargs) tuple
+        :return: a dictionary of return values, keyed on hostname
+        """
+        method_name, args, kwargs = fpgautils._check_target_func(
+            target_function)
+
+        def method(host, *args, **kwargs):
+            return getattr(host, method_name)(*args, **kwargs)
+        return self.threaded_op(hosts, timeout, (method, args, kwargs))
+
+    def shutdown(self, wait=False):
+        """
+        Stop all the workers.
+        :param wait: wait for queued jobs to finish
+        :return:
+        """
+        with self._lock:
+            executors = self._executors.values()
+            self._executors = {}
+        for executor in executors:
+            executor.shutdown(wait=wait)
+# end
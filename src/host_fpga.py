@@ -1,9 +1,14 @@
 import logging
+import struct
 import time
+import threading
 
 from casperfpga.casperfpga import CasperFpga
+from casperfpga.memory import bin2fp, fp2fixed_int
 from casperfpga.network import Mac
 
+import bitstream_cache
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -11,6 +16,24 @@ class FpgaHost(CasperFpga):
     """
     A Host that is a CASPER FPGA, ROACH2 or SKARAB.
     """
+    # The status registers read by each status getter, as register name
+    # templates: {offset} is expanded for each F-engine on the host and
+    # {xeng} for each X-engine. Registers the design does not have are left
+    # out. See read_status_bundles.
+    STATUS_BUNDLES = {}
+    # status reads span gaps of up to this many words between registers,
+    # rather than starting another transaction
+    STATUS_READ_MAX_GAP = 8
+
+    def __init__(self, *args, **kwargs):
+        # software copy of the control registers that only we write,
+        # see shadow_write
+        self._shadow = {}
+        self._shadow_lock = threading.Lock()
+        self.shadow_round_trips_avoided = 0
+        # read runs for each combination of status bundles
+        self._status_runs = {}
+        super(FpgaHost, self).__init__(*args, **kwargs)
 
     def setup_host_gbes(self):
         """
@@ -22,4 +45,308 @@ class FpgaHost(CasperFpga):
                 gbe.fabric_enable()
             else:
                 raise RuntimeError("This gbe core is not supported!")
+
+    def get_system_information(self, filename=None, fpg_info=None, **kwargs):
+        """
+        The register map may have changed, so forget any shadowed values.
+        Designs from file come from the process-wide bitstream_cache, rather
+        than each host parsing the file again.
+        :param filename: fpg filename
+        :param fpg_info: a tuple containing device_info and
+        coreinfo dictionaries
+        """
+        self.shadow_resync()
+        self._status_runs = {}
+        if (filename is not None) and (fpg_info is None):
+            fpg_info = bitstream_cache.get_fpg_info(filename)
+            filename = None
+        return super(FpgaHost, self).get_system_information(
+            filename=filename, fpg_info=fpg_info, **kwargs)
+
+    def _bitstream_tag(self):
+        """
+        The tag written to sys_scratchpad to say which image this host was
+        programmed with: the first 32 bits of the md5 of the loaded
+        design's bitstream.
+        :return: the tag, or None if the design has no md5
+        """
+        md5 = self.system_info.get('md5_bitstream')
+        if md5 is None:
+            return None
+        return int(md5[:8], 16)
+
+    def running_bitstream_matches(self, filename):
+        """
+        Is this host already running the given image, as programmed and
+        tagged by a previous run? Loads the image's design information.
+        :param filename: the fpg file
+        :return: True if the host is known to be running this image
+        """
+        try:
+            self.get_system_information(filename)
+            tag = self._bitstream_tag()
+            return (tag is not None) and (self.read_uint('sys_scratchpad') == tag)
+        except Exception as exc:
+            self.logger.debug('Could not check running image: {}'.format(exc))
+            return False
+
+    def tag_bitstream(self):
+        """
+        Record the md5 of the loaded design on the host, once it has been
+        programmed, see running_bitstream_matches.
+        :return:
+        """
+        tag = self._bitstream_tag()
+        if tag is not None:
+            self.write_int('sys_scratchpad', tag)
+
+    def log_hmc_status(self, hmc_name, label):
+        """
+        Log the status of one of the host's HMCs, e.g. once its block has
+        counted errors. It reads the hardware, so run it on the host's
+        worker.
+        :param hmc_name: the HMC's name in self.hmcs
+        :param label: what to call it in the log
+        :return:
+        """
+        try:
+            status = getattr(self.hmcs, hmc_name).get_hmc_status()
+        except Exception as exc:
+            self.logger.error('{} status could not be read - {}'.format(
+                label, exc))
+            return
+        self.logger.error('{} status: {}'.format(label, status))
+
+    def _shadow_field_raw(self, register_name, field, value):
+        """
+        Encode a field value as casperfpga Register.write does.
+        :param register_name: the register, for the error message
+        :param field: the casperfpga register field
+        :param value: the new field value, a number or boolean
+        :return: the field's raw bits
+        """
+        try:
+            return fp2fixed_int(value, field.width_bits, field.binary_pt,
+                                field.numtype == 1)
+        except ValueError as exc:
+            errmsg = 'Cannot write {} to {}.{}: {}'.format(
+                value, register_name, field.name, exc)
+            self.logger.error(errmsg)
+            raise ValueError(errmsg)
+
+    @staticmethod
+    def _shadow_field_word(word, field, raw):
+        """
+        Place a field's raw bits into a register word.
+        :param word: the current 32-bit register word
+        :param field: the casperfpga register field
+        :param raw: the field's raw bits, see _shadow_field_raw
+        :return: the updated register word
+        """
+        mask = (1 << field.width_bits) - 1
+        word &= ~(mask << field.offset)
+        word |= (raw & mask) << field.offset
+        return word & 0xffffffff
+
+    def shadow_write(self, register_name, **kwargs):
+        """
+        Write fields of a software-owned control register, using a shadow
+        copy of its contents rather than casperfpga's read-modify-write.
+        Writes that would not change the register are skipped.
+        Field values of 'pulse' and 'toggle' behave as for
+        casperfpga Register.write.
+        :param register_name: the register to write
+        :param kwargs: field_name=value pairs
+        :return:
+        """
+        register = self.registers[register_name]
+        pulse = {}
+        with self._shadow_lock:
+            if register_name in self._shadow:
+                word = self._shadow[register_name]
+                self.shadow_round_trips_avoided += 1
+            else:
+                word = self.read_uint(register_name)
+            new_word = word
+            for field_name, value in kwargs.items():
+                field = register._fields[field_name]
+                current = (word >> field.offset) & \
+                    ((1 << field.width_bits) - 1)
+                if value == 'pulse':
+                    # invert the field, then restore it
+                    pulse[field_name] = (field, 0 if current else 1)
+                    continue
+                elif value == 'toggle':
+                    raw = 0 if current else 1
+                else:
+                    raw = self._shadow_field_raw(register_name, field, value)
+                new_word = self._shadow_field_word(new_word, field, raw)
+            if (new_word == word) and (register_name in self._shadow) and \
+                    (len(pulse) == 0):
+                self.shadow_round_trips_avoided += 1
+                return
+            if len(pulse) > 0:
+                pulse_word = new_word
+                for field, raw in pulse.values():
+                    pulse_word = self._shadow_field_word(pulse_word, field,
+                                                         raw)
+                self.write_int(register_name, pulse_word, blindwrite=True)
+            self.write_int(register_name, new_word, blindwrite=True)
+            self._shadow[register_name] = new_word
+
+    def shadow_resync(self, register_names=None):
+        """
+        Forget the shadowed values of control registers, so that the next
+        write reads them from the hardware again. Needed after anything
+        that resets the registers behind our back.
+        :param register_names: a list of registers to forget, all if None
+        :return:
+        """
+        with self._shadow_lock:
+            if register_names is None:
+                self._shadow = {}
+            else:
+                for register_name in register_names:
+                    self._shadow.pop(register_name, None)
+
+    def _register_runs(self, register_names, max_gap=0):
+        """
+        Group register names into runs of nearby 32-bit words, so that
+        each run can be accessed in a single bulk transaction.
+        :param register_names: a list of register names
+        :param max_gap: the most unused words allowed between two registers
+            in a run. Must be zero for writes.
+        :return: a list of lists of register names, each in address order
+        """
+        def _address(name):
+            return getattr(self.registers[name], 'address', None)
+        named = [(_address(name), name) for name in register_names]
+        runs = []
+        last_address = None
+        for address, name in sorted(named):
+            if (address is None) or (last_address is None) or \
+                    (address > last_address + 4 * (max_gap + 1)):
+                runs.append([])
+            runs[-1].append(name)
+            last_address = address
+        return runs
+
+    def write_registers_batched(self, words):
+        """
+        Write raw 32-bit words to a number of registers, coalescing
+        registers that are contiguous in the memory map into one
+        bulk write.
+        :param words: a list of (register_name, integer) tuples
+        :return: the number of transactions used
+        """
+        word_dict = dict(words)
+        runs = self._register_runs(word_dict.keys())
+        for run in runs:
+            data = struct.pack('>%iI' % len(run),
+                               *[word_dict[name] & 0xffffffff for name in run])
+            self.blindwrite(run[0], data)
+        return len(runs)
+
+    def _decode_register(self, register_name, word):
+        """
+        Decode a raw register word into its fields, as casperfpga's
+        Register.read does.
+        :param register_name: the register
+        :param word: the 32-bit word read from it
+        :return: a dictionary of field values
+        """
+        fields = {}
+        for field_name, field in self.registers[register_name]._fields.items():
+            raw = (word >> field.offset) & ((1 << field.width_bits) - 1)
+            if field.numtype == 2:
+                fields[field_name] = bool(raw)
+            else:
+                fields[field_name] = bin2fp(raw, field.width_bits,
+                                            field.binary_pt, field.numtype == 1)
+        return fields
+
+    def _read_register_runs(self, runs):
+        """
+        Read runs of registers, as grouped by _register_runs, one bulk read
+        per run.
+        :param runs: a list of lists of register names
+        :return: a dictionary of field dictionaries, keyed on register name
+        """
+        rv = {}
+        for run in runs:
+            if len(run) == 1:
+                words = {run[0]: struct.unpack('>I', self.read(run[0], 4))[0]}
+            else:
+                start = self.registers[run[0]].address
+                size = self.registers[run[-1]].address - start + 4
+                raw = struct.unpack('>%iI' % (size / 4),
+                                    self.read(run[0], size))
+                words = dict(
+                    (name, raw[(self.registers[name].address - start) / 4])
+                    for name in run)
+            for name in run:
+                rv[name] = self._decode_register(name, words[name])
+        return rv
+
+    def read_registers_batched(self, register_names, max_gap=0):
+        """
+        Read a number of registers, coalescing registers that are
+        contiguous in the memory map into one bulk read. The raw words are
+        decoded using the register field definitions.
+        :param register_names: a list of register names
+        :param max_gap: also coalesce registers separated by up to this
+            many words
+        :return: a dictionary of field dictionaries, keyed on register name
+        """
+        return self._read_register_runs(
+            self._register_runs(register_names, max_gap))
+
+    def _status_template_values(self):
+        """
+        The values used to expand the STATUS_BUNDLES templates.
+        :return: a dictionary of lists, keyed on template field
+        """
+        return {}
+
+    def status_bundle_registers(self, bundle_names):
+        """
+        The registers in the design that make up some status bundles.
+        :param bundle_names: a list of STATUS_BUNDLES names
+        :return: a list of register names
+        """
+        template_values = self._status_template_values()
+        design_registers = set(self.registers.names())
+        register_names = []
+        for bundle_name in bundle_names:
+            for template in self.STATUS_BUNDLES[bundle_name]:
+                names = [template]
+                for key, values in template_values.items():
+                    if ('{%s}' % key) in template:
+                        names = [name.replace('{%s}' % key, str(value))
+                                 for name in names for value in values]
+                for name in names:
+                    if (name in design_registers) and \
+                            (name not in register_names):
+                        register_names.append(name)
+        return register_names
+
+    def read_status_bundles(self, bundle_names):
+        """
+        Read all the registers for some status bundles, with as few bulk
+        reads as the memory map allows, and decode them in one pass. The
+        result can be handed to the status getters, so that one read per
+        host serves all of them.
+        :param bundle_names: a list of STATUS_BUNDLES names
+        :return: a dictionary of field dictionaries, keyed on register name
+        """
+        key = (tuple(sorted(bundle_names)),
+               tuple(sorted((field, tuple(values)) for field, values in
+                            self._status_template_values().items())))
+        runs = self._status_runs.get(key)
+        if runs is None:
+            runs = self._register_runs(
+                self.status_bundle_registers(bundle_names),
+                max_gap=self.STATUS_READ_MAX_GAP)
+            self._status_runs[key] = runs
+        return self._read_register_runs(runs)
 # end
@@ -0,0 +1,159 @@
+"""
+A snapshot of the software state of a running instrument - input labels,
+EQ, delays, accumulation length, board IDs and beam weights - kept in
+local files, so that a restarted servlet can attach to the instrument
+without reading all of it back from the hardware.
+
+The state is kept in parts, each in its own file, so that the frequent
+changes do not rewrite the large ones: the delays change on every delay
+commit, the EQs, thousands of values per input, only when they are set.
+"""
+import cPickle
+import logging
+import os
+import tempfile
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# bump this when the layout of the state changes, old files are then ignored
+STATE_VERSION = 2
+
+# the parts of the state, each kept in its own file
+STATE_PARTS = ['main', 'eq', 'delays']
+
+# the parts of a delay.Delay that are kept
+DELAY_FIELDS = ['delay', 'delay_delta', 'phase_offset', 'phase_offset_delta',
+                'load_mcnt', 'load_count', 'arm_count', 'last_load_success',
+                'saturated']
+
+
+def part_filename(filename, part):
+    """
+    :param filename: the state file
+    :param part: one of STATE_PARTS
+    :return: the file in which that part of the state is kept
+    """
+    if part == 'main':
+        return filename
+    return '{}.{}'.format(filename, part)
+
+
+def delay_to_dict(delay):
+    """
+    :param delay: a delay.Delay
+    :return: a dictionary of its values, suitable for pickling
+    """
+    return {field: getattr(delay, field) for field in DELAY_FIELDS}
+
+
+def delay_from_dict(delay, values):
+    """
+    Restore the values saved by delay_to_dict.
+    :param delay: the delay.Delay to update
+    :param values: a dictionary from delay_to_dict
+    :return:
+    """
+    for field in DELAY_FIELDS:
+        if field in values:
+            setattr(delay, field, values[field])
+
+
+class StateFile(object):
+    """
+    The file in which an instrument's state is kept. Saves are coalesced,
+    so that frequent changes, e.g. delay updates, cost at most one write
+    every min_interval seconds. The latest state always wins.
+    """
+    def __init__(self, filename, min_interval=1.0, logger=LOGGER):
+        """
+        :param filename: the state file
+        :param min_interval: the least time between writes, in seconds
+        :param logger: the logger to use
+        :return:
+        """
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self.min_interval = min_interval
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._timer = None
+        self._last_write = 0
+
+    def save(self, state):
+        """
+        Queue a state snapshot to be written.
+        :param state: a dictionary, as from FxCorrelator.get_state
+        :return:
+        """
+        with self._lock:
+            self._pending = state
+            if self._timer is not None:
+                return
+            wait = max(0, self._last_write + self.min_interval - time.time())
+            self._timer = threading.Timer(wait, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """
+        Write any queued snapshot now.
+        :return:
+        """
+        with self._lock:
+            state = self._pending
+            self._pending = None
+            if (self._timer is not None) and \
+                    (self._timer is not threading.current_thread()):
+                self._timer.cancel()
+            self._timer = None
+        if state is None:
+            return
+        with self._write_lock:
+            try:
+                self._write(state)
+            except (IOError, OSError, cPickle.PicklingError) as exc:
+                self.logger.warning('Could not write instrument state to '
+                                    '{}: {}'.format(self.filename, exc))
+            self._last_write = time.time()
+
+    def _write(self, state):
+        directory = os.path.dirname(self.filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # write and rename, so that a crash never leaves half a file
+        handle, tmpname = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, 'wb') as statefile:
+                cPickle.dump(state, statefile, cPickle.HIGHEST_PROTOCOL)
+            os.rename(tmpname, self.filename)
+        except Exception:
+            os.remove(tmpname)
+            raise
+        self.logger.debug('Instrument state written to {}'.format(
+            self.filename))
+
+    def load(self):
+        """
+        Read the saved state.
+        :return: the state dictionary, or None if there is no usable state
+        """
+        try:
+            with open(self.filename, 'rb') as statefile:
+                state = cPickle.load(statefile)
+        except IOError:
+            return None
+        except Exception as exc:
+            self.logger.warning('Ignoring bad instrument state file {}: '
+                                '{}'.format(self.filename, exc))
+            return None
+        if (not isinstance(state, dict)) or \
+                (state.get('version') != STATE_VERSION):
+            self.logger.warning('Ignoring instrument state file {}, it is '
+                                'from a different version.'.format(
+                                    self.filename))
+            return None
+        return state
+# end
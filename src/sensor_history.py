@@ -0,0 +1,90 @@
+"""
+Fixed-size histories of sensor readings, kept in memory so that the recent
+behaviour of a sensor can be queried without an external archiver.
+
+Each history is a ring buffer of (timestamp, status, value) in preallocated
+numpy arrays, so appending is O(1) and the memory used is fixed when the
+history is made: 8 bytes for the timestamp, 1 for the status and, for
+numeric sensors, 8 for the value - about 17 bytes per sample. A thousand
+samples for each of 10000 sensors is thus about 170 MB. Other sensor types
+keep a reference to each value, and share the values themselves.
+"""
+import numpy
+
+# the numpy dtype in which to keep the values of each katcp sensor type,
+# values of other types are kept as objects
+VALUE_DTYPES = {
+    'integer': numpy.int64,
+    'float': numpy.float64,
+    'boolean': numpy.bool_,
+    'timestamp': numpy.float64,
+}
+
+
+class SensorHistory(object):
+    """
+    The last length readings of a sensor.
+    """
+    def __init__(self, length, sensor_type=None):
+        """
+        :param length: the number of readings to keep
+        :param sensor_type: the katcp sensor type name, e.g. 'integer'
+        :return:
+        """
+        if length < 1:
+            raise ValueError('A sensor history needs a length of at least '
+                             'one, not {}.'.format(length))
+        self.length = length
+        self.times = numpy.zeros(length, dtype=numpy.float64)
+        self.statuses = numpy.zeros(length, dtype=numpy.int8)
+        self.values = numpy.zeros(length, dtype=VALUE_DTYPES.get(
+            sensor_type, numpy.object_))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, status, value):
+        """
+        Add a reading, overwriting the oldest if the history is full.
+        :param timestamp: when the reading was taken
+        :param status: the katcp sensor status
+        :param value: the sensor value
+        :return:
+        """
+        self.times[self._next] = timestamp
+        self.statuses[self._next] = status
+        self.values[self._next] = value
+        self._next = (self._next + 1) % self.length
+        if self._count < self.length:
+            self._count += 1
+
+    def clear(self):
+        """
+        Forget all the readings.
+        :return:
+        """
+        self._next = 0
+        self._count = 0
+
+    def samples(self, since=0, max_samples=None):
+        """
+        Get the readings in the history, oldest first.
+        :param since: only readings taken after this UNIX time
+        :param max_samples: decimate to at most this many readings, evenly
+            spaced through the history and always including the latest
+        :return: a (times, statuses, values) tuple of numpy arrays
+        """
+        order = numpy.arange(self._next - self._count, self._next) % \
+            self.length
+        order = order[self.times[order] > since]
+        if (max_samples is not None) and (len(order) > max_samples):
+            if max_samples < 1:
+                order = order[:0]
+            else:
+                # step back from the latest, so that it is always included
+                step = int(numpy.ceil(float(len(order)) / max_samples))
+                order = order[::-step][:max_samples][::-1]
+        return self.times[order], self.statuses[order], self.values[order]
+# end
@@ -1,81 +1,298 @@
-import time;
-import math;
+"""
+Scheduling of the periodic sensor tasks.
 
+Every task runs to its own deadlines, at the period of its priority class,
+so the poll period stays the same however many hosts there are. Each run
+starts at a random point near the beginning of its period, so that hosts
+do not poll in lockstep. A run that takes longer than the task's time
+budget, or that is still busy when its next period starts, is counted as
+an overrun, and the counts are reported on the task's sensors.
+"""
+import logging
+import math
+import random
+import time
 
-sensor_call_gap_time_s = 0.003;
-sensor_loop_runtime = 0;
-sensor_loop_running_tasks = 0;
-sensor_loop_start_time = round(time.time())+4;
-sensor_loop_flow_control_padding = 0;
-logger = None;
+from tornado import gen
 
-class SensorTask:
-    def __init__(self,function_name,minimum_time_between_calls_s=0):
+from sensors import Corr2Sensor
+
+LOGGER = logging.getLogger(__name__)
+
+# the priority classes: per-host counters are polled fast, the aggregates
+# across the whole instrument more slowly
+PRIORITY_FAST = 'fast'
+PRIORITY_SLOW = 'slow'
+
+# the default period of each priority class, in seconds
+DEFAULT_PERIODS = {
+    PRIORITY_FAST: 1.0,
+    PRIORITY_SLOW: 2.0,
+}
+
+
+def set_sensors_failure(sensors, timestamp=None):
+    """
+    Set a group of sensors to FAILURE, with their default values.
+    :param sensors: a sensor, or a dictionary or list of them, nested as
+        the sensor update functions take them
+    :param timestamp: when the failure was seen
+    :return:
+    """
+    if isinstance(sensors, dict):
+        sensors = sensors.values()
+    if isinstance(sensors, (list, tuple)):
+        for sensor in sensors:
+            set_sensors_failure(sensor, timestamp)
+        return
+    sensors.set(timestamp=timestamp, status=Corr2Sensor.FAILURE,
+                value=Corr2Sensor.SENSOR_TYPES[
+                    Corr2Sensor.SENSOR_TYPE_LOOKUP[sensors.type]][1])
+
+
+class SensorTask(object):
+    """
+    A periodic sensor task, run by a SensorScheduler.
+    """
+    def __init__(self, scheduler, name, function, args, period, budget,
+                 sensors=None):
+        """
+        :param scheduler: the SensorScheduler running the task
+        :param name: the task name, for logging
+        :param function: called as function(*args), it may return a
+            future, which is waited for
+        :param args: the arguments to the function
+        :param period: seconds between the starts of consecutive periods
+        :param budget: the time the task may take per run, in seconds
+        :param sensors: a dictionary with the task's 'overrun_cnt' and
+            'runtime' sensors, if any
+        :return:
+        """
+        self.scheduler = scheduler
+        self.name = name
+        self.function = function
+        self.args = args
+        self.period = period
+        self.budget = budget
+        self.sensors = sensors or {}
+        self.period_start = None
+        self.runs = 0
+        self.num_time_overruns = 0
         self.last_runtime_length = 0
-        self.last_runtime_utc = 0;
-        self.executed = False;
-        self.name = function_name;
-        self.num_time_overruns = 0;
-        self.flow_control_increments = 0;
-        self.minimum_time_between_calls_ms = minimum_time_between_calls_s;
-        logger.debug(self.name)
-
-    def getNextSensorCallTime(self,current_function_runtime=0):
-        global sensor_loop_runtime;
-        global sensor_call_gap_time_s;
-        global sensor_loop_running_tasks;
-        global sensor_loop_start_time;
-        global sensor_loop_flow_control_padding;
-        global logger
-        
-        #printTime = False;
-        last_runtime_length = self.last_runtime_length;
-        if(self.executed == False):
-            self.executed = True;
-            sensor_loop_running_tasks+=1
-            self.last_runtime_utc = sensor_loop_start_time;
-        #    printTime = True;
-
-        self.last_runtime_length = current_function_runtime
-        
-	time_increment = (sensor_loop_running_tasks+sensor_loop_flow_control_padding)*sensor_call_gap_time_s
-
-	#This ensures that a sensor is not called within a specified minimum time - this ensures we play nicely with some CAM
-	if(time_increment<self.minimum_time_between_calls_ms):
-		num_time_increments_required = math.ceil(self.minimum_time_between_calls_ms/time_increment)
-		time_increment = time_increment * num_time_increments_required
-		#print( time.time()," Time increments required: ",num_time_increments_required)
-		#print( time.time()," Total Time Incrementing: ",time_increment)
-
-
-        next_sensor_call_time = self.last_runtime_utc + time_increment
-        self.last_runtime_utc = next_sensor_call_time
-
-        #Network Flow Control
-        if(current_function_runtime>sensor_call_gap_time_s*(self.flow_control_increments+1)):
-            self.num_time_overruns+=1;
-        elif(current_function_runtime<sensor_call_gap_time_s*(self.flow_control_increments)):
-            self.num_time_overruns-=1;
-        else:
-            self.num_time_overruns=0
-        
-        if(self.num_time_overruns > 5):
-            #print("%s took %fs longer to run than allocated - this occured five times in a row, performing flow control"%(self.name,current_function_runtime-(1+self.flow_control_increments)*sensor_call_gap_time_s))
-            self.num_time_overruns=0
-            self.flow_control_increments+=1
-            sensor_loop_flow_control_padding+=1
-
-        if(self.num_time_overruns < -5):
-            #print("%s took %fs less to run than allocated - this occured five times in a row, performing flow control"%((1+self.flow_control_increments)*sensor_call_gap_time_s)-self.name,current_function_runtime)
-            self.num_time_overruns=0
-            self.flow_control_increments-=1
-            sensor_loop_flow_control_padding-=1
-
-        logger.debug('{0:} finished at {1:.4f}. Next Call:{2:.4f} Runtime: {3:.5f}.'.format(self.name,time.time(),next_sensor_call_time,current_function_runtime))
-        #if(printTime):
-        #    print ("Sensor function: {0:} First Call: {1:.4f} Next Call: {2:.4f}".format(self.name,time.time(),next_sensor_call_time))
-        return next_sensor_call_time
-
-        
-    
-    
+        self.max_runtime_length = 0
+
+    def start(self):
+        """
+        Schedule the first run, at a random phase in the first period.
+        :return:
+        """
+        self.period_start = time.time() + random.uniform(0, self.period)
+        self._schedule()
+
+    def _schedule(self):
+        jitter = random.uniform(0, self.scheduler.jitter * self.period)
+        self.scheduler.ioloop.call_at(self.period_start + jitter, self.run)
+
+    @gen.coroutine
+    def run(self):
+        """
+        Run the task once, account for its runtime and schedule the next
+        run.
+        :return:
+        """
+        if not self.scheduler.running:
+            return
+        start_time = time.time()
+        try:
+            result = self.function(*self.args)
+            if result is not None:
+                yield result
+        except Exception as e:
+            self.scheduler.logger.error('Sensor task {} failed - {}'.format(
+                self.name, e))
+        end_time = time.time()
+        self.runs += 1
+        self.last_runtime_length = end_time - start_time
+        self.max_runtime_length = max(self.max_runtime_length,
+                                      self.last_runtime_length)
+        overrun = self.last_runtime_length > self.budget
+        self.period_start += self.period
+        if self.period_start < end_time:
+            # still busy when the next period started, skip to the one
+            # after rather than run back-to-back to catch up
+            overrun = True
+            self.period_start += self.period * math.ceil(
+                (end_time - self.period_start) / self.period)
+        if overrun:
+            self.num_time_overruns += 1
+            self.scheduler.logger.debug(
+                '{} overran: {:.4f}s against a budget of {:.4f}s'.format(
+                    self.name, self.last_runtime_length, self.budget))
+        self._update_sensors(end_time)
+        self._schedule()
+
+    def _update_sensors(self, timestamp):
+        if 'overrun_cnt' in self.sensors:
+            self.sensors['overrun_cnt'].set(
+                timestamp=timestamp, value=self.num_time_overruns,
+                warnif='changed')
+        if 'runtime' in self.sensors:
+            status = Corr2Sensor.WARN \
+                if self.last_runtime_length > self.budget \
+                else Corr2Sensor.NOMINAL
+            self.sensors['runtime'].set(
+                timestamp=timestamp, value=self.last_runtime_length,
+                status=status)
+
+
+class SensorScheduler(object):
+    """
+    Runs the periodic sensor tasks on the IOLoop, each to its own
+    deadlines.
+    """
+    def __init__(self, ioloop, sensor_manager=None, periods=None,
+                 budget_fraction=0.5, jitter=0.1, logger=LOGGER):
+        """
+        :param ioloop: the IOLoop on which to run the tasks
+        :param sensor_manager: the SensorManager with which to make the
+            tasks' overrun sensors, none are made if not given
+        :param periods: a dictionary of periods, in seconds, keyed on
+            priority class, to override DEFAULT_PERIODS
+        :param budget_fraction: the default time budget of a task, as a
+            fraction of its period
+        :param jitter: how far into its period a run may start, as a
+            fraction of the period
+        :param logger: the logger to use
+        :return:
+        """
+        self.ioloop = ioloop
+        self.sensor_manager = sensor_manager
+        self.periods = DEFAULT_PERIODS.copy()
+        self.periods.update(periods or {})
+        self.budget_fraction = budget_fraction
+        self.jitter = jitter
+        self.logger = logger
+        self.tasks = []
+        self.running = False
+
+    def add_task(self, name, function, args=(), priority=PRIORITY_FAST,
+                 budget=None, sensor_prefix=None):
+        """
+        Add a periodic task, started now if the scheduler is running.
+        :param name: the task name, for logging
+        :param function: called as function(*args) every period, it may
+            return a future, which is waited for
+        :param args: the arguments to the function
+        :param priority: the task's priority class, one of DEFAULT_PERIODS
+        :param budget: the time the task may take per run, in seconds,
+            a fraction of the period by default
+        :param sensor_prefix: the prefix for the task's overrun sensors,
+            e.g. a host's functional name
+        :return: the SensorTask
+        """
+        if priority not in self.periods:
+            errmsg = 'Unknown sensor task priority class {}, expected one ' \
+                     'of {}.'.format(priority, self.periods.keys())
+            self.logger.error(errmsg)
+            raise ValueError(errmsg)
+        period = self.periods[priority]
+        if budget is None:
+            budget = period * self.budget_fraction
+        sensors = None
+        if (sensor_prefix is not None) and (self.sensor_manager is not None):
+            pref = '{}.sensor-poll'.format(sensor_prefix)
+            sensors = {
+                'overrun_cnt': self.sensor_manager.do_sensor(
+                    Corr2Sensor.integer, '{}.overrun-cnt'.format(pref),
+                    'Number of sensor polls that overran their time budget '
+                    'or period.'),
+                'runtime': self.sensor_manager.do_sensor(
+                    Corr2Sensor.float, '{}.runtime'.format(pref),
+                    'Duration of the last sensor poll.', unit='s'),
+            }
+        task = SensorTask(self, name, function, args, period, budget,
+                          sensors)
+        self.tasks.append(task)
+        if self.running:
+            task.start()
+        return task
+
+    def start(self):
+        """
+        Start running all the tasks.
+        :return:
+        """
+        self.running = True
+        for task in self.tasks:
+            task.start()
+
+    def stop(self):
+        """
+        Stop the tasks, any runs in progress finish but are not
+        rescheduled.
+        :return:
+        """
+        self.running = False
+
+
+class HostStatusPoll(object):
+    """
+    A single status poll per host per cycle. One job on the host's worker
+    reads everything the host's sensors need, and the readings are then
+    handed to each sensor update function in turn, on the IOLoop. All the
+    sensors of a host thus share one read and one timestamp.
+    Run it as a SensorScheduler task.
+    """
+    def __init__(self, name, host, executor, read_function, logger=LOGGER):
+        """
+        :param name: a name for the poll, for logging
+        :param host: the host to poll
+        :param executor: the host's worker
+        :param read_function: called as read_function(host) on the worker,
+            it returns a dictionary of readings, with a 'time' key
+        :param logger: the logger to use
+        :return:
+        """
+        self.name = name
+        self.host = host
+        self.executor = executor
+        self.read_function = read_function
+        self.logger = logger
+        self.updates = []
+
+    def add_update(self, update_function, sensors, *args):
+        """
+        Add a group of sensors to be updated from the readings.
+        :param update_function: called as
+            update_function(readings, sensors, *args)
+        :param sensors: the sensors it updates, set to FAILURE if the host
+            cannot be read
+        :return:
+        """
+        self.updates.append((update_function, sensors, args))
+
+    @gen.coroutine
+    def poll(self):
+        """
+        Read the host and update all its sensors.
+        :return:
+        """
+        try:
+            readings = yield self.executor.submit(self.read_function,
+                                                  self.host)
+            timestamp = readings['time']
+        except Exception as e:
+            self.logger.error('{}: could not read status - {}'.format(
+                self.name, e))
+            readings = None
+            timestamp = time.time()
+        for update_function, sensors, args in self.updates:
+            try:
+                if readings is None:
+                    set_sensors_failure(sensors, timestamp)
+                else:
+                    update_function(readings, sensors, *args)
+            except Exception as e:
+                self.logger.error('{}: {} failed - {}'.format(
+                    self.name, update_function.__name__, e))
+# end
@@ -0,0 +1,365 @@
+"""
+Sharded sensors: the periodic sensors of an instrument split across worker
+processes, so that the number of host polls per second scales with the
+number of cores rather than being capped by one process's GIL and IOLoop.
+
+Each worker process owns a subset of the hosts, and only connects to them,
+and their executors and polls. It sends its sensors and their changes down a pipe to the front
+process, which owns the katcp server and the sensor registry. The sensors
+read across all the hosts, e.g. the F-engine received times and the VACCs,
+run in a worker of their own, after the host shards, so that they cannot
+hold up any host's polls. The device-status roll-ups are rebuilt in the
+front process, over the sensors of all the shards, so that e.g. an F-host's
+LRU still includes its received timestamp. A stuck host only holds up the
+shard it is in, and if a worker dies, only its sensors go to FAILURE.
+"""
+import logging
+import multiprocessing
+import re
+import signal
+import threading
+
+from tornado.ioloop import IOLoop
+
+from sensors import Corr2Sensor, Corr2SensorRollup, SensorManager
+import sensors_periodic
+import sensor_scheduler
+import utils
+
+LOGGER = logging.getLogger(__name__)
+
+
+def shard_hosts(config, shard, num_shards):
+    """
+    The hosts in a shard, the F- and X-hosts dealt out in turn.
+    :param config: the instrument config file
+    :param shard: the shard number, from 0
+    :param num_shards: the number of shards
+    :return: a list of hostnames
+    """
+    configd = utils.parse_ini_file(config)
+    hostnames = []
+    for section in ['fengine', 'xengine']:
+        hostnames.extend(
+            re.split(r'[,\s]+', configd[section]['hosts'].strip()))
+    return hostnames[shard::num_shards]
+
+
+class ShardSensorManager(SensorManager):
+    """
+    The SensorManager of a worker process. Rather than to a katcp server,
+    new sensors, their roll-ups and their changes are sent down a pipe to
+    the front process, batched every flush_interval seconds. Only the
+    latest reading of each sensor is sent.
+    """
+    def __init__(self, connection, instrument, flush_interval=0.1,
+                 **kwargs):
+        """
+        :param connection: the sending end of the pipe to the front process
+        :param instrument: the worker's corr2 instance
+        :param flush_interval: how often to send the changes, in seconds
+        :return:
+        """
+        super(ShardSensorManager, self).__init__(
+            None, instrument, katcp_sensors=False, kcs_sensors=False,
+            **kwargs)
+        self.connection = connection
+        self.flush_interval = flush_interval
+        self._pending_creates = []
+        self._pending_rollups = {}
+        self._pending_readings = {}
+        self._flush_scheduled = False
+        self._pending_lock = threading.Lock()
+
+    def sensor_create(self, sensor):
+        """
+        Add a sensor, and queue it to be made in the front process.
+        :param sensor: A katcp.Sensor
+        :return:
+        """
+        self.sensor_add(sensor)
+        with self._pending_lock:
+            self._pending_creates.append(
+                (sensor.name, sensor.type, sensor.description, sensor.units,
+                 sensor.params))
+        self._schedule_flush()
+
+    def sensor_rollup_cb(self, rollup):
+        """
+        Queue a roll-up to be rebuilt in the front process.
+        :param rollup: the Corr2SensorRollup
+        :return:
+        """
+        with self._pending_lock:
+            self._pending_rollups[rollup.sensor.name] = rollup
+        self._schedule_flush()
+
+    def sensor_set_cb(self, sensor):
+        """
+        Called by a Corr2Sensor AFTER it has been updated.
+        :param sensor: A Corr2Sensor
+        :return:
+        """
+        with self._pending_lock:
+            self._pending_readings[sensor.name] = tuple(sensor.read())
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        with self._pending_lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        # sensors are also set from executor threads, add_callback is the
+        # one IOLoop method that is safe to call from them
+        ioloop = self.instrument.ioloop
+        ioloop.add_callback(ioloop.call_later, self.flush_interval,
+                            self.flush)
+
+    def flush(self):
+        """
+        Send the queued sensors and readings to the front process. Runs on
+        the IOLoop.
+        :return:
+        """
+        with self._pending_lock:
+            creates = self._pending_creates
+            rollups = self._pending_rollups
+            readings = self._pending_readings
+            self._pending_creates = []
+            self._pending_rollups = {}
+            self._pending_readings = {}
+            self._flush_scheduled = False
+        self.connection.send(
+            (creates,
+             [(name, rollup.child_names())
+              for name, rollup in rollups.items()],
+             [(name,) + reading for name, reading in readings.items()]))
+
+
+def run_shard(connection, config, instrument_name, shard, num_shards,
+              flush_interval=0.1, response_timeout=None, **log_kwargs):
+    """
+    The main function of a worker process: make the instrument, connected
+    only to the shard's hosts, set up their sensors and run them. Shard
+    num_shards has no hosts of its own, and runs the sensors read across
+    all the hosts, so it connects to them all.
+    :param connection: the sending end of the pipe to the front process
+    :param config: the instrument config file
+    :param instrument_name: the instrument name
+    :param shard: the shard number, from 0, or num_shards for the aggregates
+    :param num_shards: the number of host shards
+    :param flush_interval: how often to send the sensor changes, in seconds
+    :param response_timeout: the host response timeout, in seconds
+    :param log_kwargs: log_filename, log_file_dir and logLevel
+    :return:
+    """
+    # the front process handles shutting down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from corr2.corr2LogHandlers import getKatcpLogger
+    from corr2.fxcorrelator import FxCorrelator
+    # a fresh IOLoop, not the one inherited from the front process
+    IOLoop.clear_current()
+    ioloop = IOLoop()
+    ioloop.make_current()
+    log_level = log_kwargs.pop('logLevel', logging.WARN)
+    if shard < num_shards:
+        hosts = shard_hosts(config, shard, num_shards)
+        connect_hosts = hosts
+    else:
+        hosts = []
+        connect_hosts = None
+    instrument = FxCorrelator(instrument_name, config_source=config,
+                              connect_hosts=connect_hosts,
+                              getLogger=getKatcpLogger, **log_kwargs)
+    instrument.initialise(program=False, configure=False,
+                          require_epoch=False, getLogger=getKatcpLogger,
+                          logLevel=log_level, **log_kwargs)
+    instrument.attach_state()
+    if response_timeout is not None:
+        instrument._update_response_timeout(response_timeout)
+    instrument.ioloop = ioloop
+    sensor_manager = ShardSensorManager(connection, instrument,
+                                        flush_interval=flush_interval,
+                                        logLevel=log_level, **log_kwargs)
+    instrument.set_sensor_manager(sensor_manager)
+    ioloop.add_callback(
+        sensors_periodic.setup_sensors, sensor_manager, hosts=hosts,
+        aggregates=(shard == num_shards))
+    ioloop.start()
+
+
+class SensorShards(object):
+    """
+    The front process's end of the sharded sensors: it starts the worker
+    processes, and makes and updates their sensors in its SensorManager,
+    from which the katcp server reports them.
+    """
+    def __init__(self, sensor_manager, config, instrument_name, num_shards,
+                 flush_interval=0.1, response_timeout=None, **log_kwargs):
+        """
+        :param sensor_manager: the front process's SensorManager
+        :param config: the instrument config file
+        :param instrument_name: the instrument name
+        :param num_shards: the number of worker processes polling the
+            hosts, there is one more for the aggregate sensors
+        :param flush_interval: how often the workers send their sensor
+            changes, in seconds
+        :param response_timeout: the host response timeout, in seconds
+        :param log_kwargs: log_filename, log_file_dir and logLevel for the
+            workers, which log to their own files
+        :return:
+        """
+        if num_shards < 1:
+            errmsg = 'Need at least one sensor shard, not {}.'.format(
+                num_shards)
+            sensor_manager.logger.error(errmsg)
+            raise ValueError(errmsg)
+        self.sensor_manager = sensor_manager
+        self.config = config
+        self.instrument_name = instrument_name
+        self.num_shards = num_shards
+        self.flush_interval = flush_interval
+        self.response_timeout = response_timeout
+        self.log_kwargs = log_kwargs
+        self.logger = sensor_manager.logger
+        self.processes = []
+        self.connections = []
+        # the names of each shard's sensors
+        self.shard_sensors = []
+        # the roll-ups rebuilt here, keyed on sensor name, and those
+        # waiting for children that have not been made yet
+        self.rollups = {}
+        self._waiting_children = {}
+        self.ioloop = None
+
+    def start(self, ioloop):
+        """
+        Start the worker processes: the host shards, then the aggregates.
+        :param ioloop: the IOLoop on which to receive their sensors
+        :return:
+        """
+        self.ioloop = ioloop
+        for shard in range(self.num_shards + 1):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            log_kwargs = self.log_kwargs.copy()
+            if 'log_filename' in log_kwargs:
+                log_kwargs['log_filename'] = '{}_shard{}'.format(
+                    log_kwargs['log_filename'], shard)
+            process = multiprocessing.Process(
+                target=run_shard,
+                args=(sender, self.config, self.instrument_name, shard,
+                      self.num_shards, self.flush_interval,
+                      self.response_timeout),
+                kwargs=log_kwargs,
+                name='sensor-shard{}'.format(shard))
+            process.daemon = True
+            process.start()
+            # the worker has its own copy
+            sender.close()
+            self.processes.append(process)
+            self.connections.append(receiver)
+            self.shard_sensors.append(set())
+            ioloop.add_handler(receiver.fileno(),
+                               lambda fd, events, shard=shard:
+                               self._receive(shard),
+                               IOLoop.READ | IOLoop.ERROR)
+            if shard < self.num_shards:
+                self.logger.info('Started sensor shard {} of {}, '
+                                 'pid {}'.format(shard, self.num_shards,
+                                                 process.pid))
+            else:
+                self.logger.info('Started aggregate sensor shard, '
+                                 'pid {}'.format(process.pid))
+
+    def stop(self):
+        """
+        Stop the worker processes.
+        :return:
+        """
+        for shard, process in enumerate(self.processes):
+            if self.ioloop is not None:
+                self.ioloop.remove_handler(self.connections[shard].fileno())
+            if process.is_alive():
+                process.terminate()
+            process.join(1)
+        self.processes = []
+        self.connections = []
+        self.shard_sensors = []
+        self.rollups = {}
+        self._waiting_children = {}
+
+    def _receive(self, shard):
+        connection = self.connections[shard]
+        try:
+            while connection.poll():
+                creates, rollups, readings = connection.recv()
+                self._create_sensors(shard, creates)
+                self._create_rollups(rollups)
+                self._update_sensors(readings)
+        except (EOFError, IOError) as exc:
+            self.logger.error('Sensor shard {} has stopped - {}'.format(
+                shard, exc))
+            self.ioloop.remove_handler(connection.fileno())
+            connection.close()
+            # the sensors every shard makes, e.g. the static ones, are
+            # still kept up by the others
+            dead_sensors = self.shard_sensors[shard]
+            self.shard_sensors[shard] = set()
+            for sensors in self.shard_sensors:
+                dead_sensors = dead_sensors - sensors
+            sensor_scheduler.set_sensors_failure(
+                [self.sensor_manager.sensor_get(name)
+                 for name in dead_sensors])
+
+    def _create_sensors(self, shard, creates):
+        for name, sensor_type, description, units, params in creates:
+            self.shard_sensors[shard].add(name)
+            if name in self.sensor_manager.sensors():
+                # e.g. the static sensors, which every shard makes
+                continue
+            sensor = Corr2Sensor(
+                Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor_type], name,
+                description, units, params, manager=self.sensor_manager)
+            if self.sensor_manager.history_length > 0:
+                sensor.enable_history(self.sensor_manager.history_length)
+            self.sensor_manager.sensor_create(sensor)
+            for rollup, status_map in self._waiting_children.pop(name, []):
+                if self.rollups.get(rollup.sensor.name) is rollup:
+                    rollup.add_child(sensor, status_map)
+                    rollup.update()
+
+    def _create_rollups(self, rollups):
+        """
+        Rebuild the workers' roll-ups over the sensors here, where the
+        children from all the shards are. A roll-up sent again replaces
+        the one made before.
+        :param rollups: a list of (sensor name, [(child name, status_map)])
+        :return:
+        """
+        sensors = self.sensor_manager.sensors()
+        for name, children in rollups:
+            old_rollup = self.rollups.pop(name, None)
+            if old_rollup is not None:
+                for child, _ in old_rollup.children:
+                    child.rollups.remove(old_rollup)
+            rollup = Corr2SensorRollup(sensors[name])
+            self.rollups[name] = rollup
+            for child_name, status_map in children:
+                if child_name in sensors:
+                    rollup.add_child(sensors[child_name], status_map)
+                else:
+                    self._waiting_children.setdefault(child_name, []).append(
+                        (rollup, status_map))
+            rollup.update()
+
+    def _update_sensors(self, readings):
+        for name, timestamp, status, value in readings:
+            if name in self.rollups:
+                # worked out here, from all the shards' sensors
+                continue
+            try:
+                sensor = self.sensor_manager.sensor_get(name)
+            except KeyError:
+                continue
+            sensor.set(timestamp=timestamp, status=status, value=value)
+# end
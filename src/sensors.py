@@ -1,8 +1,12 @@
 # import logging
 # Yes, I know it's just an integer value
 from logging import INFO,DEBUG,WARN,ERROR
+import fnmatch
+import threading
 import time
 
+from collections import OrderedDict
+
 
 
 from casperfpga.transport_katcp import KatcpRequestError, KatcpRequestFail, \
@@ -14,9 +18,39 @@ import corr2
 from corr2.corr2LogHandlers import getKatcpLogger
 
 import data_stream
+import utils
+from sensor_history import SensorHistory
 
 # LOGGER = logging.getLogger(__name__)
 
+# how bad each sensor status is, others count as NOMINAL
+STATUS_SEVERITY = {Sensor.NOMINAL: 0, Sensor.WARN: 1, Sensor.ERROR: 2,
+                   Sensor.FAILURE: 3}
+
+# the settings allowed in the sensor_filters config section
+SENSOR_FILTER_SETTINGS = {'deadband': float, 'rel_deadband': float,
+                          'hysteresis': int}
+
+class InformBatch(Message):
+    """
+    Several informs sent as one katcp message, so that DeviceServer's
+    mass_inform sends them to each client in one write. katcp (0.6.2 and
+    on, see setup.py) serialises a message with str() and writes it, with
+    a newline, to each client, so a batch serialises to the lines of its
+    informs.
+    """
+    def __init__(self, informs):
+        """
+        :param informs: a list of katcp inform Messages
+        :return:
+        """
+        super(InformBatch, self).__init__(Message.INFORM, informs[0].name)
+        self.informs = informs
+
+    def __str__(self):
+        return '\n'.join(str(inform) for inform in self.informs)
+
+
 class Corr2Sensor(Sensor):
 
     @classmethod
@@ -98,6 +132,15 @@ class Corr2Sensor(Sensor):
             name = name.replace('_', '-')
         self.manager = manager
         self.executor = executor
+        # the Corr2SensorRollups of which this sensor is a child
+        self.rollups = []
+        # the SensorHistory of the sensor's readings, if kept
+        self.history = None
+        # change filtering, see set_filter
+        self.deadband = 0
+        self.rel_deadband = 0
+        self.hysteresis = 0
+        self._recoveries = 0
         super(Corr2Sensor, self).__init__(sensor_type, name, description,
                                           units, params, default,
                                           initial_status)
@@ -180,9 +223,60 @@ class Corr2Sensor(Sensor):
                     status = Sensor.WARN
                 self.logger.warn(
                     'Sensor warning: {} not changing {} -> {}'.format(self.name, old_value, value))
+        if self.hysteresis and (STATUS_SEVERITY.get(status, 0) <
+                                STATUS_SEVERITY.get(old_status, 0)):
+            # recovering, keep the worse status until the better one has
+            # been seen often enough
+            self._recoveries += 1
+            if self._recoveries < self.hysteresis:
+                status = old_status
+                if value == old_value:
+                    self.logger.debug('Sensor recovery held back, ignoring')
+                    return
+        else:
+            self._recoveries = 0
+        if (status == old_status) and self._in_deadband(old_value, value):
+            self.logger.debug('Sensor value change within deadband, ignoring')
+            return
         super(Corr2Sensor, self).set(timestamp, status, value)
+        if self.history is not None:
+            self.history.append(timestamp, status, value)
         if self.manager:
             self.manager.sensor_set_cb(self)
+        if status != old_status:
+            for rollup in self.rollups:
+                rollup.update(timestamp)
+
+    def set_filter(self, deadband=0, rel_deadband=0, hysteresis=0):
+        """
+        Filter out insignificant changes. The deadbands apply to float
+        sensors: a new value within a deadband of the current one, with
+        the same status, is ignored. Status changes always pass.
+        :param deadband: the absolute deadband
+        :param rel_deadband: the deadband as a fraction of the current value
+        :param hysteresis: a better status must be set this many times in
+            a row before it is shown, worse statuses are shown at once
+        :return:
+        """
+        self.deadband = abs(deadband)
+        self.rel_deadband = abs(rel_deadband)
+        self.hysteresis = hysteresis
+        self._recoveries = 0
+
+    def _in_deadband(self, old_value, value):
+        if (self.type != 'float') or (old_value is None) or \
+                not (self.deadband or self.rel_deadband):
+            return False
+        band = max(self.deadband, self.rel_deadband * abs(old_value))
+        return abs(value - old_value) <= band
+
+    def enable_history(self, length):
+        """
+        Keep the last readings of the sensor, see SensorHistory.
+        :param length: the number of readings to keep
+        :return:
+        """
+        self.history = SensorHistory(length, self.type)
 
     def deactivate(self):
         """
@@ -192,6 +286,117 @@ class Corr2Sensor(Sensor):
         self.set(time.time(), self.INACTIVE, None)
 
 
+class Corr2SensorRollup(object):
+    """
+    A device-status sensor that is the worst of the statuses of its
+    children. The children are registered once, by reference, and the
+    roll-up is recomputed only when the status of one of them changes.
+    Roll-ups can be children of other roll-ups, e.g. an LRU of its
+    engines.
+    """
+    SEVERITY = STATUS_SEVERITY
+    VALUES = {Sensor.NOMINAL: 'ok', Sensor.WARN: 'degraded',
+              Sensor.ERROR: 'fail', Sensor.FAILURE: 'fail'}
+
+    def __init__(self, sensor, children=None):
+        """
+        :param sensor: the device-status Corr2Sensor to set
+        :param children: a list of child Corr2Sensors
+        :return:
+        """
+        self.sensor = sensor
+        self.children = []
+        # children named before they exist, see add_child_name
+        self.pending_children = []
+        for child in children or []:
+            self.add_child(child)
+
+    def add_child(self, child, status_map=None):
+        """
+        Add a child sensor.
+        :param child: a Corr2Sensor
+        :param status_map: a dictionary of child statuses to the status
+            they contribute, e.g. {Sensor.ERROR: Sensor.WARN} for a child
+            whose errors only degrade the roll-up
+        :return:
+        """
+        self.children.append((child, status_map or {}))
+        child.rollups.append(self)
+        self._changed()
+
+    def add_child_name(self, name, status_map=None):
+        """
+        Add a child sensor by name, for one that may be made elsewhere,
+        e.g. in another sensor shard. It is added at once if the manager
+        already has it.
+        :param name: the child sensor's name
+        :param status_map: as for add_child
+        :return:
+        """
+        manager = self.sensor.manager
+        if name in manager.sensors():
+            self.add_child(manager.sensor_get(name), status_map)
+            return
+        self.pending_children.append((name, status_map or {}))
+        self._changed()
+
+    def child_names(self):
+        """
+        :return: a list of (name, status_map) for all the children, those
+            added by name and not yet made included
+        """
+        return [(child.name, status_map)
+                for child, status_map in self.children] + \
+            self.pending_children
+
+    def _changed(self):
+        if self.sensor.manager is not None:
+            self.sensor.manager.sensor_rollup_cb(self)
+
+    def update(self, timestamp=None):
+        """
+        Recompute the roll-up from its children.
+        :param timestamp: the time of the change that caused this
+        :return:
+        """
+        worst = Sensor.NOMINAL
+        for child, status_map in self.children:
+            status = child.status()
+            status = status_map.get(status, status)
+            if self.SEVERITY.get(status, 0) > self.SEVERITY[worst]:
+                worst = status
+        self.sensor.set(timestamp=timestamp, value=self.VALUES[worst],
+                        status=worst)
+
+
+def parse_sensor_filters(config_section):
+    """
+    Parse the sensor_filters section of the config. Each entry is a sensor
+    name pattern and its settings, e.g.
+        *.dig.*-dbfs = deadband:0.1,hysteresis:3
+        *.network.rx-pps = rel_deadband:0.01
+    :param config_section: the section, as from parse_ini_file
+    :return: a dictionary of Corr2Sensor.set_filter arguments, keyed on
+        pattern
+    """
+    sensor_filters = {}
+    for pattern, settings in config_section.items():
+        sensor_filter = {}
+        for setting in settings.split(','):
+            if setting.strip() == '':
+                continue
+            try:
+                key, value = [part.strip() for part in setting.split(':')]
+                sensor_filter[key] = SENSOR_FILTER_SETTINGS[key](value)
+            except (ValueError, KeyError):
+                errmsg = 'Bad sensor filter setting \'{}\' for {}, expected ' \
+                         'one of {} as name:value.'.format(
+                             setting, pattern, SENSOR_FILTER_SETTINGS.keys())
+                raise ValueError(errmsg)
+        sensor_filters[pattern.replace('_', '-')] = sensor_filter
+    return sensor_filters
+
+
 class SensorManager(object):
     """
     A place to store information and functionality relevant to corr2 sensors.
@@ -199,13 +404,25 @@ class SensorManager(object):
 
     def __init__(self, katcp_server, instrument,
                  katcp_sensors=True, kcs_sensors=True,
-                 *args, **kwargs):
+                 inform_flush_interval=0.05, min_inform_interval=0,
+                 inform_batching=True, history_length=0, *args, **kwargs):
         """
         Start a Sensor Manager
         :param katcp_server: a KATCP server instance
         :param instrument: a corr2 instance
         :param katcp_sensors: add sensors to the Katcp server itself
         :param kcs_sensors: manually emit informs to the attached KCS
+        :param inform_flush_interval: sensor-status informs are collected
+            and sent together, in one write to each client, every this many
+            seconds, or on the next IOLoop tick if 0
+        :param min_inform_interval: the least time between sensor-status
+            informs for any one sensor, in seconds, unless set otherwise
+            for that sensor
+        :param inform_batching: send each flush's informs as one
+            InformBatch, or mass-inform them one at a time if False, e.g.
+            for a katcp server that does not serialise messages with str()
+        :param history_length: keep this many of the latest readings of
+            each sensor, for sensor_history, or none if 0
         :return:
         """
         self.katcp_server = katcp_server
@@ -234,6 +451,24 @@ class SensorManager(object):
         self._sensors = {}
         self._debug_mode = False
 
+        # changed sensors waiting for their sensor-status informs
+        self.inform_flush_interval = inform_flush_interval
+        self.min_inform_interval = min_inform_interval
+        self.inform_batching = inform_batching
+        self._min_inform_intervals = {}
+        self._inform_times = {}
+        self._pending_informs = OrderedDict()
+        self._inform_flush_scheduled = False
+        self._inform_lock = threading.Lock()
+
+        self.history_length = history_length
+
+        # change filters from the config, by sensor name pattern
+        self.sensor_filters = {}
+        if instrument is not None:
+            self.sensor_filters = parse_sensor_filters(
+                instrument.configd.get('sensor_filters', {}))
+
     def sensors(self):
         return self._sensors
 
@@ -243,6 +478,9 @@ class SensorManager(object):
         :return:
         """
         self._sensors = {}
+        with self._inform_lock:
+            self._pending_informs.clear()
+            self._min_inform_intervals.clear()
 
     def sensor_add(self, sensor):
         """
@@ -302,6 +540,18 @@ class SensorManager(object):
             sensor = self.sensor_get(sensor)
         sensor.set(timestamp or time.time(), status, value)
 
+    def sensor_set_min_inform_interval(self, sensor, interval):
+        """
+        Limit how often sensor-status informs are sent for a sensor. Changes
+        in between are coalesced, the latest reading is sent.
+        :param sensor: the sensor, or sensor name
+        :param interval: the least time between informs, in seconds
+        :return:
+        """
+        name = getattr(sensor, 'name', sensor)
+        with self._inform_lock:
+            self._min_inform_intervals[name] = interval
+
     def sensor_set_cb(self, sensor):
         """
         Called by a Corr2Sensor AFTER it has been updated.
@@ -309,7 +559,79 @@ class SensorManager(object):
         :return:
         """
         if self.kcs_sensors:
+            self._kcs_sensor_queue(sensor)
+
+    def sensor_rollup_cb(self, rollup):
+        """
+        Called when a Corr2SensorRollup gains a child.
+        :param rollup: the Corr2SensorRollup
+        :return:
+        """
+        pass
+
+    def _inform_ioloop(self):
+        return getattr(self.katcp_server, 'ioloop', None)
+
+    def _kcs_sensor_queue(self, sensor):
+        """
+        Queue a #sensor-status inform, to be sent with the others at the
+        next flush, rather than mass-informing every change on its own.
+        Only the latest reading of each sensor is sent.
+        :param sensor: A katcp.Sensor object
+        :return:
+        """
+        ioloop = self._inform_ioloop()
+        if ioloop is None:
             self._kcs_sensor_set(sensor)
+            return
+        with self._inform_lock:
+            self._pending_informs[sensor.name] = sensor
+            if self._inform_flush_scheduled:
+                return
+            self._inform_flush_scheduled = True
+        # sensors are also set from executor threads, add_callback is the
+        # one IOLoop method that is safe to call from them
+        if self.inform_flush_interval > 0:
+            ioloop.add_callback(ioloop.call_later, self.inform_flush_interval,
+                                self.sensor_informs_flush)
+        else:
+            ioloop.add_callback(self.sensor_informs_flush)
+
+    def sensor_informs_flush(self):
+        """
+        Send the queued #sensor-status informs. Those for sensors informed
+        more recently than their minimum interval stay queued until it has
+        passed. Runs on the IOLoop.
+        :return:
+        """
+        now = time.time()
+        with self._inform_lock:
+            pending = self._pending_informs
+            self._pending_informs = OrderedDict()
+            self._inform_flush_scheduled = False
+            min_intervals = self._min_inform_intervals.copy()
+        held = OrderedDict()
+        next_due = None
+        informs = []
+        for name, sensor in pending.items():
+            due = self._inform_times.get(name, 0) + min_intervals.get(
+                name, self.min_inform_interval)
+            if due > now:
+                held[name] = sensor
+                next_due = due if next_due is None else min(next_due, due)
+                continue
+            self._inform_times[name] = now
+            informs.append(self._kcs_sensor_status_inform(sensor))
+        self._kcs_mass_inform_batch(informs)
+        if not held:
+            return
+        with self._inform_lock:
+            for name, sensor in held.items():
+                self._pending_informs.setdefault(name, sensor)
+            if self._inform_flush_scheduled:
+                return
+            self._inform_flush_scheduled = True
+        self._inform_ioloop().call_at(next_due, self.sensor_informs_flush)
 
     def _kcs_sensor_set(self, sensor):
         """
@@ -327,10 +649,40 @@ class SensorManager(object):
                         str(sensor.value()))
             return
         assert self.kcs_sensors
-        supdate_inform = Message.inform(
-            'sensor-status', time.time(), 1, sensor.name,
-            sensor.STATUSES[sensor.status()], sensor.value())
-        self.katcp_server.mass_inform(supdate_inform)
+        self.katcp_server.mass_inform(self._kcs_sensor_status_inform(sensor))
+
+    @staticmethod
+    def _kcs_sensor_status_inform(sensor):
+        """
+        The #sensor-status inform for a sensor's current reading.
+        :param sensor: A katcp.Sensor object
+        :return: a katcp Message
+        """
+        timestamp, status, value = sensor.read()
+        return Message.inform(
+            'sensor-status', timestamp, 1, sensor.name,
+            sensor.STATUSES[status], value)
+
+    def _kcs_mass_inform_batch(self, informs):
+        """
+        Send a batch of informs to every client. They are serialised once,
+        and go to each client in one write, rather than one per inform,
+        unless inform_batching is off. Runs on the IOLoop.
+        :param informs: a list of katcp Messages
+        :return:
+        """
+        if not informs:
+            return
+        if self._debug_mode:
+            for inform in informs:
+                self.logger.info('SENSOR_DEBUG: ' + str(inform))
+            return
+        assert self.kcs_sensors
+        if self.inform_batching and (len(informs) > 1):
+            self.katcp_server.mass_inform(InformBatch(informs))
+            return
+        for inform in informs:
+            self.katcp_server.mass_inform(inform)
 
     def _kcs_sensor_create(self, sensor):
         """
@@ -356,7 +708,7 @@ class SensorManager(object):
 
     def do_sensor(self, sensor_type, name, description,
                   initial_status=Sensor.UNKNOWN, unit='',
-                  executor=None):
+                  executor=None, min_inform_interval=None):
         """
         Bundle sensor creation and updating into one method.
         :param sensor_type: The Sensor class to instantiate if the sensor
@@ -366,6 +718,8 @@ class SensorManager(object):
         :param initial_status: UNKNOWN by default.
         :param unit: A str, if given.
         :param executor: an executor (thread, future, etc)
+        :param min_inform_interval: the least time between sensor-status
+            informs for this sensor, in seconds, if not the manager's
         :return:
         """
         if '_' in name:
@@ -382,10 +736,50 @@ class SensorManager(object):
                 description=description,
                 unit=unit, initial_status=initial_status, manager=self,
                 executor=executor)
+            if self.history_length > 0:
+                sensor.enable_history(self.history_length)
+            sensor_filter = self._sensor_filter(name)
+            if sensor_filter:
+                sensor.set_filter(**sensor_filter)
             self.sensor_create(sensor)
+        if min_inform_interval is not None:
+            self.sensor_set_min_inform_interval(sensor, min_inform_interval)
         return sensor
 
 
+    def _sensor_filter(self, sensor_name):
+        """
+        The change filter settings for a sensor, from the most specific
+        of the sensor_filters patterns that match its name.
+        :param sensor_name:
+        :return: a dictionary of Corr2Sensor.set_filter arguments
+        """
+        matches = [pattern for pattern in self.sensor_filters
+                   if fnmatch.fnmatchcase(sensor_name, pattern)]
+        if len(matches) == 0:
+            return {}
+        return self.sensor_filters[max(matches, key=len)]
+
+    def sensor_history(self, sensor_name, since=0, max_samples=None):
+        """
+        Get the recent readings of a sensor.
+        :param sensor_name: the name of the sensor
+        :param since: only readings taken after this UNIX time
+        :param max_samples: decimate to at most this many readings
+        :return: a list of (timestamp, status name, value) tuples, oldest
+            first
+        """
+        sensor = self.sensor_get(sensor_name)
+        if sensor.history is None:
+            errmsg = 'No history is kept for sensor {}.'.format(sensor_name)
+            self.logger.error(errmsg)
+            raise ValueError(errmsg)
+        times, statuses, values = sensor.history.samples(since, max_samples)
+        return [(timestamp, Sensor.STATUSES[status], value)
+                for timestamp, status, value in
+                zip(times.tolist(), statuses.tolist(), values.tolist())]
+
+
 class Corr2SensorManager(SensorManager):
     """
     An implementation of SensorManager with some extra functionality for
@@ -656,7 +1050,22 @@ class Corr2SensorManager(SensorManager):
             Corr2Sensor.string, '{}-eq'.format(pref),
             'The unitless, per-channel digital scaling factors '
             'implemented prior to requantisation. Complex.')
-        sensor.set_value(str(feng.last_eq))
+        if feng.last_eq is None:
+            sensor.set_value(str(feng.last_eq))
+        elif self.instrument.compact_array_values:
+            # only a summary here, the values go in the compact sensor
+            sensor.set_value(utils.summarise_array(feng.last_eq))
+            compact_sensor = self.do_sensor(
+                Corr2Sensor.string, '{}-eq-compact'.format(pref),
+                'The per-channel digital scaling factors, as base64-encoded '
+                'big-endian int16 (real, imag) pairs: dtype:shape:data.')
+            import numpy
+            eq = numpy.empty((len(feng.last_eq), 2), dtype='>i2')
+            eq[:, 0] = feng.last_eq.real
+            eq[:, 1] = feng.last_eq.imag
+            compact_sensor.set_value(utils.encode_array(eq))
+        else:
+            sensor.set_value(str(feng.last_eq.tolist()))
 
     def sensors_feng_delays(self, feng):
         """
@@ -691,7 +1100,12 @@ class Corr2SensorManager(SensorManager):
                 load_mcnt, delay, delay_delta, phase_offset, phase_offset_delta)
             _timestamp = self.instrument.time_from_mcnt(
                 feng.last_delay.load_mcnt)
-            _status = Sensor.NOMINAL if feng.last_delay.last_load_success else Sensor.ERROR
+            if not feng.last_delay.last_load_success:
+                _status = Sensor.ERROR
+            elif feng.last_delay.saturated:
+                _status = Sensor.WARN
+            else:
+                _status = Sensor.NOMINAL
             sensor.set_value(value=_val, status=_status, timestamp=_timestamp)
 #            err_sensor.set_value(feng.last_delay.last_load_success)
             load_time = self.instrument.time_from_mcnt(
@@ -806,8 +1220,10 @@ class Corr2SensorManager(SensorManager):
             sensor = self.do_sensor(
                 Corr2Sensor.string, '{strm}-weight'.format(strm=strmnm),
                 'The summing weights applied to the inputs of this beam.')
-            sensor.set_value(
-                str(self.instrument.bops.get_beam_weights(strmnm)))
+            weights = self.instrument.bops.last_weights.get(strmnm)
+            if weights is None:
+                weights = self.instrument.bops.get_beam_weights(strmnm)
+            sensor.set_value(str(weights))
 
     def sensors_beng_gains(self):
         """
@@ -823,7 +1239,10 @@ class Corr2SensorManager(SensorManager):
                 Corr2Sensor.float, '{}-quantiser-gain'.format(strmnm),
                 'The non-complex post-summation quantiser gain applied to '
                 'this beam.')
-            sensor.set_value(self.instrument.bops.get_beam_quant_gain(strmnm))
+            gain = self.instrument.bops.last_quant_gains.get(strmnm)
+            if gain is None:
+                gain = self.instrument.bops.get_beam_quant_gain(strmnm)
+            sensor.set_value(gain)
 
 #    def sensors_beng_passband(self):
 #        """
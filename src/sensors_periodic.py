@@ -13,10 +13,16 @@ import sensor_scheduler
 
 host_offset_lookup = {}
 
-def setup_sensors(sensor_manager):
+# the scheduler running the periodic sensors, replaced on each setup
+sensor_task_scheduler = None
+
+def setup_sensors(sensor_manager, hosts=None, aggregates=True):
     """
     INSTRUMENT-STATE-INDEPENDENT sensors to be reported to CAM
     :param sensor_manager: A SensorManager instance
+    :param hosts: the hostnames whose sensors to set up, all by default
+    :param aggregates: set up the sensors read across all the hosts, e.g.
+        the F-engine received times and the VACCs
     :return:
     """
     # make the mapping of hostnames to host offsets
@@ -29,17 +35,16 @@ def setup_sensors(sensor_manager):
         assert host.host not in host_offset_lookup
         host_offset_lookup[host.host] = 'fhost{:02}'.format(ctr)
 
-    sensor_poll_interval = sensor_manager.instrument.sensor_poll_interval;
-    sensor_scheduler.sensor_call_gap_time_s = sensor_poll_interval;
-    sensor_scheduler.logger = sensor_manager.logger;
-        
-    # Set up a one-worker pool per host to serialise interactions with each host
-    host_executors = {
-        host.host: futures.ThreadPoolExecutor(max_workers=1)
-        for host in sensor_manager.instrument.fhosts +
-        sensor_manager.instrument.xhosts
-    }
-    general_executor = futures.ThreadPoolExecutor(max_workers=1)
+    # use the instrument's one-worker pool per host, to serialise
+    # interactions with each host
+    host_executors = sensor_manager.instrument.host_executor.executors
+    if hosts is not None:
+        host_executors = {host: executor
+                          for host, executor in host_executors.items()
+                          if host in hosts}
+    general_executor = None
+    if aggregates:
+        general_executor = futures.ThreadPoolExecutor(max_workers=1)
     if not sensor_manager.instrument.initialised():
         raise RuntimeError('Cannot set up sensors until instrument is '
                            'initialised.')
@@ -50,9 +55,20 @@ def setup_sensors(sensor_manager):
         raise RuntimeError('IOLoop-containing katcp version required. Can go '
                            'no further.')
     
+    global sensor_task_scheduler
+    if sensor_task_scheduler is not None:
+        sensor_task_scheduler.stop()
+    sensor_task_scheduler = sensor_scheduler.SensorScheduler(
+        ioloop, sensor_manager, periods={
+            sensor_scheduler.PRIORITY_FAST:
+                sensor_manager.instrument.sensor_host_poll_interval,
+            sensor_scheduler.PRIORITY_SLOW:
+                sensor_manager.instrument.sensor_aggregate_poll_interval},
+        logger=sensor_manager.logger)
+
     sensor_manager.sensors_clear()
     args = [sensor_manager, general_executor,
-            host_executors, ioloop, host_offset_lookup]
+            host_executors, sensor_task_scheduler, host_offset_lookup]
 
     # create 'static' sensors
     sensor = sensor_manager.do_sensor(
@@ -66,6 +82,7 @@ def setup_sensors(sensor_manager):
     sensors_fhost.setup_sensors_fengine(*args)
     sensors_xhost.setup_sensors_xengine(*args)
     sensors_bhost.setup_sensors_bengine(*args)
+    sensor_task_scheduler.start()
 
     all_hosts = sensor_manager.instrument.fhosts + sensor_manager.instrument.xhosts
 
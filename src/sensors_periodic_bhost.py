@@ -107,14 +107,14 @@ def _cb_beng_pack(sensors, general_executor, sens_man, time):
     IOLoop.current().add_callback(_cb_beng_pack, sensors, general_executor, sens_man)
 
 
-def setup_sensors_bengine(sens_man, general_executor, host_executors, ioloop,
+def setup_sensors_bengine(sens_man, general_executor, host_executors, scheduler,
                           host_offset_dict):
     """
     Set up the B-engine specific sensors.
     :param sens_man:
     :param general_executor:
     :param host_executors:
-    :param ioloop:
+    :param scheduler: the SensorScheduler on which to run the sensor tasks
     :param host_offset_dict:
     :return: none
     """
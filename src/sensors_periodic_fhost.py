@@ -3,104 +3,52 @@ import tornado.gen as gen
 import tornado
 import time
 
-from tornado.ioloop import IOLoop
-
 from casperfpga.transport_katcp import KatcpRequestError, KatcpRequestFail, \
     KatcpRequestInvalid
 from casperfpga.transport_skarab import \
     SkarabReorderError, SkarabReorderWarning
 
 import sensor_scheduler
-from sensors import Corr2Sensor, boolean_sensor_do
+from sensors import Corr2Sensor, Corr2SensorRollup, boolean_sensor_do
 
 LOGGER = logging.getLogger(__name__)
 
 host_offset_lookup = {}
 
-@gen.coroutine
-def _cb_fhost_lru(sensor_manager, sensor, f_host,sensor_task):
-    """
-    Sensor call back function for F-engine LRU
-    :param sensor:
-    :return:
-    """
-    
-    functionStartTime = time.time();
-    ##print("1 on %s Started at %f" % (f_host.host ,functionStartTime))
+# the least time between checks that delay updates are being applied
+DELAY_UPDATING_INTERVAL = 6
 
-    try:
-        h = host_offset_lookup[f_host.host]
-        if sensor_manager.sensor_get(
-                "{}.network.device-status".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.ERROR
-        elif sensor_manager.sensor_get("{}.network-reorder.device-status".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.ERROR
-        elif sensor_manager.sensor_get("{}.cd.device-status".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.ERROR
-        elif sensor_manager.sensor_get("{}.ct.device-status".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.ERROR
-        elif sensor_manager.sensor_get("{}.sync.device-status".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.WARN
-        elif sensor_manager.sensor_get("{}.rx-timestamp".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.WARN
-        elif sensor_manager.sensor_get("{}.network.device-status".format(h)).status() == Corr2Sensor.ERROR:
-            status = Corr2Sensor.ERROR
-        elif sensor_manager.sensor_get("{}.network.device-status".format(h)).status() == Corr2Sensor.WARN:
-            status = Corr2Sensor.WARN
-        elif sensor_manager.sensor_get("{}.pfb.device-status".format(h)).status() == Corr2Sensor.WARN:
-            status = Corr2Sensor.WARN
-        elif sensor_manager.sensor_get("{}.quant.device-status".format(h)).status() == Corr2Sensor.WARN:
-            status = Corr2Sensor.WARN
-        elif sensor_manager.sensor_get("{}.cd.device-status".format(h)).status() == Corr2Sensor.WARN:
-            status = Corr2Sensor.WARN
-        elif sensor_manager.sensor_get("{}.dig.device-status".format(h)).status() == Corr2Sensor.WARN:
-            status = Corr2Sensor.WARN
-        else:
-            status = Corr2Sensor.NOMINAL
-
-        sens_val = 'fail'
-        if(status == Corr2Sensor.NOMINAL):
-            sens_val = 'ok'
-        elif(status == Corr2Sensor.WARN):
-            sens_val = 'degraded'
-
-        sensor.set(value=sens_val, status=status)
-    except Exception as e:
-        sensor_manager.logger.error(
-            'Error updating LRU sensor for {} - {}'.format(
-                f_host.host, e.message))
-        sensor.set(value="ok", status=Corr2Sensor.FAILURE)
-
-    
-    
+# the status bundles read by every F-host status poll
+FHOST_STATUS_BUNDLES = ['cd', 'ct', 'pfb', 'quant', 'adc', 'pack', 'unpack',
+                        'sync', 'rx_reorder', 'timed_latch', 'control']
 
-    functionRunTime = time.time() - functionStartTime;
-    nextCallTime = sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime);
-    #sensor_manager.logger.debug('Sensor {0: >20} ran on {1: >15} at {2:.4f}. Next Call:{3:.4f} Runtime: {4:.5f}.'.format('_cb_fhost_lru',f_host.host,time.time(),nextCallTime,functionRunTime))
 
-    IOLoop.current().call_at(
-        nextCallTime,
-        _cb_fhost_lru,
-        sensor_manager,
-        sensor,
-        f_host,sensor_task)
+def _read_fhost_status(f_host):
+    """
+    Read everything the F-host sensors need, in one job on the host's worker.
+    :param f_host: the host to read
+    :return: a dictionary of readings, timestamped when the read started
+    """
+    return {
+        'time': time.time(),
+        'registers': f_host.read_status_bundles(FHOST_STATUS_BUNDLES),
+        'gbe': f_host.gbes.gbe0.get_hw_gbe_stats(),
+    }
 
 
 @gen.coroutine
-def _cb_feng_rxtime(sensor_ok, sensors_value, sensor_manager,sensor_task):
+def _cb_feng_rxtime(sensor_ok, sensors_value, executor, sensor_manager):
     """
     Sensor call back to check received F-engine times
     :param sensor_ok: the combined times-are-ok sensor
     :param sensors_value: per-host sensors for time and unix-time
+    :param executor: the executor on which to read the times, off the
+        IOLoop
     :return:
     """
-
-    functionStartTime = time.time();
-    ##print("2 on all Started at %f" % (functionStartTime))
-
     instrument = sensor_ok.manager.instrument
     try:
-        result, times = instrument.fops.get_rx_timestamps()
+        result, times = yield executor.submit(instrument.fops.get_rx_timestamps)
         if result:
             sensor_ok.set(value=result, status=Corr2Sensor.NOMINAL)
         else:
@@ -122,55 +70,44 @@ def _cb_feng_rxtime(sensor_ok, sensors_value, sensor_manager,sensor_task):
         sensor_manager.logger.error('Error updating feng rxtime sensor '
                      '- {}.'.format(e.message))
     sensor_manager.logger.debug('_cb_feng_rxtime ran')
-    
-    functionRunTime = time.time() - functionStartTime;
-    ##print("2 on all Ended End Time %f, Run Time %f" % (time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,'2'))
-
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_rxtime,
-                                sensor_ok, sensors_value, sensor_manager,sensor_task)
 
 
-@gen.coroutine
-def _cb_feng_delays(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_delays(readings, sensors, f_host, sensor_manager):
     """
     Sensor call back function for F-engine delay functionality
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return:
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("3 on %s Started at %f" % (f_host.host ,functionStartTime))
-
-    device_status = Corr2Sensor.NOMINAL
-    device_status_value = 'ok'
+    timestamp = readings['time']
     try:
-        cd0_cnt = f_host.registers.tl_cd0_status.read()['data']['load_count']
-        cd1_cnt = f_host.registers.tl_cd1_status.read()['data']['load_count']
-        if cd0_cnt == sensors['delay0_updating'].tempstore:
-            sensors['delay0_updating'].set(
-                value=False, status=Corr2Sensor.WARN)
-        else:
-            sensors['delay0_updating'].set(
-                value=True, status=Corr2Sensor.NOMINAL)
-        if cd1_cnt == sensors['delay1_updating'].tempstore:
-            sensors['delay1_updating'].set(
-                value=False, status=Corr2Sensor.WARN)
-        else:
-            sensors['delay1_updating'].set(
-                value=True, status=Corr2Sensor.NOMINAL)
-        sensors['delay0_updating'].tempstore = cd0_cnt
-        sensors['delay1_updating'].tempstore = cd1_cnt
+        # delay updates arrive seconds apart, so the load counts are only
+        # compared every DELAY_UPDATING_INTERVAL, not on every poll
+        if timestamp - sensors['delay0_updating'].tempstore_time >= \
+                DELAY_UPDATING_INTERVAL:
+            cd0_cnt = readings['registers']['tl_cd0_status']['load_count']
+            cd1_cnt = readings['registers']['tl_cd1_status']['load_count']
+            if cd0_cnt == sensors['delay0_updating'].tempstore:
+                sensors['delay0_updating'].set(
+                    timestamp=timestamp, value=False, status=Corr2Sensor.WARN)
+            else:
+                sensors['delay0_updating'].set(
+                    timestamp=timestamp, value=True, status=Corr2Sensor.NOMINAL)
+            if cd1_cnt == sensors['delay1_updating'].tempstore:
+                sensors['delay1_updating'].set(
+                    timestamp=timestamp, value=False, status=Corr2Sensor.WARN)
+            else:
+                sensors['delay1_updating'].set(
+                    timestamp=timestamp, value=True, status=Corr2Sensor.NOMINAL)
+            sensors['delay0_updating'].tempstore = cd0_cnt
+            sensors['delay1_updating'].tempstore = cd1_cnt
+            sensors['delay0_updating'].tempstore_time = timestamp
 
-        results = f_host.get_cd_status()
+        results = f_host.get_cd_status(readings['registers'])
         sensors['current_cd0'].set(
-            value=results['current_cd0'], status=Corr2Sensor.NOMINAL)
+            timestamp=timestamp, value=results['current_cd0'], status=Corr2Sensor.NOMINAL)
         sensors['current_cd1'].set(
-            value=results['current_cd1'], status=Corr2Sensor.NOMINAL)
+            timestamp=timestamp, value=results['current_cd1'], status=Corr2Sensor.NOMINAL)
 
         pol0_errs = results['hmc_err_cnt'] + results['reord_jitter_err_cnt_pol0'] + \
             results['hmc_overflow_err_cnt_pol0'] + results['parity_err_cnt_pol0'] + \
@@ -178,50 +115,34 @@ def _cb_feng_delays(sensors, f_host, sensor_manager,sensor_task):
         pol1_errs = results['hmc_err_cnt'] + results['reord_jitter_err_cnt_pol1'] + \
             results['hmc_overflow_err_cnt_pol1'] + results['parity_err_cnt_pol1'] + \
             results['reord_missing_err_cnt_pol1']
-        sensors['pol0_err_cnt'].set(value=pol0_errs, errif='changed')
-        sensors['pol1_err_cnt'].set(value=pol1_errs, errif='changed')
+        sensors['pol0_err_cnt'].set(timestamp=timestamp, value=pol0_errs, errif='changed')
+        sensors['pol1_err_cnt'].set(timestamp=timestamp, value=pol1_errs, errif='changed')
 
         if ((sensors['pol0_err_cnt'].status() == Corr2Sensor.ERROR) or
             (sensors['pol1_err_cnt'].status() == Corr2Sensor.ERROR)):
-            device_status = Corr2Sensor.ERROR
-            device_status_value = 'fail'
             f_host.logger.error("CD error: %s"%str(results))
-            f_host.logger.error("CD HMC status: %s"%str(f_host.hmcs.cd_hmc_hmc_delay_hmc.get_hmc_status()))
-
-        sensors['device_status'].set(value=device_status_value,
-                                     status=device_status)
+            sensor_manager.instrument.host_executor.submit(
+                f_host, f_host.log_hmc_status, 'cd_hmc_hmc_delay_hmc',
+                'CD HMC')
 
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating delay sensors for {} - {}.'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
     sensor_manager.logger.debug('_sensor_feng_delays ran on {}'.format(f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("3 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'3'))
-
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_delays, sensors, f_host, sensor_manager,sensor_task)
 
-
-@gen.coroutine
-def _cb_feng_ct(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_ct(readings, sensors, f_host, sensor_manager):
     """
     Sensor call back function to check F-engine corner-turner.
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return:
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("4 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_ct_status()
+        results = f_host.get_ct_status(readings['registers'])
         common_errs = results['obuff_bank_err_cnt'] + results['rd_go_err_cnt'] + \
             results['sync_in_err_cnt'] + results['fifo_full_err_cnt']
         pol0_errs = results['bank_err_cnt_pol0'] + \
@@ -230,51 +151,36 @@ def _cb_feng_ct(sensors, f_host, sensor_manager,sensor_task):
         pol1_errs = results['bank_err_cnt_pol1'] + \
             results['hmc_overflow_err_cnt_pol1'] + common_errs + \
             results['hmc_err_cnt1'] + results['reorder_missing_err_cnt1']
-        sensors['pol0_err_cnt'].set(value=pol0_errs, errif='changed')
-        sensors['pol1_err_cnt'].set(value=pol1_errs, errif='changed')
+        sensors['pol0_err_cnt'].set(timestamp=timestamp, value=pol0_errs, errif='changed')
+        sensors['pol1_err_cnt'].set(timestamp=timestamp, value=pol1_errs, errif='changed')
 
-        device_status = Corr2Sensor.NOMINAL
-        device_value = 'ok'
         if (sensors['pol0_err_cnt'].status() == Corr2Sensor.ERROR):
-            device_value = 'fail'
-            device_status = Corr2Sensor.ERROR
             f_host.logger.error("CT pol0 error: %s"%str(results))
-            f_host.logger.error("CT HMC pol0 status: %s"%str(f_host.hmcs.hmc_ct_hmc.get_hmc_status()))
+            sensor_manager.instrument.host_executor.submit(
+                f_host, f_host.log_hmc_status, 'hmc_ct_hmc', 'CT HMC pol0')
         if (sensors['pol1_err_cnt'].status() == Corr2Sensor.ERROR):
-            device_value = 'fail'
-            device_status = Corr2Sensor.ERROR
             f_host.logger.error("CT pol1 error: %s"%str(results))
-            f_host.logger.error("CT HMC pol1 status: %s"%str(f_host.hmcs.hmc_ct_hmc.get_hmc_status()))
-        #if(device_status == Corr2Sensor.WARN):
-        #    device_value = 'degraded'
-        sensors['device_status'].set(value=device_value, status=device_status)
+            sensor_manager.instrument.host_executor.submit(
+                f_host, f_host.log_hmc_status, 'hmc_ct_hmc', 'CT HMC pol1')
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating CT sensors for {} - {}.'.format(
                 f_host.host, e.message))
-    sensor_manager.logger.debug('_cb_feng_ct ran on {}'.format(f_host.host))
+    sensor_manager.logger.debug('_update_feng_ct ran on {}'.format(f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'4'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_ct, sensors, f_host, sensor_manager,sensor_task)
-    ##print("4 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
 
-
-@gen.coroutine
-def _cb_feng_pack(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_pack(readings, sensors, f_host, sensor_manager):
     """
     Sensor call back function to check F-engine pack block.
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return:
     """
-
-    functionStartTime = time.time();
-    ##print("5 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_pack_status()
+        results = f_host.get_pack_status(readings['registers'])
         sensors['err_cnt'].set(
-            value=results['dvblock_err_cnt'],
+            timestamp=timestamp, value=results['dvblock_err_cnt'],
             errif='changed')
         if sensors['err_cnt'].status() == Corr2Sensor.NOMINAL:
             status = Corr2Sensor.NOMINAL
@@ -282,68 +188,56 @@ def _cb_feng_pack(sensors, f_host, sensor_manager,sensor_task):
         else:
             status = Corr2Sensor.ERROR
             value = 'fail'
-        sensors['device_status'].set(value=value, status=status)
+        sensors['device_status'].set(timestamp=timestamp, value=value, status=status)
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating pack sensors for {} - {}.'.format(
                 f_host.host, e.message))
-        sensors['device_status'].set(value='fail', status=Corr2Sensor.FAILURE)
-        sensors['err_cnt'].set(value=-1, status=Corr2Sensor.FAILURE)
-    sensor_manager.logger.debug('_cb_feng_pack ran on {}'.format(f_host.host))
-
-    functionRunTime = time.time() - functionStartTime;
-    ##print("5 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'5'))
+        sensors['device_status'].set(timestamp=timestamp, value='fail', status=Corr2Sensor.FAILURE)
+        sensors['err_cnt'].set(timestamp=timestamp, value=-1, status=Corr2Sensor.FAILURE)
+    sensor_manager.logger.debug('_update_feng_pack ran on {}'.format(f_host.host))
 
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_pack, sensors, f_host, sensor_manager,sensor_task)
 
-@gen.coroutine
-def _cb_feng_adcs(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_adcs(readings, sensors, f_host, sensor_manager):
     """
     F-engine ADC/DIG check
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return:
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("6 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_adc_status()
+        results = f_host.get_adc_status(readings['registers'])
         device_status = Corr2Sensor.NOMINAL
 
         for key in ['p0_min', 'p1_min']:
             sensor = sensors[key]
             if results[key] < -0.9:
-                sensor.set(value=results[key], status=Corr2Sensor.WARN)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.WARN)
                 device_status = Corr2Sensor.WARN
             else:
-                sensor.set(value=results[key], status=Corr2Sensor.NOMINAL)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.NOMINAL)
 
         for key in ['p0_max', 'p1_max']:
             sensor = sensors[key]
             if results[key] > 0.9:
-                sensor.set(value=results[key], status=Corr2Sensor.WARN)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.WARN)
                 device_status = Corr2Sensor.WARN
             else:
-                sensor.set(value=results[key], status=Corr2Sensor.NOMINAL)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.NOMINAL)
 
         for key in ['p0_pwr_dBFS', 'p1_pwr_dBFS']:
             sensor = sensors[key]
             if (results[key] > -22) or (results[key] < -32):
-                sensor.set(value=results[key], status=Corr2Sensor.WARN)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.WARN)
                 device_status = Corr2Sensor.WARN
                 f_host.logger.warn('{} DIG input level ({:.1f}dBFS).'.format(f_host.fengines[int(key[1])].name,results[key]))
             else:
-                sensor.set(value=results[key], status=Corr2Sensor.NOMINAL)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.NOMINAL)
 
         for key in ['p0_dig_clip_cnt', 'p1_dig_clip_cnt']:
             sensor = sensors[key]
-            sensor.set(value=results[key], status=Corr2Sensor.NOMINAL)
+            sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.NOMINAL)
 
         device_status_value = 'fail'
         if(device_status == Corr2Sensor.WARN):
@@ -351,54 +245,42 @@ def _cb_feng_adcs(sensors, f_host, sensor_manager,sensor_task):
         if(device_status == Corr2Sensor.NOMINAL):
             device_status_value = 'ok'
 
-        sensors['device_status'].set(value=device_status_value,
+        sensors['device_status'].set(timestamp=timestamp, value=device_status_value,
                                      status=device_status)
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating DIG ADC sensors for {} - {}.'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
 
     sensor_manager.logger.debug('_sensor_feng_adc ran on {}'.format(f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("6 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'6'))
-
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_adcs, sensors, f_host, sensor_manager,sensor_task)
 
-@gen.coroutine
-def _cb_feng_pfbs(sensors, f_host, min_pfb_pwr, sensor_manager, sensor_task):
+def _update_feng_pfbs(readings, sensors, f_host, min_pfb_pwr, sensor_manager):
     """
     F-engine PFB check
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return:
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("7 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_pfb_status()
+        results = f_host.get_pfb_status(readings['registers'])
         device_status = Corr2Sensor.NOMINAL
         for key in ['pol0_or_err_cnt', 'pol1_or_err_cnt']:
             sensor = sensors[key]
-            sensor.set(value=results[key], warnif='changed')
+            sensor.set(timestamp=timestamp, value=results[key], warnif='changed')
             if sensor.status() == Corr2Sensor.WARN:
                 device_status = Corr2Sensor.WARN
 
         for key in ['pol0_pfb_out_dBFS','pol1_pfb_out_dBFS']:
             sensor = sensors[key]
             if (results[key] > -24) or (results[key] < min_pfb_pwr):
-                sensor.set(value=results[key], status=Corr2Sensor.WARN)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.WARN)
                 device_status = Corr2Sensor.WARN
                 f_host.logger.warn('{} PFB output level {:.1f}dBFS out of range {:.0f} dBFS < to < -24 dBFS.'.format(f_host.fengines[int(key[3])].name,results[key],min_pfb_pwr))
             else:
-                sensor.set(value=results[key], status=Corr2Sensor.NOMINAL)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.NOMINAL)
 
         device_status_value = 'fail'
         if(device_status == Corr2Sensor.WARN):
@@ -406,48 +288,36 @@ def _cb_feng_pfbs(sensors, f_host, min_pfb_pwr, sensor_manager, sensor_task):
         if(device_status == Corr2Sensor.NOMINAL):
             device_status_value = 'ok'
 
-        sensors['device_status'].set(value=device_status_value,
+        sensors['device_status'].set(timestamp=timestamp, value=device_status_value,
                                      status=device_status)
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating PFB sensors for {} - {}.'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
     sensor_manager.logger.debug('_sensor_feng_pfbs ran on {}'.format(f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("7 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'7'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_pfbs, sensors, f_host, min_pfb_pwr, sensor_manager,sensor_task)
 
-
-@gen.coroutine
-def _cb_feng_quant(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_quant(readings, sensors, f_host, sensor_manager):
     """
     F-engine quantiser check
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return:
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("8 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_quant_status()
+        results = f_host.get_quant_status(readings['registers'])
         device_status = Corr2Sensor.NOMINAL
 
         for key in ['p0_quant_out_dBFS','p1_quant_out_dBFS']:
             sensor = sensors[key]
             if (results[key] > -10) or (results[key] < -30):
-                sensor.set(value=results[key], status=Corr2Sensor.WARN)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.WARN)
                 device_status = Corr2Sensor.WARN
                 f_host.logger.warn('{} Quantiser output level {:.1f}dBFS out of range -30 dBFS to -10 dBFS.'.format(f_host.fengines[int(key[1])].name,results[key]))
             else:
-                sensor.set(value=results[key], status=Corr2Sensor.NOMINAL)
+                sensor.set(timestamp=timestamp, value=results[key], status=Corr2Sensor.NOMINAL)
 
         device_status_value = 'fail'
         if(device_status == Corr2Sensor.WARN):
@@ -455,236 +325,163 @@ def _cb_feng_quant(sensors, f_host, sensor_manager,sensor_task):
         if(device_status == Corr2Sensor.NOMINAL):
             device_status_value = 'ok'
 
-        sensors['device_status'].set(value=device_status_value,
+        sensors['device_status'].set(timestamp=timestamp, value=device_status_value,
                                      status=device_status)
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating quantiser sensors for {} - {}.'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
     sensor_manager.logger.debug('_sensor_feng_quant ran on {}'.format(f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("8 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'8'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_quant, sensors, f_host, sensor_manager,sensor_task)
 
-@gen.coroutine
-def _cb_fhost_check_network(sensors, f_host, sensor_manager,sensor_task):
+def _update_fhost_network(readings, sensors, f_host, sensor_manager):
     """
     Check that the f-hosts are receiving data correctly
+    :param readings: the host's readings, from _read_fhost_status
     :param sensors: a dict of the network sensors to update
     :return:
     """
+    timestamp = readings['time']
     # GBE CORE
-    functionStartTime = time.time();
-    ##print("9 on %s Started at %f" % (f_host.host ,functionStartTime))
-
-    device_status = Corr2Sensor.NOMINAL
-
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-            # heck dictionary
     try:
-        result = f_host.gbes.gbe0.get_hw_gbe_stats()
-        tx_enabled = f_host.registers.control.read()['data']['gbe_txen']
-        sensors['tx_enabled'].set(errif='False', value=tx_enabled)
-        sensors['tx_err_cnt'].set(errif='changed', value=result['tx_over_err_cnt'])
-        sensors['rx_err_cnt'].set(errif='changed', value=result['rx_bad_pkt_cnt'])
+        result = readings['gbe']
+        tx_enabled = readings['registers']['control']['gbe_txen']
+        sensors['tx_enabled'].set(timestamp=timestamp, errif='False', value=tx_enabled)
+        sensors['tx_err_cnt'].set(timestamp=timestamp, errif='changed', value=result['tx_over_err_cnt'])
+        sensors['rx_err_cnt'].set(timestamp=timestamp, errif='changed', value=result['rx_bad_pkt_cnt'])
         sensors['tx_pps'].set(
-            status=Corr2Sensor.NOMINAL,
+            timestamp=timestamp, status=Corr2Sensor.NOMINAL,
             value=result['tx_pps'])
         sensors['tx_gbps'].set(
-            status=Corr2Sensor.NOMINAL,
+            timestamp=timestamp, status=Corr2Sensor.NOMINAL,
             value=result['tx_gbps'])
 
 # The software-based PPS and Gbps counters aren't reliable, so ignore them for now:
         if (result['rx_pps'] > 500000) and (result['rx_pps'] < 900000):
             sensors['rx_pps'].set(
-                status=Corr2Sensor.NOMINAL,
+                timestamp=timestamp, status=Corr2Sensor.NOMINAL,
                 value=result['rx_pps'])
         else:
             sensors['rx_pps'].set(
-                status=Corr2Sensor.WARN,
+                timestamp=timestamp, status=Corr2Sensor.WARN,
                 value=result['rx_pps'])
-            device_status = Corr2Sensor.WARN
 
         if (result['rx_gbps'] > 20) and (result['rx_gbps'] < 38):
             sensors['rx_gbps'].set(
-                status=Corr2Sensor.NOMINAL,
+                timestamp=timestamp, status=Corr2Sensor.NOMINAL,
                 value=result['rx_gbps'])
         else:
             sensors['rx_gbps'].set(
-                status=Corr2Sensor.WARN,
+                timestamp=timestamp, status=Corr2Sensor.WARN,
                 value=result['rx_gbps'])
-            device_status = Corr2Sensor.WARN
-
-        if ((sensors['tx_err_cnt'].status() == Corr2Sensor.ERROR) or
-            (sensors['rx_err_cnt'].status() == Corr2Sensor.ERROR) or
-                (sensors['tx_enabled'].status() == Corr2Sensor.ERROR)):
-            device_status = Corr2Sensor.ERROR
-
-        sens_val = 'fail'
-        if(device_status == Corr2Sensor.NOMINAL):
-            sens_val = 'ok'
-        elif(device_status == Corr2Sensor.WARN):
-            sens_val = 'degraded'
-
-        sensors['device_status'].set(value=sens_val,
-                                     status=device_status)
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating gbe_stats for {} - {}'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
     sensor_manager.logger.debug('_sensor_fhost_check_network ran on {}'.format(f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("9 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'9'))
-
-    IOLoop.current().call_at(
-        sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime),
-        _cb_fhost_check_network,
-        sensors,
-        f_host, sensor_manager,sensor_task)
 
-@gen.coroutine
-def _cb_feng_sync(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_sync(readings, sensors, f_host, sensor_manager):
     """
     F-engine synchroniser
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return: 
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("10 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_sync_status()
-        sensors['resync_cnt'].set(value=results['sync80_cnt'],errif='changed')
+        results = f_host.get_sync_status(readings['registers'])
+        sensors['resync_cnt'].set(timestamp=timestamp, value=results['sync80_cnt'],errif='changed')
         if ((results['synced']) and not (results['board_in_fault']) and (sensors['resync_cnt'].status() == Corr2Sensor.NOMINAL)):
-            sensors['device_status'].set(value='ok',status=Corr2Sensor.NOMINAL)
+            sensors['device_status'].set(timestamp=timestamp, value='ok',status=Corr2Sensor.NOMINAL)
         else:
-            sensors['device_status'].set(value='fail',status=Corr2Sensor.ERROR)
+            sensors['device_status'].set(timestamp=timestamp, value='fail',status=Corr2Sensor.ERROR)
             f_host.logger.error("Sync error: %s"%str(results)) 
 
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating sync sensors for {} - {}'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
     sensor_manager.logger.debug(
         '_sensor_feng_sync ran on {}'.format(
             f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("10 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'10'))
-
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_sync, sensors, f_host, sensor_manager,sensor_task)
 
-@gen.coroutine
-def _cb_feng_rx_spead(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_rx_spead(readings, sensors, f_host, sensor_manager):
     """
     F-engine SPEAD unpack block
-    :param sensor:
+    :param readings: the host's readings, from _read_fhost_status
+    :param sensors:
     :return: true/false
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-
-    functionStartTime = time.time();
-    ##print("11 on %s Started at %f" % (f_host.host ,functionStartTime))
+    timestamp = readings['time']
     # SPEAD RX
     try:
-        results = f_host.get_unpack_status()
-        sensors['err_cnt'].set(value=results['time_err_cnt'],warnif='changed')
-        sensors['cnt'].set(value=results['pkt_cnt'], warnif='notchanged')
+        results = f_host.get_unpack_status(readings['registers'])
+        sensors['err_cnt'].set(timestamp=timestamp, value=results['time_err_cnt'],warnif='changed')
+        sensors['cnt'].set(timestamp=timestamp, value=results['pkt_cnt'], warnif='notchanged')
 
         if sensors['err_cnt'].status() == Corr2Sensor.ERROR:
-            sensors['device_status'].set(value='fail', status=Corr2Sensor.ERROR)
+            sensors['device_status'].set(timestamp=timestamp, value='fail', status=Corr2Sensor.ERROR)
             f_host.logger.error("RX SPEAD error: %s"%str(results))
         elif sensors['err_cnt'].status() == Corr2Sensor.WARN:
-            sensors['device_status'].set(value='degraded', status=Corr2Sensor.WARN)
+            sensors['device_status'].set(timestamp=timestamp, value='degraded', status=Corr2Sensor.WARN)
             f_host.logger.warn("RX SPEAD warning: %s"%str(results))
         elif sensors['cnt'].status() == Corr2Sensor.WARN:
-            sensors['device_status'].set(value='degraded', status=Corr2Sensor.WARN)
+            sensors['device_status'].set(timestamp=timestamp, value='degraded', status=Corr2Sensor.WARN)
             f_host.logger.error("No valid SPEAD data being received: %s"%str(results))
         else:
-            sensors['device_status'].set(value='ok', status=Corr2Sensor.NOMINAL)
+            sensors['device_status'].set(timestamp=timestamp, value='ok', status=Corr2Sensor.NOMINAL)
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating spead sensors for {} - {}'.format(
                 f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
     sensor_manager.logger.debug(
         '_sensor_feng_rx_spead ran on {}'.format(
             f_host.host))
 
-    functionRunTime = time.time() - functionStartTime;
-    ##print("11 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'11'))
 
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_rx_spead, sensors, f_host, sensor_manager,sensor_task)
-
-
-@gen.coroutine
-def _cb_feng_rx_reorder(sensors, f_host, sensor_manager,sensor_task):
+def _update_feng_rx_reorder(readings, sensors, f_host, sensor_manager):
     """
     F-engine RX reorder counters
+    :param readings: the host's readings, from _read_fhost_status
     :param sensors: dictionary of sensors
     :return: true/false
     """
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    ##print("12 on %s Started at %f" % (f_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        results = f_host.get_rx_reorder_status()
+        results = f_host.get_rx_reorder_status(readings['registers'])
         device_status = True
         err_cnt = results['timestep_err_cnt'] + results['receive_err_cnt'] + \
                     results['relock_err_cnt'] + results['overflow_err_cnt']
-        sensors['err_cnt'].set(value=err_cnt, errif='changed')
+        sensors['err_cnt'].set(timestamp=timestamp, value=err_cnt, errif='changed')
         if sensors['err_cnt'].status() == Corr2Sensor.ERROR:
-            sensors['device_status'].set(status=Corr2Sensor.ERROR, value='fail')
+            sensors['device_status'].set(timestamp=timestamp, status=Corr2Sensor.ERROR, value='fail')
         else:
-            sensors['device_status'].set(status=Corr2Sensor.NOMINAL, value='ok')
+            sensors['device_status'].set(timestamp=timestamp, status=Corr2Sensor.NOMINAL, value='ok')
 
     except Exception as e:
         sensor_manager.logger.error('Error updating rx_reorder sensors for {} - '
                      '{}'.format(f_host.host, e.message))
-        set_failure()
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
 
     sensor_manager.logger.debug('_sensor_feng_rx_reorder ran on {}'.format(f_host.host))
-    functionRunTime = time.time() - functionStartTime;
-    ##print("12 on %s Ended End Time %f, Run Time %f" % (f_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,f_host.host,'12'))
 
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_feng_rx_reorder, sensors, f_host, sensor_manager,sensor_task)
 
-
-def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
+def setup_sensors_fengine(sens_man, general_executor, host_executors, scheduler,
                           host_offset_dict):
     """
     Set up the F-engine specific sensors.
     :param sens_man:
-    :param general_executor:
-    :param host_executors:
-    :param ioloop:
+    :param general_executor: the executor for the sensors across all the
+        hosts, None if they are set up elsewhere
+    :param host_executors: the executors of the hosts whose sensors to
+        set up, keyed on hostname
+    :param scheduler: the SensorScheduler on which to run the sensor tasks
     :param host_offset_dict:
     :return:
     """
@@ -692,32 +489,43 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
     #sensor_poll_time = sens_man.instrument.sensor_poll_time
     if len(host_offset_lookup) == 0:
         host_offset_lookup = host_offset_dict.copy()
-    # F-engine received timestamps ok and per-host received timestamps
-    sensor_ok = sens_man.do_sensor(
-        Corr2Sensor.boolean, 'feng-rxtime-ok',
-        'Are the times received by F-engines in the system ok?',
-        executor=general_executor)
+    # F-engine received timestamps ok and per-host received timestamps,
+    # compared across all the hosts, so only set up with the general
+    # executor
     sensors_value = {}
-    
-    for _f in sens_man.instrument.fhosts:
-        fhost = host_offset_lookup[_f.host]
-        sensor = sens_man.do_sensor(
-            Corr2Sensor.integer, '{}.rx-timestamp'.format(fhost),
-            'F-engine %s - sample-counter timestamps received from the '
-            'digitisers' % _f.host)
-        sensor_u = sens_man.do_sensor(
-            Corr2Sensor.float, '{}.rx-unixtime'.format(fhost),
-            'F-engine %s - UNIX timestamps received from '
-            'the digitisers' % _f.host)
-        sensors_value[_f.host] = (sensor, sensor_u)
-    sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_rxtime','all boards'))
-    ioloop.add_callback(_cb_feng_rxtime, sensor_ok, sensors_value, sens_man,sensor_task)
+    if general_executor is not None:
+        sensor_ok = sens_man.do_sensor(
+            Corr2Sensor.boolean, 'feng-rxtime-ok',
+            'Are the times received by F-engines in the system ok?',
+            executor=general_executor)
+
+        for _f in sens_man.instrument.fhosts:
+            fhost = host_offset_lookup[_f.host]
+            sensor = sens_man.do_sensor(
+                Corr2Sensor.integer, '{}.rx-timestamp'.format(fhost),
+                'F-engine %s - sample-counter timestamps received from the '
+                'digitisers' % _f.host)
+            sensor_u = sens_man.do_sensor(
+                Corr2Sensor.float, '{}.rx-unixtime'.format(fhost),
+                'F-engine %s - UNIX timestamps received from '
+                'the digitisers' % _f.host)
+            sensors_value[_f.host] = (sensor, sensor_u)
+        scheduler.add_task('{0: <25} on {1: >15}'.format('_cb_feng_rxtime','all boards'),
+                           _cb_feng_rxtime,
+                           (sensor_ok, sensors_value, general_executor, sens_man),
+                           priority=sensor_scheduler.PRIORITY_SLOW,
+                           sensor_prefix='feng-rxtime')
     import numpy
     min_pfb_pwr = -20*numpy.log10(2**(sens_man.instrument.fops.pfb_bits-4-1))
-    # F-engine host sensors
-    for _f in sens_man.instrument.fhosts:
+    # F-engine host sensors, all updated from one status poll per host
+    fhosts = [_f for _f in sens_man.instrument.fhosts
+              if _f.host in host_executors]
+    for _f in fhosts:
         executor = host_executors[_f.host]
         fhost = host_offset_lookup[_f.host]
+        poll = sensor_scheduler.HostStatusPoll(
+            '{0: <25} on {1: >15}'.format('_read_fhost_status', _f.host),
+            _f, executor, _read_fhost_status, logger=sens_man.logger)
         # raw network comms - gbe counters must increment
         network_sensors = {
             'device_status': sens_man.do_sensor(
@@ -745,8 +553,11 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.network.rx-err-cnt'.format(fhost),
                 'RX network error count (bad packets received)', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('_cb_fhost_check_network on '+_f.host)
-        ioloop.add_callback(_cb_fhost_check_network, network_sensors, _f, sens_man,sensor_task)
+        Corr2SensorRollup(
+            network_sensors['device_status'],
+            [sensor for name, sensor in network_sensors.items()
+             if name != 'device_status'])
+        poll.add_update(_update_fhost_network, network_sensors, _f, sens_man)
 
         # SPEAD counters
         spead_rx_sensors = {
@@ -763,8 +574,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 'F-engine RX SPEAD error counter.',
                 executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_rx_spead',_f.host))
-        ioloop.add_callback(_cb_feng_rx_spead, spead_rx_sensors, _f, sens_man,sensor_task)
+        poll.add_update(_update_feng_rx_spead, spead_rx_sensors, _f, sens_man)
 
 
         # Rx reorder counters
@@ -778,8 +588,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 'Error counter from reordering digitiser data stream packets.',
                 executor=executor)
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_rx_reorder',_f.host))
-        ioloop.add_callback(_cb_feng_rx_reorder, rx_reorder_sensors, _f, sens_man,sensor_task)
+        poll.add_update(_update_feng_rx_reorder, rx_reorder_sensors, _f, sens_man)
 
 
         # CD functionality
@@ -810,8 +619,10 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
         }
         cd_sensors['delay0_updating'].tempstore = 0
         cd_sensors['delay1_updating'].tempstore = 0
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_delay',_f.host),minimum_time_between_calls_s=6)
-        ioloop.add_callback(_cb_feng_delays, cd_sensors, _f, sens_man,sensor_task)
+        cd_sensors['delay0_updating'].tempstore_time = 0
+        Corr2SensorRollup(cd_sensors['device_status'],
+                          [cd_sensors['pol0_err_cnt'], cd_sensors['pol1_err_cnt']])
+        poll.add_update(_update_feng_delays, cd_sensors, _f, sens_man)
 
 
         # DIG ADC counters
@@ -844,8 +655,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.dig.p1-dig-clip-cnt'.format(fhost),
                 'F-engine DIG reported overrange counter.', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_adcs',_f.host))
-        ioloop.add_callback(_cb_feng_adcs, adc_sensors, _f, sens_man,sensor_task)
+        poll.add_update(_update_feng_adcs, adc_sensors, _f, sens_man)
 
 
         # PFB counters
@@ -869,8 +679,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
             #    Corr2Sensor.integer, '{}.pfb.sync-cnt'.format(fhost),
             #    'F-engine PFB resync counter', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_pfbs',_f.host))
-        ioloop.add_callback(_cb_feng_pfbs, pfb_sensors, _f, min_pfb_pwr, sens_man,sensor_task)
+        poll.add_update(_update_feng_pfbs, pfb_sensors, _f, min_pfb_pwr, sens_man)
 
 
         # CT functionality
@@ -885,8 +694,9 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.ct.err-cnt1'.format(fhost),
                 'F-engine corner-turner error counter, pol1', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_ct',_f.host))
-        ioloop.add_callback(_cb_feng_ct, ct_sensors, _f, sens_man,sensor_task)
+        Corr2SensorRollup(ct_sensors['device_status'],
+                          [ct_sensors['pol0_err_cnt'], ct_sensors['pol1_err_cnt']])
+        poll.add_update(_update_feng_ct, ct_sensors, _f, sens_man)
 
 
         # Pack block
@@ -898,8 +708,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.spead-tx.err-cnt'.format(fhost),
                 'F-engine pack (TX) error count', executor=executor)
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_pack',_f.host))
-        ioloop.add_callback(_cb_feng_pack, pack_sensors, _f, sens_man,sensor_task)
+        poll.add_update(_update_feng_pack, pack_sensors, _f, sens_man)
 
 
         
@@ -915,8 +724,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.float, '{}.quant.pol1-quant-out-rms-pwr-dbfs'.format(fhost),
                 'F-engine Quantiser output RMS power in dBFS, pol1.', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_quant on',_f.host))
-        ioloop.add_callback(_cb_feng_quant, quant_sensors, _f, sens_man,sensor_task)
+        poll.add_update(_update_feng_quant, quant_sensors, _f, sens_man)
 
 
 
@@ -929,8 +737,7 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.sync.resync-cnt'.format(fhost),
                 'Count of F-engine sync losses (or attempts to resynchronise).', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_feng_sync',_f.host))
-        ioloop.add_callback(_cb_feng_sync, sync_sensors, _f, sens_man,sensor_task)
+        poll.add_update(_update_feng_sync, sync_sensors, _f, sens_man)
 
 
 
@@ -938,10 +745,23 @@ def setup_sensors_fengine(sens_man, general_executor, host_executors, ioloop,
         lru_sensor = sens_man.do_sensor(
             Corr2Sensor.device_status, '{}.device-status'.format(fhost),
             'F-engine %s LRU ok' % _f.host, executor=executor)
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_fhost_lru',_f.host))
-        ioloop.add_callback(_cb_fhost_lru, sens_man, lru_sensor, _f,sensor_task)
-
-
-        
+        lru = Corr2SensorRollup(lru_sensor, [
+            network_sensors['device_status'],
+            rx_reorder_sensors['device_status'],
+            cd_sensors['device_status'],
+            ct_sensors['device_status']])
+        # these only degrade the LRU
+        for sensor in [pfb_sensors['device_status'],
+                       quant_sensors['device_status'],
+                       adc_sensors['device_status']]:
+            lru.add_child(sensor, {Corr2Sensor.ERROR: Corr2Sensor.WARN})
+        sync_map = {Corr2Sensor.ERROR: Corr2Sensor.WARN,
+                    Corr2Sensor.FAILURE: Corr2Sensor.WARN}
+        lru.add_child(sync_sensors['device_status'], sync_map)
+        # the received timestamps may be set up in another sensor shard
+        lru.add_child_name('{}.rx-timestamp'.format(fhost), sync_map)
+        scheduler.add_task(poll.name, poll.poll,
+                           priority=sensor_scheduler.PRIORITY_FAST,
+                           sensor_prefix=fhost)
 
 # end
@@ -5,334 +5,182 @@ import tornado
 
 from IPython.core.debugger import Pdb
 
-from tornado.ioloop import IOLoop
-
 from casperfpga.transport_katcp import KatcpRequestError, KatcpRequestFail, \
     KatcpRequestInvalid
 
 import sensor_scheduler
-from sensors import Corr2Sensor, boolean_sensor_do
+from sensors import Corr2Sensor, Corr2SensorRollup, boolean_sensor_do
 
 host_offset_lookup = {}
 
-@gen.coroutine
-def _cb_xhost_lru(sensor_manager, sensor, sensors, x_host,sensor_task):
-    """
-    Sensor call back function for x-engine LRU
-    :param sensor:
-    :return:
-    """
-   
-    functionStartTime = time.time();
-    #print("13 on %s Started at %f" % (x_host.host ,functionStartTime))
-
-    try:
-        h = host_offset_lookup[x_host.host]
-        # Pdb().set_trace()
-        status = Corr2Sensor.NOMINAL
-        for xctr in range(x_host.x_per_fpga):
-            pref = '{xhost}.xeng{xctr}'.format(xhost=h, xctr=xctr)
-            eng_status = Corr2Sensor.NOMINAL
-            if sensor_manager.sensor_get("{}.vacc.device-status".format(pref)).status() == Corr2Sensor.ERROR:
-                status = Corr2Sensor.ERROR
-                eng_status = Corr2Sensor.ERROR
-            elif sensor_manager.sensor_get("{}.bram-reorder.device-status".format(pref)).status() == Corr2Sensor.ERROR:
-                status = Corr2Sensor.ERROR
-                eng_status = Corr2Sensor.ERROR
-            elif sensor_manager.sensor_get("{}.spead-tx.device-status".format(pref)).status() == Corr2Sensor.ERROR:
-                status = Corr2Sensor.ERROR
-                eng_status = Corr2Sensor.ERROR
-            if sensor_manager.sensor_get("{}.vacc.device-status".format(pref)).status() == Corr2Sensor.WARN:
-                status = Corr2Sensor.WARN
-                eng_status = Corr2Sensor.WARN
-            elif sensor_manager.sensor_get("{}.bram-reorder.device-status".format(pref)).status() == Corr2Sensor.WARN:
-                status = Corr2Sensor.WARN
-                eng_status = Corr2Sensor.WARN
-            elif sensor_manager.sensor_get("{}.spead-tx.device-status".format(pref)).status() == Corr2Sensor.WARN:
-                status = Corr2Sensor.WARN
-                eng_status = Corr2Sensor.WARN
-
-            eng_sens_val = 'fail'
-            if(eng_status == Corr2Sensor.NOMINAL):
-                eng_sens_val = 'ok'
-            elif(eng_status == Corr2Sensor.WARN):
-                eng_sens_val = 'degraded'
-
-            sensors[xctr].set(value=eng_sens_val, status=eng_status)
-
-        if status != Corr2Sensor.ERROR:
-            if sensor_manager.sensor_get("{}.network.device-status".format(h)).status() == Corr2Sensor.ERROR:
-                status = Corr2Sensor.ERROR
-            elif sensor_manager.sensor_get("{}.network-reorder.device-status".format(h)).status() == Corr2Sensor.ERROR:
-                status = Corr2Sensor.ERROR
-            elif sensor_manager.sensor_get("{}.spead-rx.device-status".format(h)).status() == Corr2Sensor.ERROR:
-                status = Corr2Sensor.ERROR
-            elif sensor_manager.sensor_get("{}.network.device-status".format(h)).status() == Corr2Sensor.WARN:
-                status = Corr2Sensor.WARN
-            elif sensor_manager.sensor_get("{}.network-reorder.device-status".format(h)).status() == Corr2Sensor.WARN:
-                status = Corr2Sensor.WARN
-            elif sensor_manager.sensor_get("{}.spead-rx.device-status".format(h)).status() == Corr2Sensor.WARN:
-                status = Corr2Sensor.WARN
-
-        sens_val = 'fail'
-        if(status == Corr2Sensor.NOMINAL):
-            sens_val = 'ok'
-        elif(status == Corr2Sensor.WARN):
-            sens_val = 'degraded'
-
-        sensor.set(value=sens_val, status=status)
-
-    except Exception as e:
-        sensor_manager.logger.error(
-            'Error updating LRU sensor for {} - {}'.format(
-                x_host.host, e.message))
-        for xctr in range(x_host.x_per_fpga):
-            sensors[xctr].set(value='fail', status=Corr2Sensor.FAILURE)
-        sensor.set(value='fail', status=Corr2Sensor.FAILURE)
-
-    sensor_manager.logger.debug('_cb_xhost_lru ran')
-
-    functionRunTime = time.time() - functionStartTime;
-    #print("13 on %s Ended End Time %f, Run Time %f" % (x_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'13'))
-    IOLoop.current().call_at(
-        sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime),
-        _cb_xhost_lru,
-        sensor_manager,
-        sensor, sensors,
-        x_host,sensor_task)
+# the status bundles read by every X-host status poll
+XHOST_STATUS_BUNDLES = ['unpack', 'hmc_reorder', 'rx_reorder', 'pack']
 
 
-@gen.coroutine
-def _cb_xeng_network(sensors, x_host, sensor_manager,sensor_task):
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
+def _read_xhost_status(x_host):
+    """
+    Read everything the X-host sensors need, in one job on the host's worker.
+    :param x_host: the host to read
+    :return: a dictionary of readings, timestamped when the read started
+    """
+    return {
+        'time': time.time(),
+        'registers': x_host.read_status_bundles(XHOST_STATUS_BUNDLES),
+        'gbe': x_host.gbes.gbe0.get_hw_gbe_stats(),
+        'missing_ants': x_host.get_missing_ant_counts(),
+    }
 
-    #print("14 on %s Started at %f" % (x_host.host ,functionStartTime))
 
-    device_status = Corr2Sensor.NOMINAL
+def _update_xeng_network(readings, sensors, x_host, sensor_manager):
+    """
+    X-engine network counters
+    :param readings: the host's readings, from _read_xhost_status
+    :param sensors: a dict of the network sensors to update
+    :return:
+    """
+    timestamp = readings['time']
     try:
-        result = x_host.gbes.gbe0.get_hw_gbe_stats()
-        sensors['tx_err_cnt'].set(errif='changed', value=result['tx_over_err_cnt'])
-        sensors['rx_err_cnt'].set(errif='changed', value=result['rx_bad_pkt_cnt'])
+        result = readings['gbe']
+        sensors['tx_err_cnt'].set(timestamp=timestamp, errif='changed', value=result['tx_over_err_cnt'])
+        sensors['rx_err_cnt'].set(timestamp=timestamp, errif='changed', value=result['rx_bad_pkt_cnt'])
         sensors['tx_pps'].set(
-            status=Corr2Sensor.NOMINAL,
+            timestamp=timestamp, status=Corr2Sensor.NOMINAL,
             value=result['tx_pps'])
         sensors['tx_gbps'].set(
-            status=Corr2Sensor.NOMINAL,
+            timestamp=timestamp, status=Corr2Sensor.NOMINAL,
             value=result['tx_gbps'])
 
         if (result['rx_pps'] < 3500000) and (result['rx_pps'] > 2000000):
             sensors['rx_pps'].set(
-                status=Corr2Sensor.NOMINAL,
+                timestamp=timestamp, status=Corr2Sensor.NOMINAL,
                 value=result['rx_pps'])
         else:
             sensors['rx_pps'].set(
-                status=Corr2Sensor.WARN,
+                timestamp=timestamp, status=Corr2Sensor.WARN,
                 value=result['rx_pps'])
-            device_status = Corr2Sensor.WARN
 
         if (result['rx_gbps'] < 32) and (result['rx_gbps'] > 18):
             sensors['rx_gbps'].set(
-                status=Corr2Sensor.NOMINAL,
+                timestamp=timestamp, status=Corr2Sensor.NOMINAL,
                 value=result['rx_gbps'])
         else:
             sensors['rx_gbps'].set(
-                status=Corr2Sensor.WARN,
+                timestamp=timestamp, status=Corr2Sensor.WARN,
                 value=result['rx_gbps'])
-            device_status = Corr2Sensor.WARN
-
-        if ((sensors['tx_err_cnt'].status() == Corr2Sensor.ERROR) or
-                (sensors['rx_err_cnt'].status() == Corr2Sensor.ERROR)):
-            device_status = Corr2Sensor.ERROR
-
-        sens_val = 'fail'
-        if(device_status == Corr2Sensor.NOMINAL):
-            sens_val = 'ok'
-        elif(device_status == Corr2Sensor.WARN):
-            sens_val = 'degraded'
-
-        sensors['device_status'].set(
-            value=sens_val,
-            status=device_status)
 
     except Exception as e:
         sensor_manager.logger.error(
             'Error updating gbe_stats for {} - {}'.format(
                 x_host.host, e.message))
-        set_failure()
-
-    sensor_manager.logger.debug('_cb_xeng_network ran')
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("14 on %s Ended End Time %f, Run Time %f" % (x_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'14'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_xeng_network, sensors, x_host, sensor_manager,sensor_task)
+    sensor_manager.logger.debug('_update_xeng_network ran')
 
 
-@gen.coroutine
-def _cb_xeng_rx_spead(sensors, x_host, sensor_manager,sensor_task):
-    def set_failure():
-        for key, sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    #print("15 on %s Started at %f" % (x_host.host ,functionStartTime))
+def _update_xeng_rx_spead(readings, sensors, x_host, sensor_manager):
+    """
+    X-engine SPEAD unpack block
+    :param readings: the host's readings, from _read_xhost_status
+    :param sensors: a dict of the SPEAD RX sensors to update
+    :return:
+    """
+    timestamp = readings['time']
     # SPEAD RX
     status = Corr2Sensor.NOMINAL
     value = 'ok'
     try:
-        results = x_host.get_unpack_status()
+        results = x_host.get_unpack_status(readings['registers'])
         sensors['err_cnt'].set(
-            value=results['time_err_cnt'],
+            timestamp=timestamp, value=results['time_err_cnt'],
             errif='changed')
-        sensors['cnt'].set(value=results['valid_pkt_cnt'], warnif='notchanged')
+        sensors['cnt'].set(timestamp=timestamp, value=results['valid_pkt_cnt'], warnif='notchanged')
         if sensors['err_cnt'].status() == Corr2Sensor.ERROR:
             status = Corr2Sensor.ERROR
             value = 'fail'
         elif sensors['cnt'].status() == Corr2Sensor.WARN:
             status = Corr2Sensor.WARN
             value = 'degraded'
-        sensors['device_status'].set(value=value, status=status)
+        sensors['device_status'].set(timestamp=timestamp, value=value, status=status)
     except Exception as e:
         sensor_manager.logger.error('Error updating SPEAD sensors for {} - '
                                     '{}'.format(x_host.host, e.message))
-        set_failure()
-
-    sensor_manager.logger.debug('_cb_xeng_rx_spead ran')
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'15'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_xeng_rx_spead, sensors, x_host, sensor_manager,sensor_task)
+    sensor_manager.logger.debug('_update_xeng_rx_spead ran')
 
 
-@gen.coroutine
-def _cb_xeng_hmc_reorder(sensors, x_host, sensor_manager,sensor_task):
+def _update_xeng_hmc_reorder(readings, sensors, x_host, sensor_manager):
     """
     X-engine HMC packet RX reorder counters
+    :param readings: the host's readings, from _read_xhost_status
     :param sensors: a sensor for each xengine rx reorder
     :return:
     """
-    def set_failure():
-        for key,sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time(); 
-    #print("16 on %s Started at %f" % (x_host.host ,functionStartTime))       
-
+    timestamp = readings['time']
     try:
-        results = x_host.get_hmc_reorder_status()
-        device_status = Corr2Sensor.NOMINAL
-        sens_val = 'ok'
-        sensors['miss_err_cnt'].set(value=results['miss_err_cnt'], warnif='changed')
+        results = x_host.get_hmc_reorder_status(readings['registers'])
+        sensors['miss_err_cnt'].set(timestamp=timestamp, value=results['miss_err_cnt'], warnif='changed')
         total_errors=results['dest_err_cnt'] + results['ts_err_cnt'] + results['hmc_err_cnt'] + results['lnk2_nrdy_err_cnt'] + results['lnk3_nrdy_err_cnt'] + results['mcnt_timeout_cnt']
-        sensors['err_cnt'].set(value=total_errors, errif='changed')
+        sensors['err_cnt'].set(timestamp=timestamp, value=total_errors, errif='changed')
 
         if sensors['err_cnt'].status() != Corr2Sensor.NOMINAL:
-                device_status = Corr2Sensor.ERROR
-                sens_val = 'fail'
-        elif sensors['miss_err_cnt'].status() == Corr2Sensor.WARN:
-            device_status = Corr2Sensor.WARN
-            sens_val = 'degraded'
-        else:
-            device_status = Corr2Sensor.NOMINAL
-            sens_val = 'ok'
-
-        if device_status == Corr2Sensor.ERROR:
             x_host.logger.error("HMC Reorder error: %s"%str(results))
-            x_host.logger.error("HMC Reorder HMC status: %s"%str(x_host.hmcs.hmc_pkt_reord_hmc.get_hmc_status()))
-
-        sensors['device_status'].set(
-            value=sens_val,
-            status=device_status)
+            sensor_manager.instrument.host_executor.submit(
+                x_host, x_host.log_hmc_status, 'hmc_pkt_reord_hmc',
+                'HMC Reorder HMC')
 
     except Exception as e:
         sensor_manager.logger.error('Error updating HMC RX reorder sensors for {} - '
                      '{}'.format(x_host.host, e.message))
-        set_failure()
-
-    sensor_manager.logger.debug('_cb_xeng_hmc_reorder ran')
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("16 on %s Ended End Time %f, Run Time %f" % (x_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'16'))
-    IOLoop.current().call_at(
-        sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime),
-        _cb_xeng_hmc_reorder,
-        sensors,
-        x_host, sensor_manager,sensor_task)
+    sensor_manager.logger.debug('_update_xeng_hmc_reorder ran')
 
 
-@gen.coroutine
-def _cb_xeng_missing_ants(sensors, sensor_top, x_host, sensor_manager,sensor_task):
+def _update_xeng_missing_ants(readings, sensors, x_host, sensor_manager):
     """
     X-engine missing packet counts per antenna.
-    :param sensors:
+    :param readings: the host's readings, from _read_xhost_status
+    :param sensors: the rolled-up device-status sensor and a list of
+        per-antenna sensors
     :return:
     """
-    def set_failure():
-        for key,sensor in sensors.iteritems():
-            sensor.set(status=Corr2Sensor.FAILURE,
-                       value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-        sensor_top.set(status=Corr2Sensor.FAILURE, value='fail')
-
-    functionStartTime = time.time();
-    #print("17 on %s Started at %f" % (x_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     status = Corr2Sensor.NOMINAL
     value = 'ok'
     try:
-        results = x_host.get_missing_ant_counts()
+        results = readings['missing_ants']
         for n_ant, missing in enumerate(results):
-            sensors[n_ant].set(value=missing, warnif='changed')
-            if sensors[n_ant].status() == Corr2Sensor.WARN:
+            sensors['ants'][n_ant].set(timestamp=timestamp, value=missing, warnif='changed')
+            if sensors['ants'][n_ant].status() == Corr2Sensor.WARN:
                 status = Corr2Sensor.WARN
                 value = 'degraded'
-        sensor_top.set(status=status, value=value)
+        sensors['device_status'].set(timestamp=timestamp, status=status, value=value)
     except Exception as e:
         sensor_manager.logger.error('Error updating RX reorder sensors for {} - '
                      '{}'.format(x_host.host, e.message))
-        set_failure()
-
-    sensor_manager.logger.debug('_cb_xeng_missing_ants ran')
+        sensor_scheduler.set_sensors_failure(sensors, timestamp)
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("17 on %s Ended End Time %f, Run Time %f" % (x_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'17'))
-    IOLoop.current().call_at(
-        sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime),
-        _cb_xeng_missing_ants,
-        sensors,
-        sensor_top,
-        x_host, sensor_manager,sensor_task)
+    sensor_manager.logger.debug('_update_xeng_missing_ants ran')
 
 
-@gen.coroutine
-def _cb_xeng_rx_reorder(sensors, x_host, sensor_manager,sensor_task):
+def _update_xeng_rx_reorder(readings, sensors, x_host, sensor_manager):
     """
     X-engine BRAM RX reorder counters
+    :param readings: the host's readings, from _read_xhost_status
     :param sensors: a sensor for each xengine rx reorder
     :return:
     """
-
-    functionStartTime = time.time();
-    #print("18 on %s Started at %f" % (x_host.host ,functionStartTime))
-
+    timestamp = readings['time']
     try:
-        rv = x_host.get_rx_reorder_status()
+        rv = x_host.get_rx_reorder_status(readings['registers'])
         is_ok=True
         for n_xengcore, sensordict in enumerate(sensors):
             sens_val = 'ok'
             device_status = Corr2Sensor.NOMINAL
 
             accumulated_errors = rv[n_xengcore]['timeout_err_cnt'] + rv[n_xengcore]['discard_err_cnt'] + rv[n_xengcore]['missed_err_cnt']
-            sensordict['err_cnt'].set(value=accumulated_errors, errif='changed')
+            sensordict['err_cnt'].set(timestamp=timestamp, value=accumulated_errors, errif='changed')
 
             if sensordict['err_cnt'].status() == Corr2Sensor.WARN:
                     device_status = Corr2Sensor.WARN
@@ -344,7 +192,7 @@ def _cb_xeng_rx_reorder(sensors, x_host, sensor_manager,sensor_task):
                     is_ok=False
 
             sensordict['device_status'].set(
-                value=sens_val, status=device_status)
+                timestamp=timestamp, value=sens_val, status=device_status)
 
         if not is_ok:
             x_host.logger.error("BRAM RX reorder error: %s"%(str(rv)))
@@ -353,19 +201,16 @@ def _cb_xeng_rx_reorder(sensors, x_host, sensor_manager,sensor_task):
         sensor_manager.logger.error('Error updating RX reorder sensors for {} - '
                      '{}'.format(x_host.host, e.message))
 
-    sensor_manager.logger.debug('_cb_xeng_rx_reorder ran')
-
-    functionRunTime = time.time() - functionStartTime;
-    #print("18 on %s Ended End Time %f, Run Time %f" % (x_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'18'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_xeng_rx_reorder, sensors, x_host, sensor_manager,sensor_task)
+    sensor_manager.logger.debug('_update_xeng_rx_reorder ran')
 
 
 @gen.coroutine
-def _cb_xeng_vacc(sensors_value, sensor_manager,sensor_task):
+def _cb_xeng_vacc(sensors_value, executor, sensor_manager):
     """
     Sensor call back to check xeng vaccs.
     :param sensors_value: a dictionary of lists of dicts for all vaccs.
+    :param executor: the executor on which to read the VACCs, off the
+        IOLoop
     :return:
     """
     def set_failure():
@@ -388,15 +233,10 @@ def _cb_xeng_vacc(sensors_value, sensor_manager,sensor_task):
                         status=Corr2Sensor.FAILURE, value=-1)
                     sensordict['timestamp'].set(
                         status=Corr2Sensor.FAILURE, value=-1)
-                    sensordict['device_status'].set(
-                        status=Corr2Sensor.FAILURE, value='fail')
-
-    functionStartTime = time.time();
-    #print("19 on all at %f" % (functionStartTime))
 
     instrument = sensors_value['synchronised'].manager.instrument
     try:
-        rv = instrument.xops.get_vacc_status()
+        rv = yield executor.submit(instrument.xops.get_vacc_status)
         for _x in rv:
             if _x == 'synchronised':
                 status = Corr2Sensor.NOMINAL if rv['synchronised'] else Corr2Sensor.ERROR
@@ -418,8 +258,6 @@ def _cb_xeng_vacc(sensors_value, sensor_manager,sensor_task):
                         (sensordict['resync_cnt'].status() == Corr2Sensor.ERROR) or
                         (sensordict['arm_cnt'].status() == Corr2Sensor.ERROR) or
                             (sensordict['ld_cnt'].status() == Corr2Sensor.ERROR)):
-                        status = Corr2Sensor.ERROR
-                        value = 'fail'
                         faulty_host_idx=instrument.xops.board_ids[_x]
                         faulty_host=instrument.xhosts[faulty_host_idx]
                         sensor_values_str_list = ['{} - {}'.format(name, sensor.value()) for name, sensor in 
@@ -428,13 +266,12 @@ def _cb_xeng_vacc(sensors_value, sensor_manager,sensor_task):
                         # faulty_host.logger.error('VACC%i error status: %s'%(xctr,str(sensors_value[_x][xctr])))
                         faulty_host.logger.error('VACC%i error status: %s'%(xctr, sensor_values_str))
                         if (xctr < 2):
-                            faulty_host.logger.error('VACC HMC0 error status: %s'%(str(faulty_host.hmcs.sys0_vacc_hmc_vacc_hmc.get_hmc_status())))
+                            hmc_name, label = 'sys0_vacc_hmc_vacc_hmc', 'VACC HMC0 error'
                         else:
-                            faulty_host.logger.error('VACC HMC1 error status: %s'%(str(faulty_host.hmcs.sys2_vacc_hmc_vacc_hmc.get_hmc_status())))
-                    else:
-                        status = Corr2Sensor.NOMINAL
-                        value = 'ok'
-                    sensordict['device_status'].set(value=value, status=status)
+                            hmc_name, label = 'sys2_vacc_hmc_vacc_hmc', 'VACC HMC1 error'
+                        instrument.host_executor.submit(
+                            faulty_host, faulty_host.log_hmc_status,
+                            hmc_name, label)
     except Exception as e:
         sensor_manager.logger.error('Error updating VACC sensors '
                      '- {}'.format(e.message))
@@ -442,63 +279,46 @@ def _cb_xeng_vacc(sensors_value, sensor_manager,sensor_task):
 
     sensor_manager.logger.debug('_cb_xeng_vacc ran')
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("19 on %s Ended, Run Time %f" % (time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,'19'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_xeng_vacc, sensors_value, sensor_manager,sensor_task)
 
-
-@gen.coroutine
-def _cb_xeng_pack(sensors, x_host, sensor_manager,sensor_task):
+def _update_xeng_pack(readings, sensors, x_host, sensor_manager):
     """
-
+    X-engine pack block
+    :param readings: the host's readings, from _read_xhost_status
     :param sensors: a sensor for each xengine pack block
     :param x_host: the host on which this is run
     :return:
     """
-    def set_failure():
-        for n_xengcore, sensordict in enumerate(sensors):
-            for key, sensor in sensordict.iteritems():
-                sensor.set(status=Corr2Sensor.FAILURE,
-                           value=Corr2Sensor.SENSOR_TYPES[Corr2Sensor.SENSOR_TYPE_LOOKUP[sensor.type]][1])
-
-    functionStartTime = time.time();
-    #print("20 on %s Started at %f" % (x_host.host ,functionStartTime))
+    timestamp = readings['time']
     try:
-        rv = x_host.get_pack_status()
+        rv = x_host.get_pack_status(status=readings['registers'])
         is_ok=True
         for n_xengcore, sensordict in enumerate(sensors):
             accum_errors = rv[n_xengcore]['align_err_cnt'] + rv[n_xengcore]['overflow_err_cnt'] 
-            sensordict['err_cnt'].set(value=accum_errors, errif='changed')
+            sensordict['err_cnt'].set(timestamp=timestamp, value=accum_errors, errif='changed')
             if sensordict['err_cnt'].status() == Corr2Sensor.ERROR:
-                sensordict['device_status'].set(value='fail', status=Corr2Sensor.ERROR)
+                sensordict['device_status'].set(timestamp=timestamp, value='fail', status=Corr2Sensor.ERROR)
                 is_ok=False
             else:
-                sensordict['device_status'].set(value='ok', status=Corr2Sensor.NOMINAL)
+                sensordict['device_status'].set(timestamp=timestamp, value='ok', status=Corr2Sensor.NOMINAL)
         if not is_ok: 
             x_host.logger.error("SPEAD pack error: %s"%(str(rv)))
 
     except Exception as e:
         sensor_manager.logger.error('Error updating xeng pack sensors for {} - '
                      '{}'.format(x_host.host, e.message))
-    sensor_manager.logger.debug('_cb_xeng_pack ran on {}'.format(x_host.host))
+    sensor_manager.logger.debug('_update_xeng_pack ran on {}'.format(x_host.host))
 
-    sensor_manager.logger.debug('_cb_xeng_pack ran')
 
-    functionRunTime = time.time() - functionStartTime;
-    #print("20 on %s Ended End Time %f, Run Time %f" % (x_host.host,time.time(), functionRunTime))
-    #print("%.4f %.4f %f %i %s %s" % (functionStartTime,sensor_task.last_runtime_utc,functionRunTime,sensor_task.flow_control_increments,x_host.host,'20'))
-    IOLoop.current().call_at(sensor_task.getNextSensorCallTime(current_function_runtime=functionRunTime), _cb_xeng_pack, sensors, x_host, sensor_manager,sensor_task)
-
-
-def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
+def setup_sensors_xengine(sens_man, general_executor, host_executors, scheduler,
                           host_offset_dict):
     """
     Set up the X-engine specific sensors.
     :param sens_man:
-    :param general_executor:
-    :param host_executors:
-    :param ioloop:
+    :param general_executor: the executor for the sensors across all the
+        hosts, None if they are set up elsewhere
+    :param host_executors: the executors of the hosts whose sensors to
+        set up, keyed on hostname
+    :param scheduler: the SensorScheduler on which to run the sensor tasks
     :param host_offset_dict:
     :return:
     """
@@ -507,8 +327,19 @@ def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
     if len(host_offset_lookup) == 0:
         host_offset_lookup = host_offset_dict.copy()
 
+    xhosts = [_x for _x in sens_man.instrument.xhosts
+              if _x.host in host_executors]
+
+    # X-engine host sensors, all updated from one status poll per host
+    polls = {}
+    for _x in xhosts:
+        polls[_x.host] = sensor_scheduler.HostStatusPoll(
+            '{0: <25} on {1: >15}'.format('_read_xhost_status', _x.host),
+            _x, host_executors[_x.host], _read_xhost_status,
+            logger=sens_man.logger)
+
     # NETWORK
-    for _x in sens_man.instrument.xhosts:
+    for _x in xhosts:
         executor = host_executors[_x.host]
         xhost = host_offset_lookup[_x.host]
         pref = '{xhost}.network'.format(xhost=xhost)
@@ -535,12 +366,15 @@ def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.rx-err-cnt'.format(pref),
                 'RX network error count (bad packets received)', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_network',_x.host))
-        ioloop.add_callback(_cb_xeng_network, network_sensors, _x, sens_man,sensor_task)
+        Corr2SensorRollup(
+            network_sensors['device_status'],
+            [sensor for name, sensor in network_sensors.items()
+             if name != 'device_status'])
+        polls[_x.host].add_update(_update_xeng_network, network_sensors, _x, sens_man)
 
     # SPEAD counters
 
-    for _x in sens_man.instrument.xhosts:
+    for _x in xhosts:
         executor = host_executors[_x.host]
         xhost = host_offset_lookup[_x.host]
         sensors = {
@@ -557,12 +391,11 @@ def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
                 'X-engine RX SPEAD packet error counter.',
                 executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_rx_spead',_x.host))
-        ioloop.add_callback(_cb_xeng_rx_spead, sensors, _x, sens_man,sensor_task)
+        polls[_x.host].add_update(_update_xeng_rx_spead, sensors, _x, sens_man)
 
 
     # HMC reorders
-    for _x in sens_man.instrument.xhosts:
+    for _x in xhosts:
         xhost = host_offset_lookup[_x.host]
         pref = '{xhost}.network-reorder'.format(xhost=xhost)
         sensors = {
@@ -577,28 +410,28 @@ def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{}.miss-err-cnt'.format(pref),
                 'X-engine missing F-engine packet count; data filled with zeros.', executor=executor),
         }
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_hmc_reorder',_x.host))
-        ioloop.add_callback(_cb_xeng_hmc_reorder, sensors, _x, sens_man,sensor_task)
+        Corr2SensorRollup(sensors['device_status'],
+                          [sensors['err_cnt'], sensors['miss_err_cnt']])
+        polls[_x.host].add_update(_update_xeng_hmc_reorder, sensors, _x, sens_man)
 
     # missing antennas
 
-    for _x in sens_man.instrument.xhosts:
+    for _x in xhosts:
         executor = host_executors[_x.host]
         xhost = host_offset_lookup[_x.host]
         sensor_top = sens_man.do_sensor(
             Corr2Sensor.device_status, '{}.missing-pkts.device-status'.format(xhost),
             'Rolled-up missing packets sensor.', executor=executor)
-        sensors = []
+        sensors = {'device_status': sensor_top, 'ants': []}
         for ant in range(_x.n_ants):
-            sensors.append(sens_man.do_sensor(
+            sensors['ants'].append(sens_man.do_sensor(
                 Corr2Sensor.integer, '{}.missing-pkts.fhost{:02}-cnt'.format(xhost, ant),
                 'Missing packet count for antenna %i.' % ant, executor=executor))
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_missing_ants',_x.host))
-        ioloop.add_callback(_cb_xeng_missing_ants, sensors, sensor_top, _x, sens_man,sensor_task)
+        polls[_x.host].add_update(_update_xeng_missing_ants, sensors, _x, sens_man)
 
     # BRAM reorders
 
-    for _x in sens_man.instrument.xhosts:
+    for _x in xhosts:
         sensors = []
         executor = host_executors[_x.host]
         xhost = host_offset_lookup[_x.host]
@@ -613,52 +446,58 @@ def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
                 Corr2Sensor.integer, '{pref}.err-cnt'.format(pref=pref),
                 'BRAM packet reorder errors.', executor=executor)
             sensors.append(sensordict)
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_rx_reorder',_x.host))
-        ioloop.add_callback(_cb_xeng_rx_reorder, sensors, _x, sens_man,sensor_task)
-
-
-    # VACC
-    sensors_value = {}
-    sensors_value['synchronised'] = sens_man.do_sensor(
-        Corr2Sensor.boolean, 'xeng-vaccs-synchronised',
-        'Are the output timestamps of the Xengine VACCs synchronised?',
-        executor=general_executor)
-
-    for _x in sens_man.instrument.xhosts:
-        xhost = host_offset_lookup[_x.host]
-        sensors_value[_x.host] = []
-        for xctr in range(_x.x_per_fpga):
-            pref = '{xhost}.xeng{xctr}.vacc'.format(xhost=xhost, xctr=xctr)
-            sensordict = {}
-            sensordict['device_status'] = sens_man.do_sensor(
-                Corr2Sensor.device_status, '{pref}.device-status'.format(pref=pref),
-                'Overall status of this VACC.')
-            sensordict['arm_cnt'] = sens_man.do_sensor(
-                Corr2Sensor.integer, '{pref}.arm-cnt'.format(pref=pref),
-                'Number of times this VACC has armed.')
-            sensordict['acc_cnt'] = sens_man.do_sensor(
-                Corr2Sensor.integer, '{pref}.cnt'.format(pref=pref),
-                'Number of accumulations this VACC has performed.')
-            sensordict['resync_cnt'] = sens_man.do_sensor(
-                Corr2Sensor.integer, '{pref}.resync-cnt'.format(pref=pref),
-                'Number of times this VACC has reset itself.')
-            sensordict['err_cnt'] = sens_man.do_sensor(
-                Corr2Sensor.integer, '{pref}.err-cnt'.format(pref=pref),
-                'Number of VACC errors.')
-            sensordict['ld_cnt'] = sens_man.do_sensor(
-                Corr2Sensor.integer, '{pref}.load-cnt'.format(pref=pref),
-                'Number of times this VACC has been loaded.')
-            sensordict['timestamp'] = sens_man.do_sensor(
-                Corr2Sensor.integer, '{pref}.timestamp'.format(pref=pref),
-                'Current VACC timestamp.')
-            sensors_value[_x.host].append(sensordict)
-    sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_vacc',_x.host))
-    ioloop.add_callback(_cb_xeng_vacc, sensors_value, sens_man,sensor_task)
+        polls[_x.host].add_update(_update_xeng_rx_reorder, sensors, _x, sens_man)
+
+
+    # VACC, read across all the hosts, so only set up with the general
+    # executor
+    if general_executor is not None:
+        sensors_value = {}
+        sensors_value['synchronised'] = sens_man.do_sensor(
+            Corr2Sensor.boolean, 'xeng-vaccs-synchronised',
+            'Are the output timestamps of the Xengine VACCs synchronised?',
+            executor=general_executor)
+
+        for _x in sens_man.instrument.xhosts:
+            xhost = host_offset_lookup[_x.host]
+            sensors_value[_x.host] = []
+            for xctr in range(_x.x_per_fpga):
+                pref = '{xhost}.xeng{xctr}.vacc'.format(xhost=xhost, xctr=xctr)
+                sensordict = {}
+                sensordict['device_status'] = sens_man.do_sensor(
+                    Corr2Sensor.device_status, '{pref}.device-status'.format(pref=pref),
+                    'Overall status of this VACC.')
+                sensordict['arm_cnt'] = sens_man.do_sensor(
+                    Corr2Sensor.integer, '{pref}.arm-cnt'.format(pref=pref),
+                    'Number of times this VACC has armed.')
+                sensordict['acc_cnt'] = sens_man.do_sensor(
+                    Corr2Sensor.integer, '{pref}.cnt'.format(pref=pref),
+                    'Number of accumulations this VACC has performed.')
+                sensordict['resync_cnt'] = sens_man.do_sensor(
+                    Corr2Sensor.integer, '{pref}.resync-cnt'.format(pref=pref),
+                    'Number of times this VACC has reset itself.')
+                sensordict['err_cnt'] = sens_man.do_sensor(
+                    Corr2Sensor.integer, '{pref}.err-cnt'.format(pref=pref),
+                    'Number of VACC errors.')
+                sensordict['ld_cnt'] = sens_man.do_sensor(
+                    Corr2Sensor.integer, '{pref}.load-cnt'.format(pref=pref),
+                    'Number of times this VACC has been loaded.')
+                sensordict['timestamp'] = sens_man.do_sensor(
+                    Corr2Sensor.integer, '{pref}.timestamp'.format(pref=pref),
+                    'Current VACC timestamp.')
+                Corr2SensorRollup(sensordict['device_status'], [
+                    sensordict['err_cnt'], sensordict['resync_cnt'],
+                    sensordict['arm_cnt'], sensordict['ld_cnt']])
+                sensors_value[_x.host].append(sensordict)
+        scheduler.add_task('{0: <25} on {1: >15}'.format('_cb_xeng_vacc','all boards'),
+                           _cb_xeng_vacc, (sensors_value, general_executor, sens_man),
+                           priority=sensor_scheduler.PRIORITY_SLOW,
+                           sensor_prefix='xeng-vacc')
 
     # Xeng Packetiser block
 
     increment = 0;
-    for _x in sens_man.instrument.xhosts:
+    for _x in xhosts:
         sensors = []
         executor = host_executors[_x.host]
         xhost = host_offset_lookup[_x.host]
@@ -677,24 +516,31 @@ def setup_sensors_xengine(sens_man, general_executor, host_executors, ioloop,
                     executor=executor)
                 }
             sensors.append(sensordict)
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xeng_pack',_x.host))
-        ioloop.add_callback(_cb_xeng_pack, sensors, _x, sens_man,sensor_task)
+        polls[_x.host].add_update(_update_xeng_pack, sensors, _x, sens_man)
 
 
-        # LRU ok
+        # LRU ok, the worst of the host's and its X-engine cores' statuses
         sensor = sens_man.do_sensor(
             Corr2Sensor.device_status, '{}.device-status'.format(xhost),
             'X-engine %s LRU ok' % _x.host, executor=executor)
-        sensors=[]
+        lru = Corr2SensorRollup(sensor, [
+            sens_man.sensor_get('{}.{}.device-status'.format(xhost, block))
+            for block in ['network', 'network-reorder', 'spead-rx']])
         for xctr in range(_x.x_per_fpga):
             pref = '{xhost}.xeng{xctr}'.format(xhost=xhost, xctr=xctr)
             xeng_sensor = sens_man.do_sensor(
                 Corr2Sensor.device_status,
                 '{}.device-status'.format(pref),
                 'X-engine core status')
-            sensors.append(xeng_sensor)
-        sensor_task = sensor_scheduler.SensorTask('{0: <25} on {1: >15}'.format('_cb_xhost_lru',_x.host))
-        ioloop.add_callback(_cb_xhost_lru, sens_man, sensor, sensors, _x,sensor_task)
+            # the VACC sensors may be set up in another sensor shard
+            xeng_rollup = Corr2SensorRollup(xeng_sensor)
+            for block in ['vacc', 'bram-reorder', 'spead-tx']:
+                xeng_rollup.add_child_name(
+                    '{}.{}.device-status'.format(pref, block))
+            lru.add_child(xeng_sensor)
+        scheduler.add_task(polls[_x.host].name, polls[_x.host].poll,
+                           priority=sensor_scheduler.PRIORITY_FAST,
+                           sensor_prefix=xhost)
 
 
 # end
@@ -10,6 +10,7 @@ from casperfpga.memory import bin2fp
 import casperfpga.utils as fpgautils
 
 from data_stream import StreamAddress
+import bitstream_cache
 from corr2LogHandlers import getLogger
 from casperfpga import CasperFpga
 
@@ -258,12 +259,17 @@ def script_get_fpgas(cmdline_args, host_type=None, fpga_class=CasperFpga,
         fhosts = fpgautils.threaded_create_fpgas_from_hosts(val[1], fpga_class,
                                                             *args, **kwargs)
         if hasattr(fhosts[0].transport, 'katcprequest'):
-            gsi_args = []
+            fpgautils.threaded_fpga_function(
+                fpga_list=fhosts, timeout=15,
+                target_function='get_system_information')
         else:
-            gsi_args = [val[2]]
-        fpgautils.threaded_fpga_function(
-            fpga_list=fhosts, timeout=15,
-            target_function=('get_system_information', gsi_args, {}))
+            # each host gets its own copy of the cached design information
+            fpgautils.threaded_fpga_operation(
+                fpga_list=fhosts, timeout=15,
+                target_function=(
+                    lambda fpga_, fpg_file: fpga_.get_system_information(
+                        fpg_info=bitstream_cache.get_fpg_info(fpg_file)),
+                    [val[2]], {}))
         fpgas.extend(fhosts)
     return fpgas
 
@@ -316,7 +322,8 @@ def script_get_fpga(cmdline_args, host_name=None, host_index=-1,
     if hasattr(fpga.transport, 'katcprequest'):
         fpga.get_system_information()
     else:
-        fpga.get_system_information(bitstream)
+        fpga.get_system_information(
+            fpg_info=bitstream_cache.get_fpg_info(bitstream))
     return fpga
 
 
@@ -509,18 +516,71 @@ class UnpackDengPacketCapture(object):
         return sorted_time_keys, data
 
 
-def disable_test_gbes(corr_instance):
+def encode_array(data, dtype=None):
+    """
+    Encode an array compactly, for large sensor values and katcp informs:
+    base64 of the raw buffer, prefixed with the dtype and shape, separated
+    by colons. e.g. '<i2:4096,2:AAABAAIA...'
+    :param data: a numpy array, or anything numpy.asarray understands
+    :param dtype: convert to this numpy dtype before encoding
+    :return: the encoded string
+    """
+    import base64
+    import numpy
+    arr = numpy.ascontiguousarray(data, dtype=dtype)
+    return '{}:{}:{}'.format(arr.dtype.str,
+                             ','.join([str(dim) for dim in arr.shape]),
+                             base64.b64encode(arr.tostring()))
+
+
+def decode_array(encoded):
+    """
+    Decode an array encoded with encode_array.
+    :param encoded: the encoded string
+    :return: a numpy array
+    """
+    import base64
+    import numpy
+    try:
+        dtype, shape, data = encoded.split(':')
+        shape = tuple([int(dim) for dim in shape.split(',') if dim != ''])
+        return numpy.frombuffer(base64.b64decode(data),
+                                dtype=numpy.dtype(dtype)).reshape(shape)
+    except (ValueError, TypeError):
+        raise ValueError('Could not decode array from \'%s...\'' %
+                         encoded[0:32])
+
+
+def summarise_array(data):
+    """
+    A short, human-readable summary of a large array.
+    :param data: a numpy array, or anything numpy.asarray understands
+    :return: a string
+    """
+    import numpy
+    arr = numpy.asarray(data)
+    if arr.size == 0:
+        return 'len 0'
+    mag = numpy.abs(arr)
+    return 'len {}, mean {}, min |{}|, max |{}|'.format(
+        arr.size, arr.mean(), mag.min(), mag.max())
+
+
+def disable_test_gbes(corr_instance, hosts=None):
     """
     Disable the 10Gbe fabric by default on test GBE devices.
     :param corr_instance: the correlator object in use
+    :param hosts: the hosts on which to do so, all of them if None
     :return:
     """
-    for hosts in (corr_instance.xhosts + corr_instance.fhosts):
-        for gbe in hosts.gbes:
+    if hosts is None:
+        hosts = corr_instance.xhosts + corr_instance.fhosts
+    for host in hosts:
+        for gbe in host.gbes:
             if gbe.name.startswith('test_'):
                 corr_instance.logger.info(
                     '%s: disabled fabric on '
-                    '%s' % (hosts.host, gbe.name))
+                    '%s' % (host.host, gbe.name))
                 gbe.fabric_disable()
 
 
@@ -586,6 +646,44 @@ def thread_funcs(timeout, *funcs):
     return returnval
 
 
+class TokenBucket(object):
+    """
+    A thread-safe token bucket, to limit the rate of some operation.
+    """
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: tokens per second, unlimited if not positive
+        :param burst: how many tokens can build up
+        :return:
+        """
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """
+        Take a token, waiting for one if need be.
+        :return: the time spent waiting, in seconds
+        """
+        if self.rate <= 0:
+            return 0
+        waited = 0
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
 def parse_output_products(dictionary):
     """
     Parse a config dictionary section for output products and addresses.
@@ -2,7 +2,6 @@ from logging import INFO
 import time
 import struct
 
-from host_fpga import FpgaHost
 from host_fpga import FpgaHost
 from casperfpga.transport_skarab import SkarabTransport
 # from corr2LogHandlers import getLogger
@@ -12,6 +11,19 @@ class FpgaXHost(FpgaHost):
     """
     A Host, that hosts Xengines, that is a CASPER KATCP FPGA.
     """
+    STATUS_BUNDLES = {
+        'unpack': ['spead_status0', 'spead_status1', 'spead_status2'],
+        'hmc_reorder': ['hmc_pkt_reord_status0', 'hmc_pkt_reord_status1',
+                        'hmc_pkt_reord_status2', 'hmc_pkt_reord_status3'],
+        'rx_reorder': ['sys{xeng}_pkt_reord_status',
+                       'sys{xeng}_pkt_reord_status0',
+                       'sys{xeng}_pkt_reord_status1'],
+        'pack': ['sys{xeng}_xeng_pack_out_status'],
+        'vacc': ['sys{xeng}_vacc_timestamp', 'sys{xeng}_vacc_status',
+                 'sys{xeng}_vacc_hmc_vacc_status0',
+                 'sys{xeng}_vacc_hmc_vacc_status1'],
+    }
+
     def __init__(self, host, index, katcp_port=7147, bitstream=None,
                  connect=True, config=None, **kwargs):
         FpgaHost.__init__(self, host=host, katcp_port=katcp_port,
@@ -75,18 +87,19 @@ class FpgaXHost(FpgaHost):
 
     @classmethod
     def from_config_source(cls, hostname, index, katcp_port,
-                           config_source, **kwargs):
+                           config_source, connect=True, **kwargs):
         """
 
         :param hostname: the hostname of this host
         :param index: which x-host in the system is this?
         :param katcp_port: the katcp port on which to talk to it
         :param config_source: the x-engine config
+        :param connect: connect to the host now
         :return:
         """
         bitstream = config_source['xengine']['bitstream']
         obj = cls(hostname, index, katcp_port=katcp_port, bitstream=bitstream,
-                  connect=True, config=config_source, **kwargs)
+                  connect=connect, config=config_source, **kwargs)
         return obj
 
     def _determine_x_per_fpga(self):
@@ -111,90 +124,108 @@ class FpgaXHost(FpgaHost):
         Clear the status registers and counters on this x-engine host
         :return:
         """
-        self.registers.control.write(cnt_rst='pulse',gbe_debug_rst='pulse')
+        self.shadow_write('control', cnt_rst='pulse', gbe_debug_rst='pulse')
+
+    def _status_template_values(self):
+        """
+        {xeng} in the status bundles is each X-engine's index.
+        """
+        return {'xeng': range(self.x_per_fpga)}
 
     def get_status_registers(self):
         """
         Read the status registers on this xhost FPGA
         :return:
         """
+        names = [reg.name for reg in self.registers
+                 if reg.name.count('status') > 0]
+        status = self.read_registers_batched(
+            names, max_gap=self.STATUS_READ_MAX_GAP)
         data = {}
-        for reg in self.registers:
-            if (reg.name.count('status')>0):
-                d=reg.read()['data']
-                for key,val in d.iteritems():
-                    data[reg.name+'_'+key]=val
+        for name, d in status.iteritems():
+            for key,val in d.iteritems():
+                data[name+'_'+key]=val
         return data
 
-    def get_unpack_status(self):
+    def get_unpack_status(self, status=None):
         """
         Returns the SPEAD counters on this FPGA.
-        """
-        rv = self.registers.spead_status0.read()['data']
-        rv.update(self.registers.spead_status1.read()['data'])
-        try:
-            rv.update(self.registers.spead_status2.read()['data'])
-        except:
-            pass
+        :param status: the registers from read_status_bundles, read here
+            if not given
+        """
+        if status is None:
+            status = self.read_status_bundles(['unpack'])
+        rv = dict(status['spead_status0'])
+        rv.update(status['spead_status1'])
+        if 'spead_status2' in status:
+            rv.update(status['spead_status2'])
         return rv
 
-    def get_hmc_reorder_status(self):
+    def get_hmc_reorder_status(self, status=None):
         """
         Retrieve the HMC packet RX reorder status on this board.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         """
+        if status is None:
+            status = self.read_status_bundles(['hmc_reorder'])
         rv={}
         for i in range(4):
-            rv.update(self.registers['hmc_pkt_reord_status%i'%i].read()['data'])
+            rv.update(status['hmc_pkt_reord_status%i'%i])
         return rv
 
-    def get_rx_reorder_status(self):
+    def get_rx_reorder_status(self, status=None):
         """
         Retrieve the RX reorder status from this FPGA's xengines.
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return:
         """
+        if status is None:
+            status = self.read_status_bundles(['rx_reorder'])
         data = []
         for ctr in range(0, self.x_per_fpga):
             tmp = {}
-            try:
-                tmp.update(self.registers['sys%i_pkt_reord_status' % ctr].read()['data'])
-            except:
-                pass
-            try:
-                tmp.update(self.registers['sys%i_pkt_reord_status0' % ctr].read()['data'])
-            except:
-                pass
-            try:
-                tmp.update(self.registers['sys%i_pkt_reord_status1' % ctr].read()['data'])
-            except:
-                pass
+            for name in ['sys%i_pkt_reord_status' % ctr,
+                         'sys%i_pkt_reord_status0' % ctr,
+                         'sys%i_pkt_reord_status1' % ctr]:
+                if name in status:
+                    tmp.update(status[name])
             data.append(tmp)
         return data
 
-    def get_pack_status(self, x_indices=None):
+    def get_pack_status(self, x_indices=None, status=None):
         """
         Read the pack block status registers: error count and pkt count
         :param x_indices: a list of x-engine indices to query
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return: list of dicts
         """
         if x_indices is None:
             x_indices = range(self.x_per_fpga)
+        if status is None:
+            status = self.read_status_bundles(['pack'])
         stats = []
         for xnum in x_indices:
-            temp = self.registers['sys%i_xeng_pack_out_status' % xnum].read()['data']
+            temp = dict(status['sys%i_xeng_pack_out_status' % xnum])
             stats.append(temp)
         return stats
 
-    def get_vacc_status(self, x_indices=None):
+    def get_vacc_status(self, x_indices=None, status=None):
         """
         Read the vacc status registers, error count, accumulation count and
         load status
         :param x_indices: a list of x-engine indices to query
+        :param status: the registers from read_status_bundles, read here
+            if not given
         :return: dict with errors, count, arm count and load count
         """
         if x_indices is None:
             x_indices = range(self.x_per_fpga)
+        if status is None:
+            status = self.read_status_bundles(['vacc'])
         stats = []
-        regs = self.registers
 #        #get the HMC statii:
 #        hmc_statii=[]
 #        hmc_statii.append(self.hmcs.sys0_vacc_hmc_vacc_hmc.get_hmc_status())
@@ -206,10 +237,10 @@ class FpgaXHost(FpgaHost):
 #        not_link_lookup=[3,2,3,2]
         for xnum in x_indices:
             temp={}
-            temp['timestamp'] = regs['sys%i_vacc_timestamp' % xnum].read()['data']['vacc_timestamp']
-            temp.update(regs['sys%i_vacc_status' % xnum].read()['data'])
+            temp['timestamp'] = status['sys%i_vacc_timestamp' % xnum]['vacc_timestamp']
+            temp.update(status['sys%i_vacc_status' % xnum])
             for stat_reg_idx in range(2):
-                temp.update(regs['sys%i_vacc_hmc_vacc_status%i' %(xnum,stat_reg_idx)].read()['data'])
+                temp.update(status['sys%i_vacc_hmc_vacc_status%i' %(xnum,stat_reg_idx)])
 #            #append the relevant HMC stuff; all the global, and the relevant link:
 #            for key,value in hmc_statii[int(xnum/2)].items():
 #                if not key.endswith('link%i'%not_link_lookup[xnum]): temp[key]=value
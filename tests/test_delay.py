@@ -0,0 +1,187 @@
+"""
+Check that the vectorised delay path, delay.process_list_array and
+delay.quantise_delays, gives the same register words and applied values as
+the per-input path, delay.process_list and the Fengine._delay_prepare_*
+methods, including where coefficients are clipped.
+
+Needs no hardware: the F-engines get a stand-in host whose registers only
+describe the phase fields.
+"""
+import logging
+import unittest
+
+from corr2 import delay as delayops
+from corr2.fhost_fpga import Fengine, InputStreamDetails
+
+SAMPLE_RATE_HZ = 1712e6
+NUM_INPUTS = 4
+
+
+class _Field(object):
+    def __init__(self, width_bits=32, offset=0):
+        self.width_bits = width_bits
+        self.offset = offset
+
+
+class _Register(object):
+    def __init__(self, field_names):
+        self._fields = dict((name, _Field()) for name in field_names)
+
+
+class _Host(object):
+    """
+    Just enough of an FpgaHost for Fengine.delay_prepare.
+    """
+    def __init__(self, num_inputs):
+        self.registers = {}
+        for ctr in range(num_inputs):
+            self.registers['phase%i' % ctr] = _Register(['initial', 'delta'])
+            self.registers['phase_rate%i' % ctr] = _Register(['delta'])
+
+
+def _get_logger(logger_name, log_level, **kwargs):
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(log_level)
+    return True, logger
+
+
+def _make_fengines(num_inputs):
+    host = _Host(num_inputs)
+    return [Fengine(InputStreamDetails('input%i' % ctr, None, ctr),
+                    host=host, offset=ctr, feng_id=ctr,
+                    getLogger=_get_logger, logLevel=logging.ERROR)
+            for ctr in range(num_inputs)]
+
+
+class TestDelayQuantisation(unittest.TestCase):
+
+    def setUp(self):
+        self.fengines = _make_fengines(NUM_INPUTS)
+
+    def _check(self, delay_list):
+        """
+        Compare the two paths for a list of NUM_INPUTS delay settings.
+        :param delay_list: the delay settings, strings or tuples
+        :return: the list of applied delay.Delay objects
+        """
+        quantised = delayops.quantise_delays(
+            delayops.process_list_array(delay_list, SAMPLE_RATE_HZ))
+        scalar = delayops.process_list(delay_list, SAMPLE_RATE_HZ)
+        self.assertEqual(len(quantised), len(scalar))
+        rv = []
+        for feng, row, requested in zip(self.fengines, quantised, scalar):
+            words, applied = feng.delay_prepare(row)
+            words = dict(words)
+            offset = feng.offset
+
+            whole, frac, act_delay = feng._delay_prepare_delay(
+                requested.delay)
+            self.assertEqual(words['delay_whole%i' % offset], whole)
+            self.assertEqual(words['delay_frac%i' % offset], frac)
+            self.assertEqual(applied.delay, act_delay)
+
+            prep_int, act_value = feng._delay_prepare_delay_rate(
+                requested.delay_delta)
+            self.assertEqual(words['delta_delay%i' % offset], prep_int)
+            self.assertEqual(applied.delay_delta, act_value)
+
+            prep_int, act_value = feng._delay_prepare_phase(
+                requested.phase_offset)
+            self.assertEqual(words['phase%i' % offset],
+                             prep_int & 0xffffffff)
+            self.assertEqual(applied.phase_offset, act_value)
+
+            prep_int, act_value = feng._delay_prepare_phase_rate(
+                requested.phase_offset_delta)
+            self.assertEqual(words['phase_rate%i' % offset],
+                             prep_int & 0xffffffff)
+            self.assertEqual(applied.phase_offset_delta, act_value)
+            rv.append(applied)
+        return rv
+
+    def test_nominal(self):
+        applied = self._check([
+            '0,0:0,0',
+            '1e-9,1e-12:0.5,100',
+            '-2.5e-9,-1e-12:-0.5,-100',
+            '1.23456789e-6,3.3e-11:2.9,-7.5',
+        ])
+        self.assertFalse(any(delay.saturated for delay in applied))
+
+    def test_tuples_match_strings(self):
+        strings = [
+            '1e-9,1e-12:0.5,100',
+            '-2.5e-9,-1e-12:-0.5,-100',
+            '0,0:0,0',
+            '3e-7,0:-3,1e4',
+        ]
+        tuples = [((1e-9, 1e-12), (0.5, 100)),
+                  ((-2.5e-9, -1e-12), (-0.5, -100)),
+                  ((0, 0), (0, 0)),
+                  ((3e-7, 0), (-3, 1e4))]
+        from_strings = delayops.quantise_delays(
+            delayops.process_list_array(strings, SAMPLE_RATE_HZ))
+        from_tuples = delayops.quantise_delays(
+            delayops.process_list_array(tuples, SAMPLE_RATE_HZ))
+        self.assertEqual(from_strings.tolist(), from_tuples.tolist())
+        self._check(tuples)
+
+    def test_delay_rate_saturation(self):
+        applied = self._check([
+            '0,1e-6:0,0',
+            '0,-1e-6:0,0',
+            '0,1e-3:0,0',
+            '0,-1e-3:0,0',
+        ])
+        self.assertTrue(all(delay.saturated for delay in applied))
+
+    def test_phase_saturation(self):
+        applied = self._check([
+            '0,0:4,0',
+            '0,0:-4,0',
+            # exactly pi and -pi are just out of range too
+            '0,0:3.141592653589793,0',
+            '0,0:-3.141592653589793,0',
+        ])
+        self.assertTrue(all(delay.saturated for delay in applied))
+
+    def test_phase_rate_saturation(self):
+        applied = self._check([
+            '0,0:0,1e4',
+            '0,0:0,-1e4',
+            '0,0:0,1e9',
+            '0,0:0,-1e9',
+        ])
+        self.assertTrue(all(delay.saturated for delay in applied))
+
+    def test_mixed_saturation(self):
+        applied = self._check([
+            '1e-9,1e-12:0.5,100',
+            '-5e-9,1e-6:0.1,0',
+            '2e-9,0:-4,0',
+            '0,0:0,-1e4',
+        ])
+        self.assertEqual([delay.saturated for delay in applied],
+                         [False, True, True, True])
+        saturated = delayops.saturated_inputs(delayops.quantise_delays(
+            delayops.process_list_array([
+                '1e-9,1e-12:0.5,100',
+                '-5e-9,1e-6:0.1,0',
+                '2e-9,0:-4,0',
+                '0,0:0,-1e4',
+            ], SAMPLE_RATE_HZ)))
+        self.assertEqual(saturated.tolist(), [False, True, True, True])
+
+    def test_invalid(self):
+        for delay_list in [['1e-9,0:0'], ['1e-9:0,0'], ['a,b:c,d'],
+                           [((1e-9, 0), )]]:
+            self.assertRaises(ValueError, delayops.process_list,
+                              delay_list, SAMPLE_RATE_HZ)
+            self.assertRaises(ValueError, delayops.process_list_array,
+                              delay_list, SAMPLE_RATE_HZ)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# end